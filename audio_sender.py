@@ -0,0 +1,68 @@
+"""
+Send microphone audio to a voice trigger listener on another machine.
+
+Run this on the gaming/streaming PC; on the recognizer box set AUDIO_SOURCE to
+{"type": "network", "protocol": "tcp", "host": "0.0.0.0", "port": 8766} (see
+modules.input_sources; without "host" it only listens on loopback).
+
+    python audio_sender.py HOST [--port 8766] [--protocol tcp|websocket] [--device INDEX or NAME]
+    python audio_sender.py --list-devices
+
+Audio is sent as 30 ms packets of 16 kHz mono 16-bit PCM (modules.network_audio);
+the device is captured at its native rate and converted (modules.audio_devices).
+The sender reconnects if the connection drops.
+"""
+
+import argparse
+import time
+
+import pyaudio
+
+from modules.network_audio import NetworkSender
+from modules.audio_devices import input_devices, open_device_stream
+
+RATE = 16000
+FRAME_SIZE = 480  # 30 ms
+RECONNECT_DELAY = 2.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream microphone audio to a network audio source")
+    parser.add_argument("host", nargs="?")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--protocol", choices=("tcp", "websocket"), default="tcp")
+    parser.add_argument("--device", default=None, help="input device index or name (default device if omitted)")
+    parser.add_argument("--list-devices", action="store_true", help="list the input devices and exit")
+    args = parser.parse_args()
+
+    p_audio = pyaudio.PyAudio()
+    if args.list_devices or not args.host:
+        for index, name, channels, rate in input_devices(p_audio):
+            print(f"{index:3}: {name} ({channels} ch, {rate} Hz)")
+        p_audio.terminate()
+        return
+    stream = open_device_stream(p_audio, args.device, rate=RATE, frame_size=FRAME_SIZE)
+    try:
+        while True:
+            try:
+                sender = NetworkSender(args.host, args.port, args.protocol)
+            except OSError as e:
+                print(f"Could not connect to {args.host}:{args.port} ({e}), retrying...")
+                time.sleep(RECONNECT_DELAY)
+                continue
+            print(f"Streaming audio to {args.host}:{args.port} ({args.protocol})")
+            try:
+                while True:
+                    sender.send(stream.read(FRAME_SIZE, exception_on_overflow=False))
+            except OSError as e:
+                print(f"Connection lost ({e}), reconnecting...")
+            finally:
+                sender.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.stop_stream()
+        stream.close()
+        p_audio.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Stress test: audio dropouts with capture in a thread vs. a dedicated capture process.
+
+Usage:
+    python benchmarks/capture_dropout_stress.py [--seconds S] [--cpu-threads N]
+        [--hog-ms MS] [--device-buffer-ms MS] [--modes thread,process]
+
+The real capture loop (modules.capture_process) reads from a simulated
+microphone that produces 30 ms frames in real time into a bounded device
+buffer, like PortAudio's input buffer: if the loop falls further behind than
+the buffer holds, the oldest frames are lost and an input overflow is raised.
+Each frame carries its sequence number, so gaps inside delivered utterances
+are counted exactly.
+
+Meanwhile this process is loaded the way the recognizer process is: pure
+Python CPU threads (transcription bookkeeping, printing), a thread that holds
+the GIL for --hog-ms at a time (e.g. large JSON/history rewrites), and a
+handler thread per utterance that reads the audio and burns CPU before
+handing the slot back. Only the capture location differs between modes.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.capture_process import CaptureProcess, run_capture, PA_INPUT_OVERFLOWED
+
+RATE = 16000
+FRAME_SIZE = 480
+FRAME_BYTES = FRAME_SIZE * 2
+FRAME_SECONDS = FRAME_SIZE / RATE
+
+class SimulatedMicrophone:
+    """
+    Real-time frame source with a bounded device buffer.
+    Frames are b"<seq:uint32><speech:uint8>" followed by zero padding.
+    """
+    def __init__(self, buffer_frames, pattern):
+        self.buffer_frames = buffer_frames
+        self.pattern = pattern
+        self.padding = bytes(FRAME_BYTES - 5)
+        self.start = None
+        self.next_seq = 0
+
+    def read(self, frame_size, exception_on_overflow=True):
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        produced = int((now - self.start) / FRAME_SECONDS)
+        if produced - self.next_seq > self.buffer_frames:
+            # The device buffer wrapped: the oldest frames are gone
+            self.next_seq = produced - self.buffer_frames
+            if exception_on_overflow:
+                raise IOError("Input overflowed", PA_INPUT_OVERFLOWED)
+        while self.next_seq >= produced:
+            time.sleep(max(0.0, self.start + (self.next_seq + 1) * FRAME_SECONDS - time.monotonic()))
+            produced = int((time.monotonic() - self.start) / FRAME_SECONDS)
+        seq = self.next_seq
+        self.next_seq += 1
+        return struct.pack("<IB", seq, self.pattern[seq % len(self.pattern)]) + self.padding
+
+class SimulatedVad:
+    def is_speech(self, frame, rate):
+        return frame[4] == 1
+
+def simulated_worker(conn, slot_names, settings):
+    """
+    Capture entry point using the simulated microphone (runs in a process or a thread).
+    """
+    microphone = SimulatedMicrophone(settings["device_buffer_frames"], settings["speech_pattern"])
+    run_capture(conn, slot_names, settings, microphone, SimulatedVad())
+
+def make_settings(device_buffer_ms):
+    # 0.5 s silence, 3 s speech, 1.5 s silence
+    pattern = [0] * 17 + [1] * 100 + [0] * 50
+    return {
+        "rate": RATE,
+        "channels": 1,
+        "frame_size": FRAME_SIZE,
+        "frame_bytes": FRAME_BYTES,
+        "vad_mode": 2,
+        "prebuffer_frames": 33,
+        "max_recording_frames": 1000,
+        "max_frames": 1033,
+        "min_speech_frames": 3,
+        "max_silent_frames": 50,
+        "device_buffer_frames": max(1, int(device_buffer_ms / 1000 / FRAME_SECONDS)),
+        "speech_pattern": pattern,
+    }
+
+def cpu_load(stop):
+    while not stop.is_set():
+        total = 0
+        for i in range(20000):
+            total += i * i
+
+def gil_hog(stop, hog_ms):
+    # sorted() on a list of floats runs in C without releasing the GIL
+    data = [random.random() for _ in range(100000)]
+    start = time.perf_counter()
+    sorted(data)
+    per_sort = time.perf_counter() - start
+    data = data * max(1, int(hog_ms / 1000 / per_sort))
+    while not stop.is_set():
+        sorted(data)
+        time.sleep(hog_ms / 1000)
+
+def handle_utterance(capture, slot, frames, results):
+    pcm, _ = capture.views(slot, frames)
+    audio = bytes(pcm)
+    pcm.release()
+    gaps = 0
+    previous = None
+    for offset in range(0, len(audio), FRAME_BYTES):
+        seq = struct.unpack_from("<I", audio, offset)[0]
+        if previous is not None and seq != previous + 1:
+            gaps += seq - previous - 1
+        previous = seq
+    # Stand-in for recognition work done while holding the GIL
+    total = 0
+    for i in range(200000):
+        total += i
+    capture.free(slot)
+    results.append(gaps)
+
+def run_mode(mode, args):
+    settings = make_settings(args.device_buffer_ms)
+    runner = threading.Thread if mode == "thread" else multiprocessing.Process
+    capture = CaptureProcess(settings, 4, worker=simulated_worker, runner=runner)
+
+    stop = threading.Event()
+    load = [threading.Thread(target=cpu_load, args=(stop,), daemon=True) for _ in range(args.cpu_threads)]
+    if args.hog_ms > 0:
+        load.append(threading.Thread(target=gil_hog, args=(stop, args.hog_ms), daemon=True))
+    for thread in load:
+        thread.start()
+
+    results = []
+    handlers = []
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        message = capture.receive(timeout=0.1)
+        if message and message[0] == "utterance":
+            slot, frames = message[1]
+            handler = threading.Thread(target=handle_utterance, args=(capture, slot, frames, results), daemon=True)
+            handler.start()
+            handlers.append(handler)
+
+    stop.set()
+    for thread in load + handlers:
+        thread.join()
+    stats = capture.stop() or {}
+    expected = int(stats.get("wall_seconds", 0) / FRAME_SECONDS)
+    lost = max(0, expected - stats.get("frames", 0) - settings["device_buffer_frames"])
+    return {
+        "mode": mode,
+        "frames": stats.get("frames", 0),
+        "lost": lost,
+        "overflows": stats.get("overflows", 0),
+        "utterances": len(results),
+        "gappy": sum(1 for gaps in results if gaps),
+        "gap_frames": sum(results),
+        "max_gap_ms": stats.get("max_read_gap_ms", 0.0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--cpu-threads", type=int, default=4)
+    parser.add_argument("--hog-ms", type=float, default=200.0)
+    parser.add_argument("--device-buffer-ms", type=float, default=120.0)
+    parser.add_argument("--modes", default="thread,process")
+    args = parser.parse_args()
+
+    print(f"{args.seconds:.0f}s per mode, {args.cpu_threads} CPU thread(s), GIL hog {args.hog_ms:.0f} ms, "
+          f"device buffer {args.device_buffer_ms:.0f} ms")
+    print(f"{'mode':<8} {'frames':>7} {'lost':>6} {'overflows':>10} {'utterances':>11} "
+          f"{'with gaps':>10} {'gap frames':>11} {'max gap ms':>11}")
+    for mode in args.modes.split(","):
+        r = run_mode(mode.strip(), args)
+        print(f"{r['mode']:<8} {r['frames']:>7} {r['lost']:>6} {r['overflows']:>10} {r['utterances']:>11} "
+              f"{r['gappy']:>10} {r['gap_frames']:>11} {r['max_gap_ms']:>11.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+First-pass trigger hit rate on a replay corpus, with and without audio conditioning.
+
+Usage:
+    python benchmarks/conditioning_bench.py PATH [--engine NAME] [--attenuate DB] [--no-recognition]
+
+PATH is a 16 kHz mono 16-bit WAV file or a directory of them, e.g. sessions
+recorded with `whisper.py --tap recordings/`. The corpus is cut into
+utterances by the real recorder (VAD), then every utterance is recognized by
+the first-pass engine (FIRST_PASS_ENGINE or --engine) twice: as captured and
+after modules.conditioning with the CONDITIONING_* settings of config.json
+(whether or not CONDITIONING_ENABLED is set). An utterance is a hit if the
+transcript matches any configured trigger. The report lists the hit rate of
+both passes, the utterances that only one of them hit, and the conditioning
+cost per utterance.
+
+--attenuate scales the corpus down by DB decibels first, to simulate a quiet
+microphone with a corpus recorded at a good level. --no-recognition only
+measures the conditioning (cost, measured loudness, applied gain), which needs
+no engine. Cloud engines are billed through the budget governor as usual.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import audio_recorder
+from modules.conditioning import Conditioner, np
+from modules.config_manager import (
+    TRIGGERS, FIRST_PASS_ENGINE, CONDITIONING_HIGHPASS_HZ, CONDITIONING_TARGET_DBFS,
+    CONDITIONING_MAX_GAIN_DB, CONDITIONING_CEILING_DBFS
+)
+from modules.recognizers import RecognitionError
+from modules.transcriber import Profile, governor, write_wav, recognize_with_fallback, find_triggers
+from modules.utils import state
+
+RATE = 16000
+FRAME_MS = 30
+
+def utterances(path, attenuate_db):
+    """
+    (pcm, vad flags) of every utterance the recorder cuts from the corpus.
+    """
+    found = []
+    scale = 10 ** (-attenuate_db / 20)
+
+    def submit(audio_data, stream_session, vad_flags, release):
+        pcm = bytes(audio_data[0])
+        if scale != 1:
+            pcm = array("h", (int(sample * scale) for sample in array("h", pcm))).tobytes()
+        found.append((pcm, bytes(vad_flags)))
+        release()
+
+    state.running = True
+    audio_recorder.vad_based_recording(source_spec={"type": "file", "path": path, "realtime": False}, submit=submit)
+    return found
+
+def recognize(profile, backend, pcm, directory, name):
+    filename = os.path.join(directory, f"{name}.wav")
+    write_wav(filename, pcm, 1, 2, RATE)
+    try:
+        transcript, _ = recognize_with_fallback(backend, filename, len(pcm) / 2 / RATE, profile=profile)
+    except RecognitionError as e:
+        print(f"  {name}: recognition failed: {e}")
+        return None
+    finally:
+        os.remove(filename)
+    return transcript or ""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--engine", default=FIRST_PASS_ENGINE, help="first-pass engine (default %(default)s)")
+    parser.add_argument("--attenuate", type=float, default=0.0, metavar="DB", help="turn the corpus down first")
+    parser.add_argument("--no-recognition", action="store_true", help="only measure the conditioning")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("Audio conditioning needs NumPy")
+
+    corpus = utterances(args.path, args.attenuate)
+    print(f"{len(corpus)} utterance(s) in {args.path}"
+          + (f", attenuated by {args.attenuate:g} dB" if args.attenuate else ""))
+    if not corpus:
+        return
+
+    profile = Profile("conditioning_bench", {"triggers": TRIGGERS, "FIRST_PASS_ENGINE": args.engine},
+                      governor, register=False)
+    backend = None
+    if not args.no_recognition:
+        backend = profile.get_backend(args.engine)
+        if backend is None:
+            sys.exit(f"First-pass engine '{args.engine}' is not usable with this configuration")
+
+    conditioner = Conditioner(highpass_hz=CONDITIONING_HIGHPASS_HZ, target_dbfs=CONDITIONING_TARGET_DBFS,
+                              max_gain_db=CONDITIONING_MAX_GAIN_DB, ceiling_dbfs=CONDITIONING_CEILING_DBFS)
+    directory = tempfile.mkdtemp(prefix="conditioning_bench_")
+    costs, gains, per_second = [], [], []
+    hits = {"raw": 0, "conditioned": 0}
+    errors = 0
+    changed = []
+    for i, (pcm, flags) in enumerate(corpus):
+        conditioned, info = conditioner.process(memoryview(bytearray(pcm)), flags)
+        seconds = len(flags) * FRAME_MS / 1000
+        costs.append(info["ms"])
+        per_second.append(info["ms"] / max(seconds, FRAME_MS / 1000))
+        gains.append(info["gain_db"])
+        if backend is None:
+            continue
+        transcripts = {
+            "raw": recognize(profile, backend, pcm, directory, f"{i}_raw"),
+            "conditioned": recognize(profile, backend, conditioned, directory, f"{i}_conditioned"),
+        }
+        if None in transcripts.values():
+            errors += 1
+            continue
+        hit = {side: bool(find_triggers(text, profile)) for side, text in transcripts.items()}
+        for side in hits:
+            hits[side] += hit[side]
+        if hit["raw"] != hit["conditioned"]:
+            changed.append((i, seconds, hit["conditioned"], transcripts))
+        print(f"utterance {i + 1}/{len(corpus)}: {seconds:.1f}s, gain {info['gain_db']:+.1f} dB, "
+              f"hit {'yes' if hit['raw'] else 'no'} -> {'yes' if hit['conditioned'] else 'no'}")
+    os.rmdir(directory)
+
+    print(f"conditioning: median {statistics.median(costs):.2f} ms, max {max(costs):.2f} ms per utterance "
+          f"({statistics.median(per_second):.2f} ms per second of audio); "
+          f"gain median {statistics.median(gains):+.1f} dB, range {min(gains):+.1f} to {max(gains):+.1f} dB")
+    if backend is None:
+        return
+    total = len(corpus) - errors
+    if errors:
+        print(f"{errors} utterance(s) left out: recognition failed")
+    if not total:
+        return
+    print(f"first-pass hit rate ({args.engine}): raw {hits['raw']}/{total} ({hits['raw'] / total:.0%}), "
+          f"conditioned {hits['conditioned']}/{total} ({hits['conditioned'] / total:.0%})")
+    for i, seconds, gained, transcripts in changed:
+        print(f"  utterance {i + 1} ({seconds:.1f}s) {'gained' if gained else 'lost'}: "
+              f"raw '{transcripts['raw']}' / conditioned '{transcripts['conditioned']}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Listener downtime after a crash: supervised cold restart vs. standby failover.
+
+Usage:
+    python benchmarks/failover_bench.py [--init-seconds S] [--crashes N] [--listener PATH]
+
+The active listener is killed N times under ProcessManager supervision, first
+without and then with a standby instance, and the time from its exit until the
+replacement's audio loop runs is reported (ProcessManager.restart_times /
+failover_times). A relaunch (launch() while running) is measured with the standby.
+
+By default a stand-in listener is used: it speaks the real supervision protocol
+(modules.supervision) and sleeps --init-seconds to stand for importing the stack,
+reading the config, opening PyAudio and starting the engines. Point --listener at
+whisper.py to measure the real thing (it needs a working config and input device).
+The supervisor's crash backoff (RESTART_DELAYS[0]) is part of the cold restart time.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import process_launcher
+from modules.process_launcher import ProcessManager
+
+STAND_IN = (
+    "import sys, time\n"
+    "sys.path.insert(0, {root!r})\n"
+    "from modules.utils import state\n"
+    "from modules.supervision import start_supervision, wait_for_activation, report_active\n"
+    "start_supervision()\n"
+    "time.sleep({init_seconds})\n"
+    "if '--standby' in sys.argv and not wait_for_activation():\n"
+    "    sys.exit(0)\n"
+    "report_active(None)\n"
+    "while state.running:\n"
+    "    state.loop_tick = time.monotonic()\n"
+    "    time.sleep(0.03)\n"
+)
+
+def wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("listener did not come back")
+        time.sleep(0.01)
+
+def crash_loop(manager, target, crashes, standby):
+    manager.launch(target)
+    wait_for(lambda: manager.restart_times)
+    times = manager.failover_times if standby else manager.restart_times
+    for _ in range(crashes):
+        if standby:
+            wait_for(lambda: manager._standby_ready())
+        done = len(times)
+        manager.active.process.kill()
+        wait_for(lambda: len(times) > done)
+    return times[-crashes:]
+
+def summary(times):
+    return f"median {statistics.median(times):.0f} ms, max {max(times):.0f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--init-seconds", type=float, default=3.0, help="stand-in start-up time")
+    parser.add_argument("--crashes", type=int, default=5)
+    parser.add_argument("--listener", help="listener program (default: the stand-in)")
+    args = parser.parse_args()
+
+    # Every crash counts as the first one, so each restart waits RESTART_DELAYS[0]
+    process_launcher.STABLE_SECONDS = 0
+    directory = tempfile.mkdtemp(prefix="failover_bench_")
+    target = args.listener
+    if target is None:
+        target = os.path.join(directory, "listener.py")
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(STAND_IN.format(root=ROOT, init_seconds=args.init_seconds))
+
+    quiet = lambda text: None
+    cold = ProcessManager(on_output_callback=quiet, supervise=True)
+    cold_times = crash_loop(cold, target, args.crashes, standby=False)
+    cold.terminate()
+
+    warm = ProcessManager(on_output_callback=quiet, standby=True)
+    warm_times = crash_loop(warm, target, args.crashes, standby=True)
+    wait_for(lambda: warm._standby_ready())
+    warm.launch(target)
+    wait_for(lambda: len(warm.failover_times) > len(warm_times))
+    relaunch = warm.failover_times[-1]
+    warm.terminate()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"cold restart (backoff {process_launcher.RESTART_DELAYS[0]} s): {summary(cold_times)}")
+    print(f"standby failover:                  {summary(warm_times)}")
+    print(f"relaunch with standby:             {relaunch:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Trigger dispatch latency and throughput: HTTP calls vs. the persistent WebSocket transport.
+
+Usage:
+    python benchmarks/firebot_dispatch_bench.py [--fires N] [--threads T]
+
+Local stand-ins for Firebot answer immediately, so the numbers are the
+transport's own cost:
+
+  - http, new connection:  requests.get per fire (connection setup on every call)
+  - http, keep-alive:      the shared session (trigger_url_call's HTTP path)
+  - websocket:             WebSocketTransport.fire, one acknowledged fire at a time
+  - throughput:            N fires from T threads over HTTP vs. N pipelined fires
+                           on the WebSocket (all sent, then all acks awaited)
+  - reconnect:             the stand-in drops the connection; time until the
+                           transport is connected again
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.http_client import session
+from modules.network_audio import websocket_handshake, websocket_messages, websocket_frame
+from modules.firebot_transport import WebSocketTransport
+
+class HttpStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40 ms per keep-alive call
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+class WebSocketStandIn:
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(4)
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            if not websocket_handshake(conn):
+                return
+            for message in websocket_messages(conn, text=True):
+                fire = json.loads(message)
+                ack = json.dumps({"type": "ack", "id": fire["id"], "ok": True, "response": "ok"}).encode("utf-8")
+                conn.sendall(websocket_frame(ack, opcode=0x1, masked=False))
+        except OSError:
+            pass
+
+    def drop_connections(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.connections.clear()
+
+def percentiles(latencies):
+    values = sorted(latencies)
+    pick = lambda pct: values[min(len(values) - 1, int(len(values) * pct / 100))]
+    return f"p50 {pick(50) * 1000:.3f} ms, p99 {pick(99) * 1000:.3f} ms"
+
+def sequential(fire, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fire()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fires", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), HttpStandIn)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{http_server.server_port}/api/v1/effects/preset/bench"
+    ws_server = WebSocketStandIn()
+    transport = WebSocketTransport(f"ws://127.0.0.1:{ws_server.port}/fire")
+    transport.start()
+    transport.connected.wait(5)
+    args_payload = {"transcript": "turn the lights on", "trigger": "lights", "engine": "Google", "latency_ms": 412}
+
+    count = min(args.fires, 500)
+    print(f"http, new connection: {percentiles(sequential(lambda: requests.get(url, timeout=3), count))}")
+    print(f"http, keep-alive:     {percentiles(sequential(lambda: session.get(url, timeout=3), args.fires))}")
+    print(f"websocket:            {percentiles(sequential(lambda: transport.fire(url, args_payload), args.fires))}")
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: session.get(url, timeout=3), range(args.fires)))
+        http_rate = args.fires / (time.perf_counter() - start)
+    start = time.perf_counter()
+    handles = [transport.send(url, args_payload) for _ in range(args.fires)]
+    for handle in handles:
+        transport.wait(handle)
+    ws_rate = args.fires / (time.perf_counter() - start)
+    print(f"throughput: http ({args.threads} threads) {http_rate:,.0f} fires/s, websocket pipelined {ws_rate:,.0f} fires/s")
+
+    ws_server.drop_connections()
+    start = time.perf_counter()
+    while transport.connected.is_set() and time.perf_counter() - start < 5:
+        time.sleep(0.001)
+    transport.connected.wait(10)
+    print(f"reconnect: connected again after {(time.perf_counter() - start) * 1000:.0f} ms, stats {transport.status()}")
+    transport.stop()
+    http_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark in-process FLAC encoding against speech_recognition's flac subprocess.
+
+Usage:
+    python benchmarks/flac_encode_bench.py [--iterations N]
+
+For each utterance length (1-30 s of synthetic 16 kHz speech-like audio) this
+reports wall-clock latency and CPU time per encode. Subprocess CPU includes the
+time spent in the child `flac` process. The in-process output is also decoded
+with the flac binary to check that it round-trips losslessly.
+"""
+
+import argparse
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_recognition as sr
+from speech_recognition.audio import get_flac_converter
+
+from modules.flac_encoder import encode_flac, is_available
+
+RATE = 16000
+DURATIONS = [1, 3, 10, 30]
+
+def synthetic_speech(seconds, seed=0):
+    """
+    Generate a deterministic, speech-like 16-bit signal (modulated harmonics plus noise).
+    """
+    rng = random.Random(seed)
+    samples = array("h")
+    for n in range(int(seconds * RATE)):
+        t = n / RATE
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+        value = envelope * (6000 * math.sin(2 * math.pi * 180 * t) + 2500 * math.sin(2 * math.pi * 720 * t))
+        value += rng.gauss(0, 200)
+        samples.append(max(-32768, min(32767, int(value))))
+    return samples.tobytes()
+
+def cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def measure(encode, iterations):
+    wall = cpu = 0.0
+    result = None
+    for _ in range(iterations):
+        cpu_start = cpu_time()
+        wall_start = time.perf_counter()
+        result = encode()
+        wall += time.perf_counter() - wall_start
+        cpu += cpu_time() - cpu_start
+    return wall / iterations, cpu / iterations, result
+
+def flac_decode(flac_data):
+    process = subprocess.run(
+        [get_flac_converter(), "--decode", "--stdout", "--totally-silent", "--force-raw-format",
+         "--endian=little", "--sign=signed", "-"],
+        input=flac_data, stdout=subprocess.PIPE, check=True
+    )
+    return process.stdout
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    if not is_available():
+        print("NumPy is not installed; the in-process encoder is unavailable.")
+        sys.exit(1)
+
+    print(f"{'duration':>8}  {'subprocess ms':>13}  {'cpu ms':>7}  {'in-process ms':>13}  {'cpu ms':>7}  {'size ratio':>10}  roundtrip")
+    for seconds in DURATIONS:
+        raw = synthetic_speech(seconds)
+        audio = sr.AudioData(raw, RATE, 2)
+        sub_wall, sub_cpu, sub_flac = measure(lambda: audio.get_flac_data(convert_width=2), args.iterations)
+        inp_wall, inp_cpu, inp_flac = measure(lambda: encode_flac(raw, RATE), args.iterations)
+        roundtrip = "ok" if flac_decode(inp_flac) == raw else "MISMATCH"
+        print(f"{seconds:>7}s  {sub_wall * 1000:>13.1f}  {sub_cpu * 1000:>7.1f}  {inp_wall * 1000:>13.1f}  "
+              f"{inp_cpu * 1000:>7.1f}  {len(inp_flac) / len(sub_flac):>10.2f}  {roundtrip}")
+
+if __name__ == "__main__":
+    main()
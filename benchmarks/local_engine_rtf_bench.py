@@ -0,0 +1,98 @@
+"""
+Benchmark the offline recognition engine's real-time factor on CPU.
+
+Usage:
+    python benchmarks/local_engine_rtf_bench.py MODEL_PATH [WAV ...] [--workers N] [--repeat N]
+
+Real-time factor (RTF) is processing time divided by audio duration; below 1.0
+the engine keeps up with live speech. Without WAV files a synthetic 1-30 s
+signal is used, which measures compute cost but produces no words. Utterances
+are submitted concurrently, so aggregate throughput scales with --workers.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import local_engine
+
+RATE = 16000
+DURATIONS = [1, 3, 10, 30]
+
+def write_synthetic_wav(path, seconds, seed=0):
+    rng = random.Random(seed)
+    samples = array("h", (
+        max(-32768, min(32767, int(4000 * math.sin(2 * math.pi * 200 * n / RATE) + rng.gauss(0, 300))))
+        for n in range(int(seconds * RATE))
+    ))
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(samples.tobytes())
+
+def wav_seconds(path):
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / float(wf.getframerate())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("wavs", nargs="*")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not local_engine.is_available(args.model_path):
+        print("Vosk is not installed or the model path does not exist.")
+        sys.exit(1)
+
+    temp_dir = None
+    wavs = args.wavs
+    if not wavs:
+        temp_dir = tempfile.TemporaryDirectory()
+        wavs = []
+        for seconds in DURATIONS:
+            path = os.path.join(temp_dir.name, f"synthetic_{seconds}s.wav")
+            write_synthetic_wav(path, seconds)
+            wavs.append(path)
+
+    load_start = time.perf_counter()
+    pool = local_engine.start_pool(args.model_path, args.workers)
+    print(f"Model load (warm pool of {args.workers}): {time.perf_counter() - load_start:.2f}s")
+
+    try:
+        print(f"{'file':<28} {'audio s':>8} {'latency s':>10} {'RTF':>6}")
+        for path in wavs:
+            seconds = wav_seconds(path)
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pool.submit(local_engine.transcribe_file, path).result()
+                latencies.append(time.perf_counter() - start)
+            best = min(latencies)
+            print(f"{os.path.basename(path):<28} {seconds:>8.1f} {best:>10.3f} {best / seconds:>6.3f}")
+
+        total_audio = sum(wav_seconds(path) for path in wavs) * args.repeat
+        start = time.perf_counter()
+        futures = [pool.submit(local_engine.transcribe_file, path) for path in wavs for _ in range(args.repeat)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+        print(f"Concurrent throughput: {total_audio:.1f}s audio in {elapsed:.2f}s "
+              f"(aggregate RTF {elapsed / total_audio:.3f})")
+    finally:
+        pool.shutdown()
+        if temp_dir:
+            temp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
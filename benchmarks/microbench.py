@@ -0,0 +1,334 @@
+"""
+Microbenchmarks for the hot components, compared against a stored baseline.
+
+Usage:
+    python benchmarks/microbench.py                 compare with benchmarks/microbench_baseline.json
+    python benchmarks/microbench.py --save          run and store the results as the new baseline
+    python benchmarks/microbench.py -k history      only cases whose name contains "history"
+    python benchmarks/microbench.py --threshold 0.3 allowed slowdown before a case counts as a regression
+
+Cases:
+    match[N]           trigger matching (TriggerMatcher, as used by find_triggers) of one
+                       transcript against N phrases; compile[N] builds the automaton
+    history_append[N]  append_to_transcript_history to a history of N recent lines
+                       (includes the prune pass it runs on every append)
+    history_prune[N]   prune_transcript_history of N lines, half of them expired
+    wav[S]/flac[S]     WAV writing and in-process FLAC encoding of an S second utterance
+    condition[S]       audio conditioning (high-pass, gain, limiter) of a quiet S second
+                       utterance with a clipping peak, in place
+    resample[R/C]      Resampler converting one 30 ms block captured at R Hz with C channels
+                       to 16 kHz mono (native-rate device capture, per frame)
+    vad_loop           vad_based_recording's per-frame loop over 60 s of synthetic audio
+                       replayed as fast as possible (per frame)
+    process_output     ProcessManager._read_process_output reading 4 MiB of log output (per MiB)
+
+Times are the best of several runs, per operation. Cases whose dependencies are
+not installed are skipped. The exit status is 1 if any case is slower than
+baseline * (1 + threshold). Baselines are machine-specific: re-save after
+changing hardware and compare only runs from the same machine.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.trigger_matcher import TriggerMatcher
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+MIN_RUN_SECONDS = 0.2
+RATE = 16000
+
+def best_time(fn, repeat=5, number=None):
+    """
+    Best per-call time of fn over `repeat` runs of `number` calls (auto-sized to MIN_RUN_SECONDS).
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= MIN_RUN_SECONDS or number >= 1 << 20:
+                break
+            number *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def best_time_with_setup(setup, fn, repeat=5):
+    """
+    Best time of fn(setup()) where only fn is timed.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def synthetic_speech(seconds, seed=0):
+    rng = random.Random(seed)
+    samples = array("h")
+    for n in range(int(seconds * RATE)):
+        t = n / RATE
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+        value = envelope * (6000 * math.sin(2 * math.pi * 180 * t) + 2500 * math.sin(2 * math.pi * 720 * t))
+        samples.append(max(-32768, min(32767, int(value + rng.gauss(0, 200)))))
+    return samples.tobytes()
+
+# --- cases -------------------------------------------------------------------
+
+def synthetic_triggers(phrases, rng):
+    words = [f"w{i}" for i in range(5000)]
+    triggers = []
+    for i in range(0, phrases, 2):
+        triggers.append({"phrases": [" ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+                                     for _ in range(min(2, phrases - i))],
+                         "url": f"http://localhost/{i}"})
+    transcripts = [" ".join(rng.choice(words) for _ in range(20)) for _ in range(50)]
+    return triggers, transcripts
+
+def case_matching(results, selected):
+    for phrases in (10, 100, 1000, 10000):
+        rng = random.Random(phrases)
+        triggers, transcripts = synthetic_triggers(phrases, rng)
+        matcher = TriggerMatcher()
+        if selected(f"compile[{phrases}]"):
+            def compile_once():
+                matcher.set_triggers("bench", triggers)
+                matcher._automaton()
+            results[f"compile[{phrases}]"] = best_time(compile_once, repeat=3)
+        matcher.set_triggers("bench", triggers)
+        if selected(f"match[{phrases}]"):
+            results[f"match[{phrases}]"] = best_time(
+                lambda: [matcher.match(text, "bench") for text in transcripts]) / len(transcripts)
+
+def case_history(results, selected):
+    from modules.history_manager import append_to_transcript_history, prune_transcript_history
+    directory = tempfile.mkdtemp(prefix="microbench_")
+    path = os.path.join(directory, "history.txt")
+    now = time.time()
+
+    def history_lines(count, expired_every=None):
+        lines = []
+        for i in range(count):
+            age = 7200 if expired_every and i % expired_every == 0 else 60
+            stamp = time.strftime("%H:%M:%S", time.localtime(now - age))
+            lines.append(f"[Bench {stamp}] turn the lights on please number {i}\n")
+        return "".join(lines)
+
+    def write(text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    for count in (1000, 10000, 100000):
+        repeat = 5 if count < 100000 else 3
+        if selected(f"history_append[{count}]"):
+            recent = history_lines(count)
+            results[f"history_append[{count}]"] = best_time_with_setup(
+                lambda: write(recent), lambda p: append_to_transcript_history("new entry", p, "Bench"), repeat)
+        if selected(f"history_prune[{count}]"):
+            half_expired = history_lines(count, expired_every=2)
+            results[f"history_prune[{count}]"] = best_time_with_setup(
+                lambda: write(half_expired), prune_transcript_history, repeat)
+    shutil.rmtree(directory, ignore_errors=True)
+
+def case_encoding(results, selected):
+    from modules.transcriber import write_wav
+    try:
+        from modules.flac_encoder import encode_flac
+    except ImportError:
+        encode_flac = None
+    for seconds in (1, 3, 10, 30):
+        pcm = synthetic_speech(seconds)
+        if selected(f"wav[{seconds}s]"):
+            results[f"wav[{seconds}s]"] = best_time(lambda: write_wav(io.BytesIO(), pcm, 1, 2, RATE))
+        if encode_flac is not None and selected(f"flac[{seconds}s]"):
+            results[f"flac[{seconds}s]"] = best_time(lambda: encode_flac(pcm, RATE), repeat=3)
+
+def case_resample(results, selected):
+    from modules.audio_devices import Resampler, np
+    if np is None:
+        raise ImportError("NumPy is not installed")
+    rng = random.Random(5)
+    for rate, channels in ((48000, 2), (48000, 1), (44100, 2), (32000, 1)):
+        name = f"resample[{rate // 1000 if rate % 1000 == 0 else rate / 1000}k/{channels}]"
+        if not selected(name):
+            continue
+        block_frames = round(rate * 0.03)
+        blocks = [array("h", (rng.randint(-8000, 8000) for _ in range(block_frames * channels))).tobytes()
+                  for _ in range(16)]
+        resampler = Resampler(rate, channels)
+        results[name] = best_time(lambda: [resampler.process(block) for block in blocks]) / len(blocks)
+
+def case_conditioning(results, selected):
+    from modules.conditioning import Conditioner, np
+    if np is None:
+        raise ImportError("NumPy is not installed")
+    conditioner = Conditioner()
+    for seconds in (1, 3, 10, 30):
+        name = f"condition[{seconds}s]"
+        if not selected(name):
+            continue
+        quiet = array("h", (sample // 16 for sample in array("h", synthetic_speech(seconds))))
+        quiet[len(quiet) // 2] = 30000
+        pcm = quiet.tobytes()
+        results[name] = best_time_with_setup(lambda: memoryview(bytearray(pcm)), conditioner.process)
+
+def case_vad_loop(results, selected):
+    if not selected("vad_loop"):
+        return
+    from modules import audio_recorder
+    from modules.utils import state
+
+    directory = tempfile.mkdtemp(prefix="microbench_")
+    path = os.path.join(directory, "session.wav")
+    rng = random.Random(3)
+    # Alternating speech (3-8 s) and silence (0.5-2 s), 60 s in total
+    pcm = bytearray()
+    while len(pcm) < 60 * RATE * 2:
+        pcm += synthetic_speech(rng.uniform(3, 8), seed=len(pcm))
+        pcm += bytes(int(rng.uniform(0.5, 2) * RATE) * 2)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(bytes(pcm))
+    frames = len(pcm) // (audio_recorder.FRAME_SIZE * 2)
+
+    def run():
+        state.running = True
+        audio_recorder.vad_based_recording(source_spec={"type": "file", "path": path, "realtime": False},
+                                           submit=lambda audio, session, flags, release: release())
+    results["vad_loop"] = best_time(run, repeat=3, number=1) / frames
+    shutil.rmtree(directory, ignore_errors=True)
+
+CHILD_WRITER = (
+    "import sys\n"
+    "line = b'INFO: Initial transcript (Google): turn the lights on please\\n'\n"
+    "total = int(sys.argv[1])\n"
+    "written = 0\n"
+    "while written < total:\n"
+    "    chunk = line * 64\n"
+    "    sys.stdout.buffer.write(chunk[:total - written])\n"
+    "    written += len(chunk[:total - written])\n"
+    "sys.stdout.flush()\n"
+    "sys.stdin.read()\n"
+)
+
+def case_process_output(results, selected):
+    if not selected("process_output"):
+        return
+    from modules.process_launcher import ProcessManager
+    total = 4 * 1024 * 1024
+
+    def run_once():
+        received = [0]
+        done = threading.Event()
+
+        def on_output(text):
+            received[0] += len(text)
+            if received[0] >= total:
+                done.set()
+
+        manager = ProcessManager(on_output_callback=on_output)
+        manager.process = subprocess.Popen([sys.executable, "-c", CHILD_WRITER, str(total)],
+                                           stdout=subprocess.PIPE, stdin=subprocess.PIPE)
+        reader = threading.Thread(target=manager._read_process_output, daemon=True)
+        start = time.perf_counter()
+        reader.start()
+        done.wait(timeout=60)
+        elapsed = time.perf_counter() - start
+        manager.process.stdin.close()
+        manager.process.wait()
+        reader.join(timeout=5)
+        return elapsed
+
+    results["process_output"] = min(run_once() for _ in range(3)) / (total / (1024 * 1024))
+
+CASES = [case_matching, case_history, case_encoding, case_conditioning, case_resample, case_vad_loop,
+         case_process_output]
+
+# --- runner ------------------------------------------------------------------
+
+def format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("-k", dest="keyword", default="", help="only run cases whose name contains this")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline (default %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    selected = lambda name: args.keyword in name
+    results = {}
+    for case in CASES:
+        try:
+            case(results, selected)
+        except ImportError as e:
+            print(f"skipped {case.__name__[5:]}: {e}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+
+    regressions = []
+    print(f"{'case':<24} {'time':>12} {'baseline':>12} {'ratio':>7}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base:
+            ratio = value / base
+            status = ""
+            if ratio > 1 + args.threshold:
+                status = "  REGRESSION"
+                regressions.append(name)
+            elif ratio < 1 - args.threshold:
+                status = "  faster"
+            print(f"{name:<24} {format_time(value):>12} {format_time(base):>12} {ratio:>6.2f}x{status}")
+        else:
+            print(f"{name:<24} {format_time(value):>12} {'-':>12} {'':>7}")
+
+    if args.save:
+        merged = dict(baseline)
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": f"{platform.machine()} {platform.system()}, Python {platform.python_version()}",
+                       "saved": time.strftime("%Y-%m-%d"), "results": merged}, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
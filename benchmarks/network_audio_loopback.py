@@ -0,0 +1,140 @@
+"""
+Loopback test for network audio ingestion: throughput, added latency and gap accounting.
+
+Usage:
+    python benchmarks/network_audio_loopback.py [--seconds S] [--jitter-ms MS]
+        [--loss PCT] [--reorder PCT] [--protocols tcp,websocket]
+
+For each protocol a NetworkSource listens on 127.0.0.1 and a NetworkSender
+connects to it, exactly as audio_sender.py does; the recorder side is
+simulated by a thread calling source.read() like vad_based_recording.
+
+  - line rate:  frames sent back to back; frames/s and multiple of real time
+  - real time:  frames paced at 30 ms; latency from send to read (p50/p99/max)
+  - impaired:   real-time pacing with --loss % of packets dropped and --reorder %
+                swapped with their successor; checks that every dropped packet
+                is counted as lost and concealed, and reports the added latency
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.network_audio import NetworkSource, NetworkSender
+
+FRAME_BYTES = 960
+FRAME_SECONDS = 0.03
+STAMP = struct.Struct("<Id")  # frame index, send time
+
+def make_frame(index, sent):
+    return STAMP.pack(index, sent) + bytes(FRAME_BYTES - STAMP.size)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def receive(source, frames, latencies, stats, done):
+    """
+    Read frames like the recorder does, timing each against its send stamp.
+    """
+    received = 0
+    while received < frames:
+        frame = source.read(stats)
+        if frame is None:
+            break
+        now = time.perf_counter()
+        received += 1
+        index, sent = STAMP.unpack_from(frame)
+        if sent:
+            latencies.append((now - sent) * 1000)
+    stats["frames_read"] = received
+    done.set()
+
+def run(protocol, frames, paced, jitter_ms, loss=0.0, reorder=0.0, seed=1):
+    source = NetworkSource("127.0.0.1", 0, protocol, FRAME_BYTES, jitter_ms, idle_timeout=2.0)
+    source.open()
+    sender = NetworkSender("127.0.0.1", source.port, protocol)
+    latencies, stats, done = [], {}, threading.Event()
+    reader = threading.Thread(target=receive, args=(source, frames, latencies, stats, done), daemon=True)
+    reader.start()
+
+    rng = random.Random(seed)
+    dropped = 0
+    held = None
+    start = time.perf_counter()
+    for index in range(frames):
+        if paced:
+            delay = start + index * FRAME_SECONDS - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        packet = sender.packet(make_frame(index, time.perf_counter()))
+        if rng.random() < loss:
+            dropped += 1
+            continue
+        if held is not None:
+            sender.conn.sendall(packet)
+            sender.conn.sendall(held)
+            held = None
+        elif rng.random() < reorder:
+            held = packet
+        else:
+            sender.conn.sendall(packet)
+    if held is not None:
+        sender.conn.sendall(held)
+    # One more packet so a trailing loss is detected as a gap
+    sender.send(bytes(FRAME_BYTES))
+    done.wait(timeout=frames * FRAME_SECONDS + 10)
+    elapsed = time.perf_counter() - start
+    sender.close()
+    source.close()
+    return {
+        "frames": stats.get("frames_read", 0),
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "dropped": dropped,
+        "lost": stats.get("lost", 0),
+        "late": stats.get("late", 0),
+        "reordered": stats.get("reordered", 0),
+        "bytes": source.bytes_received,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio per real-time run")
+    parser.add_argument("--line-rate-frames", type=int, default=50000)
+    parser.add_argument("--jitter-ms", type=float, default=60.0)
+    parser.add_argument("--loss", type=float, default=2.0, help="percent of packets dropped")
+    parser.add_argument("--reorder", type=float, default=5.0, help="percent of packets reordered")
+    parser.add_argument("--protocols", default="tcp,websocket")
+    args = parser.parse_args()
+    frames = int(args.seconds / FRAME_SECONDS)
+
+    for protocol in args.protocols.split(","):
+        protocol = protocol.strip()
+        r = run(protocol, args.line_rate_frames, False, args.jitter_ms)
+        rate = r["frames"] / r["elapsed"]
+        print(f"{protocol} line rate: {r['frames']} frames in {r['elapsed']:.2f}s = {rate:,.0f} frames/s, "
+              f"{r['bytes'] / r['elapsed'] / 1e6:.1f} MB/s, {rate * FRAME_SECONDS:,.0f}x real time")
+
+        r = run(protocol, frames, True, args.jitter_ms)
+        lat = r["latencies"]
+        print(f"{protocol} real time: {r['frames']} frames, latency p50 {percentile(lat, 50):.2f} ms, "
+              f"p99 {percentile(lat, 99):.2f} ms, max {max(lat or [0]):.2f} ms")
+
+        r = run(protocol, frames, True, args.jitter_ms, args.loss / 100, args.reorder / 100)
+        lat = r["latencies"]
+        check = "ok" if r["lost"] == r["dropped"] else "MISMATCH"
+        print(f"{protocol} impaired ({args.loss:g}% loss, {args.reorder:g}% reorder): dropped {r['dropped']}, "
+              f"counted lost {r['lost']} ({check}), reordered {r['reordered']}, late {r['late']}, "
+              f"latency p50 {percentile(lat, 50):.2f} ms, p99 {percentile(lat, 99):.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Compare the legacy list/deque recording buffers with the preallocated arenas.
+
+Usage:
+    python benchmarks/recording_buffer_bench.py [--utterances N] [--seconds S]
+
+Both recorders run the per-frame bookkeeping of vad_based_recording over the
+same synthetic frames and VAD decisions (PyAudio and webrtcvad are not needed).
+Reported per recorder: time per frame (untraced run), memory blocks allocated
+during the run and peak traced memory (tracemalloc), and the bytes copied to
+build the buffer handed to the worker.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.audio_buffer import ArenaPool, PrebufferRing
+
+FRAME_BYTES = 480 * 2
+PREBUFFER_FRAMES = 33
+MAX_RECORDING_FRAMES = 1000
+MAX_SILENT_FRAMES = 50
+
+def make_input(utterances, seconds):
+    """
+    Frames as PyAudio would return them, plus a speech/silence pattern:
+    0.5 s silence, `seconds` of speech, 1.5 s silence per utterance.
+    """
+    frames = [bytes([i % 256]) * FRAME_BYTES for i in range(64)]
+    pattern = []
+    for _ in range(utterances):
+        pattern += [False] * 17 + [True] * int(seconds * 1000 / 30) + [False] * MAX_SILENT_FRAMES
+    return frames, pattern
+
+class LegacyRecorder:
+    def __init__(self, handoff):
+        self.handoff = handoff
+        self.continuous_buffer = deque(maxlen=int(16000 * 5 / 480))
+        self.prebuffer = deque(maxlen=PREBUFFER_FRAMES)
+        self.is_recording = False
+        self.current_frames = []
+        self.silent = self.speech = 0
+        self.copied = 0
+
+    def feed(self, frame, is_speech):
+        self.continuous_buffer.append(frame)
+        self.prebuffer.append(frame)
+        if not self.is_recording:
+            self.speech = self.speech + 1 if is_speech else 0
+            if self.speech >= 3:
+                self.is_recording = True
+                self.current_frames = list(self.prebuffer)
+                self.silent = self.speech = 0
+        else:
+            self.current_frames.append(frame)
+            self.silent = self.silent + 1 if not is_speech else 0
+            if self.silent >= MAX_SILENT_FRAMES or len(self.current_frames) >= MAX_RECORDING_FRAMES:
+                pcm = b"".join(self.current_frames)
+                self.copied += len(pcm)
+                self.handoff(pcm, None)
+                self.is_recording = False
+                self.current_frames = []
+                self.silent = self.speech = 0
+
+class ArenaRecorder:
+    def __init__(self, handoff):
+        self.handoff = handoff
+        self.prebuffer = PrebufferRing(PREBUFFER_FRAMES, FRAME_BYTES)
+        self.pool = ArenaPool(MAX_RECORDING_FRAMES + PREBUFFER_FRAMES, FRAME_BYTES)
+        self.is_recording = False
+        self.arena = None
+        self.silent = self.speech = 0
+        self.copied = 0
+
+    def feed(self, frame, is_speech):
+        if not self.is_recording:
+            self.prebuffer.push(frame, is_speech)
+            self.speech = self.speech + 1 if is_speech else 0
+            if self.speech >= 3:
+                self.is_recording = True
+                self.arena = self.pool.acquire()
+                self.prebuffer.copy_into(self.arena)
+                self.silent = self.speech = 0
+        else:
+            self.arena.append(frame, is_speech)
+            self.silent = self.silent + 1 if not is_speech else 0
+            if self.silent >= MAX_SILENT_FRAMES or self.arena.frames >= MAX_RECORDING_FRAMES:
+                self.prebuffer.load_tail(self.arena)
+                self.handoff(self.arena.pcm_view(), self.arena.release)
+                self.is_recording = False
+                self.arena = None
+                self.silent = self.speech = 0
+
+def run(recorder_class, frames, pattern, traced):
+    received = []
+
+    def handoff(pcm, release):
+        received.append(len(pcm))
+        if release:
+            release()
+
+    recorder = recorder_class(handoff)
+    # Warm up so one-time allocations (pools, rings, deques filling) are not counted
+    for i, is_speech in enumerate(pattern[:300]):
+        recorder.feed(frames[i % len(frames)], is_speech)
+    recorder.copied = 0
+
+    if traced:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for i, is_speech in enumerate(pattern):
+        recorder.feed(frames[i % len(frames)], is_speech)
+    elapsed = time.perf_counter() - start
+    result = {"elapsed": elapsed, "copied": recorder.copied, "received": received}
+    if traced:
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        diff = after.compare_to(before, "filename")
+        result["peak"] = peak
+        result["retained_blocks"] = sum(stat.count_diff for stat in diff)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--utterances", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    frames, pattern = make_input(args.utterances, args.seconds)
+    print(f"{len(pattern)} frames, {args.utterances} utterances of {args.seconds}s")
+    print(f"{'recorder':<8} {'us/frame':>9} {'peak KB':>9} {'retained blocks':>16} {'handoff copy KB':>16}")
+    lengths = {}
+    for name, recorder_class in (("legacy", LegacyRecorder), ("arena", ArenaRecorder)):
+        timed = run(recorder_class, frames, pattern, traced=False)
+        traced = run(recorder_class, frames, pattern, traced=True)
+        lengths[name] = timed["received"]
+        print(f"{name:<8} {timed['elapsed'] / len(pattern) * 1e6:>9.2f} {traced['peak'] / 1024:>9.1f} "
+              f"{traced['retained_blocks']:>16} {timed['copied'] / 1024:>16.1f}")
+    assert lengths["legacy"] == lengths["arena"], "recorders produced different utterance lengths"
+
+if __name__ == "__main__":
+    main()
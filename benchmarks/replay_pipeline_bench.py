@@ -0,0 +1,115 @@
+"""
+Replay a recording through the real recorder (VAD, arenas, segmentation plan)
+as fast as possible, without recognition.
+
+Usage:
+    python benchmarks/replay_pipeline_bench.py [PATH] [--runs N] [--profile]
+
+PATH is a 16 kHz mono 16-bit WAV file or a directory of them, e.g. a session
+recorded with `whisper.py --tap recordings/`. Without PATH a synthetic
+session (speech-like bursts separated by pauses) is generated.
+
+Each run reports the speed as a multiple of real time and a fingerprint of
+the utterance boundaries and segment plans, which must be identical across
+runs (the pipeline is deterministic on replayed input). --profile prints the
+top functions of one run under cProfile.
+"""
+
+import argparse
+import cProfile
+import hashlib
+import math
+import os
+import pstats
+import random
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import audio_recorder
+from modules.transcriber import plan_segments
+from modules.utils import state
+
+RATE = 16000
+
+def synthesize(path, seconds=120, seed=7):
+    """
+    Write bursts of a noisy, modulated tone (1-12 s) separated by 0.3-2 s pauses.
+    """
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < seconds * RATE:
+        burst = int(rng.uniform(1, 12) * RATE)
+        freq = rng.uniform(120, 300)
+        for i in range(burst):
+            envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * i / RATE)
+            samples.append(int(8000 * envelope * math.sin(2 * math.pi * freq * i / RATE) + rng.gauss(0, 300)))
+        samples.extend(int(rng.gauss(0, 30)) for _ in range(int(rng.uniform(0.3, 2.0) * RATE)))
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(struct.pack(f"<{len(samples)}h", *[max(-32768, min(32767, s)) for s in samples]))
+
+def audio_seconds(path):
+    paths = [path] if not os.path.isdir(path) else [
+        os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".wav")]
+    total = 0.0
+    for p in paths:
+        with wave.open(p, "rb") as wf:
+            total += wf.getnframes() / wf.getframerate()
+    return total
+
+def run(path):
+    """
+    Replay once; returns (seconds, utterances, fingerprint).
+    """
+    utterances = []
+    digest = hashlib.sha256()
+
+    def submit(audio_data, stream_session, vad_flags, release):
+        segments = plan_segments(vad_flags)
+        digest.update(hashlib.sha256(audio_data[0]).digest())
+        digest.update(repr(segments).encode("ascii"))
+        utterances.append(len(vad_flags))
+        release()
+
+    state.running = True
+    start = time.perf_counter()
+    audio_recorder.vad_based_recording(source_spec={"type": "file", "path": path, "realtime": False}, submit=submit)
+    return time.perf_counter() - start, utterances, digest.hexdigest()[:16]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), "replay_bench_session.wav")
+        if not os.path.exists(path):
+            synthesize(path)
+    total = audio_seconds(path)
+    print(f"Replaying {path} ({total:.0f}s of audio)")
+
+    fingerprints = set()
+    for i in range(args.runs):
+        elapsed, utterances, fingerprint = run(path)
+        fingerprints.add(fingerprint)
+        print(f"run {i + 1}: {elapsed:.2f}s, {total / elapsed:,.0f}x real time, "
+              f"{len(utterances)} utterance(s), fingerprint {fingerprint}")
+    print("deterministic" if len(fingerprints) == 1 else "NOT deterministic: runs differ")
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(run, path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+End-of-speech to transcript latency: whole-file upload vs. streamed upload, cold vs. pre-warmed connections.
+
+Usage:
+    python benchmarks/streamed_upload_bench.py [--seconds S] [--uplink-kbps K]
+        [--connect-ms MS] [--processing-ms MS] [--runs N]
+
+A local HTTP server stands in for the Whisper API: it reads request bodies at
+--uplink-kbps, charges --connect-ms once per new connection (DNS, TCP and TLS
+handshakes to a real service) and answers --processing-ms after the upload is
+complete. Audio is produced in real time (30 ms frames) for --seconds, then:
+
+  - whole file, cold:      WAV written and uploaded on a new connection (the old path)
+  - whole file, prewarmed: the connection was opened at speech onset (prewarm())
+  - streamed, prewarmed:   frames uploaded with chunked transfer while "speaking"
+
+For the streamed upload the bytes still in flight at the end of speech are reported.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.http_client import session
+from modules.recognizers import WhisperApiBackend
+from modules.transcriber import write_wav
+
+RATE = 16000
+FRAME_BYTES = 960
+FRAME_SECONDS = 0.03
+
+class ServiceStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    uplink_bytes_per_second = 125000
+    connect_seconds = 0.15
+    processing_seconds = 0.3
+
+    def setup(self):
+        time.sleep(self.connect_seconds)
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            block = self.rfile.read(min(4096, size - len(data)))
+            if not block:
+                break
+            time.sleep(len(block) / self.uplink_bytes_per_second)
+            data += block
+        return data
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            total = 0
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return total
+                total += len(self._read(size))
+                self.rfile.readline()
+        return len(self._read(int(self.headers.get("Content-Length", 0))))
+
+    def _respond(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(b"")
+
+    def do_POST(self):
+        self._read_body()
+        time.sleep(self.processing_seconds)
+        self._respond(b'{"text": "turn the lights on"}')
+
+def speak(seconds, on_frame=None):
+    """
+    Produce frames in real time; returns the PCM.
+    """
+    frames = int(seconds / FRAME_SECONDS)
+    start = time.perf_counter()
+    pcm = bytearray()
+    for i in range(frames):
+        delay = start + i * FRAME_SECONDS - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        frame = bytes([i % 251]) * FRAME_BYTES
+        pcm += frame
+        if on_frame:
+            on_frame(frame)
+    return bytes(pcm)
+
+def whole_file(backend, seconds, prewarm):
+    session.close()  # drop pooled connections
+    if prewarm:
+        threading.Thread(target=backend.prewarm, daemon=True).start()
+    pcm = speak(seconds)
+    ended = time.perf_counter()
+    path = os.path.join(tempfile.gettempdir(), "streamed_upload_bench.wav")
+    write_wav(path, pcm, 1, 2, RATE)
+    backend.transcribe(path)
+    os.remove(path)
+    return (time.perf_counter() - ended) * 1000, len(pcm)
+
+def streamed(backend, seconds):
+    session.close()
+    threading.Thread(target=backend.prewarm, daemon=True).start()
+    done = threading.Event()
+    upload = backend.open_upload_stream(RATE, 2, 1, lambda text, error: done.set())
+    speak(seconds, upload.feed)
+    ended = time.perf_counter()
+    upload.finish()
+    done.wait(timeout=60)
+    return (time.perf_counter() - ended) * 1000, upload.tail_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3.0, help="utterance length")
+    parser.add_argument("--uplink-kbps", type=float, default=1000.0)
+    parser.add_argument("--connect-ms", type=float, default=150.0)
+    parser.add_argument("--processing-ms", type=float, default=300.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    ServiceStandIn.uplink_bytes_per_second = args.uplink_kbps * 1000 / 8
+    ServiceStandIn.connect_seconds = args.connect_ms / 1000
+    ServiceStandIn.processing_seconds = args.processing_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ServiceStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = WhisperApiBackend(f"http://127.0.0.1:{server.server_port}/v1/audio/transcriptions", "bench", "en")
+
+    print(f"{args.seconds:g}s utterances, {args.uplink_kbps:g} kbit/s uplink, {args.connect_ms:g} ms connection setup, "
+          f"{args.processing_ms:g} ms processing")
+    results = {}
+    for name, run in (("whole file, cold", lambda: whole_file(backend, args.seconds, False)),
+                      ("whole file, prewarmed", lambda: whole_file(backend, args.seconds, True)),
+                      ("streamed, prewarmed", lambda: streamed(backend, args.seconds))):
+        latencies = []
+        for _ in range(args.runs):
+            latency, size = run()
+            latencies.append(latency)
+        results[name] = min(latencies)
+        detail = f"{size / 1024:.1f} KiB uploaded after end of speech" if name.startswith("whole") else \
+            f"{size / 1024:.1f} KiB in flight at end of speech"
+        print(f"{name:<24} {results[name]:8.0f} ms  ({detail})")
+    baseline = results["whole file, cold"]
+    for name in ("whole file, prewarmed", "streamed, prewarmed"):
+        print(f"{name}: {baseline - results[name]:.0f} ms gained")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import threading
+
+def arena_size(max_frames, frame_bytes):
+    """
+    Bytes needed for an arena: the PCM followed by one VAD flag per frame.
+    """
+    return max_frames * (frame_bytes + 1)
+
+class RecordingArena:
+    """
+    Preallocated buffer for one utterance: PCM frames plus one VAD flag per frame.
+
+    Frames are copied into place, so recording does not grow lists or build
+    new byte strings, and the finished utterance is exported as memoryview
+    slices without joining. The arena goes back to its pool via release()
+    once the worker is done with the views.
+
+    By default the arena owns its memory; pass `buffer` (at least
+    arena_size() bytes, e.g. a shared memory block) to record into it instead.
+    """
+    def __init__(self, max_frames, frame_bytes, pool=None, buffer=None):
+        self.max_frames = max_frames
+        self.frame_bytes = frame_bytes
+        if buffer is None:
+            self.pcm = bytearray(max_frames * frame_bytes)
+            self.vad = bytearray(max_frames)
+        else:
+            view = memoryview(buffer)
+            self.pcm = view[:max_frames * frame_bytes]
+            self.vad = view[max_frames * frame_bytes:arena_size(max_frames, frame_bytes)]
+        # Writes through a memoryview skip bytearray's resize handling
+        self._pcm = memoryview(self.pcm)
+        self.frames = 0
+        self.pool = pool
+
+    def reset(self):
+        self.frames = 0
+
+    def is_full(self):
+        return self.frames >= self.max_frames
+
+    def append(self, frame, is_speech):
+        offset = self.frames * self.frame_bytes
+        self._pcm[offset:offset + self.frame_bytes] = frame
+        self.vad[self.frames] = 1 if is_speech else 0
+        self.frames += 1
+
+    def pcm_view(self):
+        """
+        Zero-copy view of the recorded PCM.
+        """
+        return self._pcm[:self.frames * self.frame_bytes]
+
+    def iter_frames(self):
+        """
+        Yield zero-copy views of each recorded frame.
+        """
+        view = self._pcm
+        for i in range(self.frames):
+            yield view[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+
+    def vad_view(self):
+        """
+        Zero-copy view of the per-frame VAD flags (1 = speech).
+        """
+        return memoryview(self.vad)[:self.frames]
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def close(self):
+        """
+        Drop the arena's views of its buffer (needed before a shared memory block can be closed).
+        """
+        self._pcm.release()
+        if isinstance(self.pcm, memoryview):
+            self.pcm.release()
+            self.vad.release()
+
+class ArenaPool:
+    """
+    Recycles arenas between utterances. An utterance keeps its arena until its
+    worker releases it; a new arena is only allocated if all are still in use.
+    """
+    def __init__(self, max_frames, frame_bytes, preallocate=2):
+        self.max_frames = max_frames
+        self.frame_bytes = frame_bytes
+        self.lock = threading.Lock()
+        self.free = [RecordingArena(max_frames, frame_bytes, self) for _ in range(preallocate)]
+        self.allocated = preallocate
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                arena = self.free.pop()
+            else:
+                arena = RecordingArena(self.max_frames, self.frame_bytes, self)
+                self.allocated += 1
+        arena.reset()
+        return arena
+
+    def release(self, arena):
+        with self.lock:
+            self.free.append(arena)
+
+class PrebufferRing:
+    """
+    Fixed-size ring holding the most recent frames (and VAD flags) before speech onset.
+    """
+    def __init__(self, num_frames, frame_bytes):
+        self.num_frames = num_frames
+        self.frame_bytes = frame_bytes
+        self.pcm = bytearray(num_frames * frame_bytes)
+        self.vad = bytearray(num_frames)
+        self._pcm = memoryview(self.pcm)
+        self.next = 0
+        self.count = 0
+
+    def push(self, frame, is_speech):
+        offset = self.next * self.frame_bytes
+        self._pcm[offset:offset + self.frame_bytes] = frame
+        self.vad[self.next] = 1 if is_speech else 0
+        self.next = (self.next + 1) % self.num_frames
+        self.count = min(self.count + 1, self.num_frames)
+
+    def clear(self):
+        self.next = 0
+        self.count = 0
+
+    def load_tail(self, arena):
+        """
+        Refill the ring from the last frames of a finished recording, so frames
+        need not be pushed to the ring while recording.
+        """
+        count = min(self.num_frames, arena.frames)
+        start = arena.frames - count
+        fb = self.frame_bytes
+        self._pcm[0:count * fb] = arena._pcm[start * fb:arena.frames * fb]
+        self.vad[0:count] = memoryview(arena.vad)[start:arena.frames]
+        self.count = count
+        self.next = count % self.num_frames
+
+    def copy_into(self, arena):
+        """
+        Copy the buffered frames, oldest first, to the start of an arena.
+        """
+        start = (self.next - self.count) % self.num_frames
+        first = min(self.count, self.num_frames - start)
+        second = self.count - first
+        fb = self.frame_bytes
+        arena._pcm[0:first * fb] = self._pcm[start * fb:(start + first) * fb]
+        arena.vad[0:first] = memoryview(self.vad)[start:start + first]
+        if second:
+            arena._pcm[first * fb:self.count * fb] = self._pcm[0:second * fb]
+            arena.vad[first:self.count] = memoryview(self.vad)[0:second]
+        arena.frames = self.count
@@ -0,0 +1,164 @@
+"""
+Input device selection and native-format capture.
+
+Devices are chosen by index or by (part of) their name. Instead of asking the
+host audio stack for 16 kHz mono, which makes it resample (or fails on many
+interfaces), the device is opened at its native rate and channel count and
+the audio is downmixed and resampled here with a vectorized polyphase filter,
+one capture block at a time. ResampledStream wraps the PyAudio stream, so the
+capture loops read 16 kHz mono frames from it exactly as from a plain stream.
+
+Without NumPy the device is opened at 16 kHz mono as before.
+
+This module is imported in the capture process, so it must not import the
+configuration.
+"""
+
+import logging
+from math import gcd
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+PA_INT16 = 8  # pyaudio.paInt16
+MAX_NATIVE_CHANNELS = 2  # multi-input interfaces: only the first channels are mixed unless "channels" says otherwise
+TAPS_PER_PHASE = 48  # within 1 dB to 6 kHz; aliases from 10 kHz down by >75 dB (48/44.1 kHz)
+ROLLOFF = 0.9  # filter cutoff relative to the lower Nyquist frequency
+KAISER_BETA = 8.0
+
+def input_devices(p_audio):
+    """
+    (index, name, max input channels, default sample rate) of every input device.
+    """
+    devices = []
+    for index in range(p_audio.get_device_count()):
+        info = p_audio.get_device_info_by_index(index)
+        if info.get("maxInputChannels", 0) > 0:
+            devices.append((index, info["name"], int(info["maxInputChannels"]), int(info["defaultSampleRate"])))
+    return devices
+
+def find_input_device(p_audio, device):
+    """
+    Device index for an AUDIO_SOURCE "device" setting: None (default device), an
+    index, or a name; names match exactly first, then as a case-insensitive substring.
+    Raises OSError if no input device matches.
+    """
+    if device is None or device == "":
+        return None
+    if isinstance(device, int) or str(device).isdigit():
+        return int(device)
+    devices = input_devices(p_audio)
+    wanted = str(device).lower()
+    for exact in (True, False):
+        for index, name, _, _ in devices:
+            if (name.lower() == wanted) if exact else (wanted in name.lower()):
+                return index
+    names = ", ".join(f"{index}: {name}" for index, name, _, _ in devices) or "none"
+    raise OSError(f"No input device matches '{device}' (input devices: {names})")
+
+class Resampler:
+    """
+    Interleaved 16-bit PCM at (rate, channels) to mono int16 at out_rate, block by block.
+
+    Channels are averaged, then a Kaiser-windowed sinc filter is applied as a
+    polyphase bank for the rational ratio out_rate/rate. The last input samples
+    are kept between blocks, so block boundaries are seamless.
+    """
+    def __init__(self, rate, channels, out_rate=16000, taps_per_phase=TAPS_PER_PHASE):
+        g = gcd(rate, out_rate)
+        self.up = out_rate // g
+        self.down = rate // g
+        self.channels = channels
+        self.taps = taps_per_phase
+        length = taps_per_phase * self.up
+        cutoff = ROLLOFF * 0.5 / max(self.up, self.down)  # cycles per sample at rate * up
+        n = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+        h *= self.up / h.sum()
+        # phases[p, k] = h[p + k * up]: the taps applied to x[base - k] for output phase p
+        self.phases = h.reshape(taps_per_phase, self.up).T.astype(np.float32)
+        self.history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self.offsets = np.arange(taps_per_phase)
+        self.consumed = 0  # input samples before the current block
+        self.produced = 0  # output samples so far
+
+    def process(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            samples = samples[:len(samples) - len(samples) % self.channels].reshape(-1, self.channels)
+            mono = samples.mean(axis=1, dtype=np.float32)
+        else:
+            mono = samples.astype(np.float32)
+        if self.up == 1 and self.down == 1:
+            return mono.astype(np.int16).tobytes()
+
+        buffer = np.concatenate((self.history, mono))
+        available = self.consumed + len(mono)
+        # Every output sample whose newest input sample has arrived
+        end = (available * self.up - 1) // self.down + 1
+        positions = np.arange(self.produced, end, dtype=np.int64) * self.down
+        base = positions // self.up - self.consumed + self.taps - 1
+        windows = buffer[base[:, None] - self.offsets]
+        out = np.einsum("ij,ij->i", windows, self.phases[positions % self.up])
+
+        self.history = buffer[len(buffer) - (self.taps - 1):]
+        self.consumed = available
+        self.produced = end
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+class ResampledStream:
+    """
+    A native-format PyAudio stream that reads like a 16 kHz mono one.
+    """
+    def __init__(self, stream, resampler, block_frames):
+        self.stream = stream
+        self.resampler = resampler
+        self.block_frames = block_frames
+        self.pending = bytearray()
+
+    def read(self, frames, exception_on_overflow=True):
+        wanted = frames * 2
+        while len(self.pending) < wanted:
+            # An overflow raised here leaves `pending` intact for the retry
+            self.pending += self.resampler.process(self.stream.read(self.block_frames, exception_on_overflow))
+        frame = bytes(self.pending[:wanted])
+        del self.pending[:wanted]
+        return frame
+
+    def stop_stream(self):
+        self.stream.stop_stream()
+
+    def close(self):
+        self.stream.close()
+
+def open_device_stream(p_audio, device=None, native=True, channels=None, rate=16000, frame_size=480):
+    """
+    Open an input device for 16-bit capture of `frame_size` frames at `rate`, mono.
+
+    With native=True (and NumPy installed) the device runs at its default sample
+    rate and channel count (at most `channels`, default MAX_NATIVE_CHANNELS) and a
+    ResampledStream converts; if that cannot be opened, it falls back to `rate` mono.
+    """
+    index = find_input_device(p_audio, device)
+    if native and np is not None:
+        info = p_audio.get_device_info_by_index(index) if index is not None else p_audio.get_default_input_device_info()
+        native_rate = int(info["defaultSampleRate"])
+        native_channels = max(1, min(int(info["maxInputChannels"]), channels or MAX_NATIVE_CHANNELS))
+        if (native_rate, native_channels) != (rate, 1):
+            block_frames = max(1, round(native_rate * frame_size / rate))
+            try:
+                stream = p_audio.open(format=PA_INT16, channels=native_channels, rate=native_rate, input=True,
+                                      input_device_index=index, frames_per_buffer=block_frames)
+            except (OSError, ValueError) as e:
+                log.warning("Could not open '%s' at its native %d Hz/%d channel(s) (%s); using %d Hz mono",
+                            info["name"], native_rate, native_channels, e, rate)
+            else:
+                log.info("Capturing from '%s' at %d Hz, %d channel(s), resampled to %d Hz mono",
+                         info["name"], native_rate, native_channels, rate)
+                return ResampledStream(stream, Resampler(native_rate, native_channels, rate), block_frames)
+    return p_audio.open(format=PA_INT16, channels=1, rate=rate, input=True,
+                        input_device_index=index, frames_per_buffer=frame_size)
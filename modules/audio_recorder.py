@@ -1,14 +1,35 @@
+import logging
 import pyaudio
 import webrtcvad
 import threading
-from collections import deque
-from modules.config_manager import SILENCE_DURATION, FIREBOT_REQUIRED
+import time
+from modules.config_manager import (SILENCE_DURATION, FIREBOT_REQUIRED, STREAMING_MODE, CAPTURE_SLOTS, AUDIO_SOURCE,
+                                   TELEMETRY_ENABLED, TELEMETRY_FILE)
 from modules.utils import state
 from modules.process_monitor import check_firebot_status
-from modules.transcriber import process_recording_async
+from modules.transcriber import process_recording_async, prewarm_backends
+from modules.streaming import open_session
+from modules.audio_buffer import ArenaPool, PrebufferRing
+from modules.capture_process import CaptureProcess, STATS_INTERVAL
+from modules.input_sources import make_source, is_live
+from modules.profiler import register_gauge
+from modules.telemetry import open_writer
+from modules.audio_devices import open_device_stream
 
-# Global used in original logic, kept here or in state
-continuous_buffer = deque(maxlen=int(16000 * 5 / 480))
+log = logging.getLogger(__name__)
+
+# Audio and VAD configuration
+RATE = 16000
+CHANNELS = 1
+FORMAT = pyaudio.paInt16
+FRAME_DURATION_MS = 30  # milliseconds per frame
+FRAME_SIZE = int(RATE * FRAME_DURATION_MS / 1000)
+PREBUFFER_DURATION = 1.0  # seconds
+PREBUFFER_FRAMES = int(PREBUFFER_DURATION * 1000 / FRAME_DURATION_MS)
+MAX_RECORDING_DURATION_MS = 30 * 1000  # 30 seconds
+MAX_RECORDING_FRAMES = int(MAX_RECORDING_DURATION_MS / FRAME_DURATION_MS)
+VAD_MODE = 2  # moderate aggressiveness
+MIN_SPEECH_FRAMES = 3  # minimum consecutive speech frames to trigger recording
 
 def initialize_pyaudio():
     """
@@ -18,96 +39,343 @@ def initialize_pyaudio():
         state.p_audio = pyaudio.PyAudio()
     return state.p_audio
 
-def vad_based_recording():
+def open_input_stream(p_inst, device=None, native=True, channels=None):
+    """
+    Open the microphone input stream: the default input device unless `device` (index or name)
+    is given, captured at its native format and converted to 16 kHz mono (see modules.audio_devices).
+    """
+    return open_device_stream(p_inst, device, native, channels, RATE, FRAME_SIZE)
+
+def wait_until_listening(tick=True):
+    """
+    Block while listening is paused. Returns False if the system shut down meanwhile.
+    tick is False for tenant loops, which do not drive state.loop_tick.
+    """
+    while state.running and not state.listening.wait(0.5):
+        pass
+    if tick:
+        # Restart the loop age the launcher's heartbeats check, so the pause does not count as a stall
+        state.loop_tick = time.monotonic()
+    return state.running
+
+# Utterance worker threads started by start_processing (see wait_for_processing)
+processing_threads = []
+register_gauge("processing_threads", lambda: sum(1 for t in processing_threads if t.is_alive()))
+
+def start_processing(audio_data, stream_session, vad_flags, release):
+    """
+    Default hand-off for finished utterances: one worker thread each.
+    """
+    worker = threading.Thread(
+        target=process_recording_async,
+        args=(audio_data, stream_session, vad_flags, release),
+        daemon=True
+    )
+    worker.start()
+    processing_threads[:] = [t for t in processing_threads if t.is_alive()] + [worker]
+
+def wait_for_processing(timeout=None):
+    """
+    Wait for utterances still being processed (e.g. after a replayed file ends).
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for worker in list(processing_threads):
+        worker.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+def vad_based_recording(profile=None, source_spec=None, submit=start_processing):
     """
     Start a VAD-based recording system:
       - Uses a prebuffer to capture 1 second before speech detection.
+      - Records into preallocated arenas and hands finished utterances to
+        workers as memoryviews (no per-frame lists or final join).
       - Starts recording upon detecting speech.
       - Stops recording after silence is detected or max duration is reached.
-    """
-    # Audio and VAD configuration
-    RATE = 16000
-    CHANNELS = 1
-    FORMAT = pyaudio.paInt16
-    FRAME_DURATION_MS = 30  # milliseconds per frame
-    FRAME_SIZE = int(RATE * FRAME_DURATION_MS / 1000)
-    PREBUFFER_DURATION = 1.0  # seconds
-    PREBUFFER_FRAMES = int(PREBUFFER_DURATION * 1000 / FRAME_DURATION_MS)
-    MAX_RECORDING_DURATION_MS = 30 * 1000  # 30 seconds
+      - If streaming is enabled, feeds frames to a streaming session while recording.
+      - Pre-warms the cloud engines' connections when speech starts.
+      - Reads from the AUDIO_SOURCE input source: the microphone, a network
+        stream or a replayed recording (see modules.input_sources); an idle
+        source ends the utterance and a finished one (end of file) ends recording.
+      - Counts input overflows and lost network packets and reports them periodically.
+      - While paused (control API) the input source is closed; an utterance in
+        progress is discarded.
+      - With push-to-talk enabled, audio is only processed while the button is
+        held; releasing it ends the current utterance.
+      - Publishes each frame's level and VAD/recording state for the GUI meter
+        (modules.telemetry, memory-mapped; not in server mode).
 
+    In server mode (modules.tenant_server) each tenant runs this loop with its
+    own profile and audio source; utterances go to `submit` (the shared worker
+    pool) and the Firebot check and streaming recognition are skipped.
+    """
     # Set up VAD with moderate aggressiveness
-    vad = webrtcvad.Vad(2)
+    vad = webrtcvad.Vad(VAD_MODE)
 
-    # Initialize PyAudio stream
+    # Initialize PyAudio and the input source
     p_inst = initialize_pyaudio()
-    stream = p_inst.open(format=FORMAT,
-                         channels=CHANNELS,
-                         rate=RATE,
-                         input=True,
-                         frames_per_buffer=FRAME_SIZE)
+    sample_width = p_inst.get_sample_size(FORMAT)
+    frame_bytes = FRAME_SIZE * sample_width * CHANNELS
+    spec = AUDIO_SOURCE if source_spec is None else source_spec
+    source = make_source(spec, lambda *device: open_input_stream(p_inst, *device), FRAME_SIZE, frame_bytes)
+    if not wait_until_listening(profile is None):
+        return
+    try:
+        source.open()
+    except OSError as e:
+        log.error("Could not open audio source: %s", e)
+        return
 
-    prebuffer = deque(maxlen=PREBUFFER_FRAMES)
+    # Preallocated buffers: frames are copied into place rather than collected in
+    # lists, and finished utterances are handed over as memoryviews of their arena
+    prebuffer = PrebufferRing(PREBUFFER_FRAMES, frame_bytes)
+    arena_pool = ArenaPool(MAX_RECORDING_FRAMES + PREBUFFER_FRAMES, frame_bytes)
 
     # State variables for recording
     is_recording = False
-    current_frames = []
+    arena = None  # holds the current utterance's frames and per-frame VAD decisions
+    stream_session = None
     silent_frames = 0
     speech_frames = 0
-    min_speech_frames = 3   # minimum consecutive speech frames to trigger recording
+    min_speech_frames = MIN_SPEECH_FRAMES
     max_silent_frames = int(SILENCE_DURATION * 1000 / FRAME_DURATION_MS)
 
-    print("Optimized VAD-based recording started. Waiting for speech...")
+    capture_stats = {"overflows": 0}
+    if profile is None:
+        state.capture_stats = capture_stats
+    reported_losses = 0
+    last_report = 0.0
+    telemetry = open_writer(TELEMETRY_FILE, FRAME_DURATION_MS, log) if profile is None and TELEMETRY_ENABLED else None
+
+    log.info("Optimized VAD-based recording started. Waiting for speech...")
+
+    check_firebot = profile is None and FIREBOT_REQUIRED and is_live(spec)
+
+    while state.running and (profile is None or profile.active):
+        if profile is None:
+            state.loop_tick = time.monotonic()
 
-    while state.running:
         # Check Firebot status periodically
         # Note: firebot status check can modify state.running
-        if FIREBOT_REQUIRED and not check_firebot_status(state):
+        if check_firebot and not check_firebot_status(state):
             break
         
         # If state.running became false from external signal, break
         if not state.running:
             break
 
-        # Read the next audio frame
-        # exception_on_overflow=False matches original behavior
-        frame = stream.read(FRAME_SIZE, exception_on_overflow=False)
-        continuous_buffer.append(frame)
-        prebuffer.append(frame)
+        if not state.listening.is_set():
+            # Paused: drop the utterance in progress and release the microphone
+            if is_recording:
+                if stream_session:
+                    stream_session.abort()
+                arena.release()
+                is_recording = False
+                arena = None
+                stream_session = None
+            source.close()
+            log.info("Listening paused; input source closed.")
+            if not wait_until_listening(profile is None):
+                break
+            source.open()
+            prebuffer.clear()
+            silent_frames = 0
+            speech_frames = 0
+            log.info("Listening resumed.")
+            continue
+
+        # Read the next audio frame; overflows and lost packets are counted rather than hidden
+        frame = source.read(capture_stats)
+        losses = capture_stats["overflows"] + capture_stats.get("lost", 0)
+        if losses != reported_losses and time.monotonic() - last_report >= STATS_INTERVAL:
+            log.warning("Capture: %d input overflow(s) or lost packet(s) since last report", losses - reported_losses)
+            reported_losses = losses
+            last_report = time.monotonic()
+
+        # No audio from the source right now (e.g. the network sender disconnected)
+        end_of_input = frame is None
+        if end_of_input and not is_recording:
+            if source.finished:
+                break
+            continue
+
+        # Push-to-talk: nothing outside a button press is buffered or recorded
+        gated = state.is_gated()
+        if gated and not is_recording:
+            prebuffer.clear()
+            speech_frames = 0
+            if telemetry:
+                telemetry.publish(frame, False, False, gated=True)
+            continue
 
         try:
-            is_speech = vad.is_speech(frame, RATE)
+            is_speech = False if end_of_input else vad.is_speech(frame, RATE)
         except Exception as e:
-            print(f"VAD error: {e}")
+            log.error("VAD error: %s", e)
             is_speech = False
 
         if not is_recording:
+            prebuffer.push(frame, is_speech)
             if is_speech:
                 speech_frames += 1
                 if speech_frames >= min_speech_frames:
-                    print("Speech detected, starting recording...")
+                    log.info("Speech detected, starting recording...")
                     is_recording = True
-                    current_frames = list(prebuffer)
+                    # Connect to the cloud engines while the user is still talking
+                    prewarm_backends(profile)
+                    arena = arena_pool.acquire()
+                    prebuffer.copy_into(arena)
+                    # Feed partial results to the trigger matcher while the user is still talking
+                    stream_session = open_session(RATE) if profile is None else None
+                    if stream_session:
+                        stream_session.feed_many(arena.iter_frames())
                     silent_frames = 0
                     speech_frames = 0
             else:
                 speech_frames = 0
         else:
-            current_frames.append(frame)
+            if not end_of_input:
+                arena.append(frame, is_speech)
+                if stream_session:
+                    stream_session.feed(frame)
             silent_frames = silent_frames + 1 if not is_speech else 0
 
-            # Stop recording if silence persists or max duration reached
-            if (silent_frames >= max_silent_frames) or (len(current_frames) >= int(MAX_RECORDING_DURATION_MS / FRAME_DURATION_MS)):
-                audio_data = (current_frames, CHANNELS, p_inst.get_sample_size(FORMAT), RATE)
-                threading.Thread(
-                    target=process_recording_async,
-                    args=(audio_data,),
-                    daemon=True
-                ).start()
+            # Stop recording if silence persists, max duration is reached, push-to-talk was released
+            # or the source went idle
+            if end_of_input or gated or (silent_frames >= max_silent_frames) or (arena.frames >= MAX_RECORDING_FRAMES):
+                audio_data = (arena.pcm_view(), CHANNELS, sample_width, RATE)
+                # The prebuffer continues from the end of this recording
+                prebuffer.load_tail(arena)
+                if stream_session:
+                    stream_session.end_input()
+                submit(audio_data, stream_session, arena.vad_view(), arena.release)
                 is_recording = False
-                current_frames = []
+                arena = None
+                stream_session = None
                 silent_frames = 0
                 speech_frames = 0
 
-    stream.stop_stream()
-    stream.close()
-    print("VAD-based recording stopped.")
+        if telemetry and not end_of_input:
+            telemetry.publish(frame, is_speech, is_recording, gated)
+
+    source.close()
+    if telemetry:
+        telemetry.close()
+    log.info("VAD-based recording stopped.")
+
+def capture_settings():
+    """
+    Recording parameters passed to the capture process.
+    """
+    frame_bytes = FRAME_SIZE * 2 * CHANNELS  # paInt16
+    return {
+        "rate": RATE,
+        "channels": CHANNELS,
+        "frame_size": FRAME_SIZE,
+        "frame_bytes": frame_bytes,
+        "vad_mode": VAD_MODE,
+        "prebuffer_frames": PREBUFFER_FRAMES,
+        "max_recording_frames": MAX_RECORDING_FRAMES,
+        "max_frames": MAX_RECORDING_FRAMES + PREBUFFER_FRAMES,
+        "min_speech_frames": MIN_SPEECH_FRAMES,
+        "max_silent_frames": int(SILENCE_DURATION * 1000 / FRAME_DURATION_MS),
+        "frame_ms": FRAME_DURATION_MS,
+        "telemetry_file": TELEMETRY_FILE if TELEMETRY_ENABLED else None,
+        "device": AUDIO_SOURCE.get("device"),
+        "native_rate": AUDIO_SOURCE.get("native_rate", True),
+        "device_channels": AUDIO_SOURCE.get("channels"),
+    }
+
+def report_capture_stats(stats, previous):
+    """
+    Print capture process stats when dropouts or dropped utterances have occurred.
+    """
+    overflows = stats["overflows"] - previous.get("overflows", 0)
+    dropped = stats["dropped_utterances"] - previous.get("dropped_utterances", 0)
+    if overflows or dropped:
+        log.warning("Capture: %d input overflow(s), %d utterance(s) dropped (no free slot) "
+                    "since last report; max read gap %.0f ms", overflows, dropped, stats["max_read_gap_ms"])
+
+def log_final_capture_stats(stats):
+    if stats:
+        state.capture_stats = stats
+        log.info("Capture process stopped: %d frames, %d overflow(s), %d utterance(s), %d dropped.",
+                 stats["frames"], stats["overflows"], stats["utterances"], stats["dropped_utterances"])
+
+def process_based_recording():
+    """
+    Run audio capture and VAD in a dedicated process (CAPTURE_MODE = "process"):
+      - The capture process records utterances into shared memory slots, so
+        transcription, HTTP calls and logging here cannot starve the capture loop.
+      - Only (slot, frames) descriptors are received; the audio is processed in place
+        and the slot is handed back once processing is done.
+      - Input overflow counts reported by the capture process are printed.
+      - Streaming partial results are not available in this mode.
+      - While paused (control API) the capture process is stopped, which closes
+        the microphone; push-to-talk gating is forwarded to the capture process.
+    """
+    if STREAMING_MODE != "off":
+        log.warning("Streaming partial results are not supported with CAPTURE_MODE 'process'; ignoring STREAMING_MODE")
+
+    settings = capture_settings()
+    if not wait_until_listening():
+        return
+    try:
+        capture = CaptureProcess(settings, CAPTURE_SLOTS)
+    except Exception as e:
+        log.error("Could not start capture process (%s); falling back to in-process capture", e)
+        vad_based_recording()
+        return
+
+    log.info("Capture process started. Waiting for speech...")
+    sample_width = 2  # paInt16
+    last_stats = {}
+    gated = None
+
+    try:
+        while state.running:
+            state.loop_tick = time.monotonic()
+            if FIREBOT_REQUIRED and not check_firebot_status(state):
+                break
+
+            if not state.listening.is_set():
+                log_final_capture_stats(capture.stop())
+                capture = None
+                log.info("Listening paused; capture process stopped.")
+                if not wait_until_listening():
+                    break
+                capture = CaptureProcess(settings, CAPTURE_SLOTS)
+                last_stats = {}
+                gated = None
+                log.info("Listening resumed.")
+                continue
+
+            if state.is_gated() != gated:
+                gated = state.is_gated()
+                capture.set_gate(gated)
+
+            if not capture.process.is_alive():
+                log.error("Capture process exited unexpectedly.")
+                break
+
+            message = capture.receive(timeout=0.1)
+            if message is None:
+                continue
+            kind, payload = message
+            if kind == "utterance":
+                slot, frames = payload
+                pcm, vad_flags = capture.views(slot, frames)
+                log.info("Utterance captured (%d frames, slot %d)", frames, slot)
+                threading.Thread(
+                    target=process_recording_async,
+                    args=((pcm, CHANNELS, sample_width, RATE), None, vad_flags,
+                          lambda c=capture, slot=slot: c.free(slot)),
+                    daemon=True
+                ).start()
+            elif kind == "stats":
+                report_capture_stats(payload, last_stats)
+                last_stats = payload
+                state.capture_stats = payload
+    except Exception as e:
+        log.error("Capture process error: %s", e)
+    finally:
+        if capture is not None:
+            log_final_capture_stats(capture.stop())
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Seconds between ledger writes; usage is also flushed at exit
+LEDGER_SAVE_INTERVAL = 30
+
+class BudgetGovernor:
+    """
+    Rate-limits and accounts for cloud recognition calls.
+
+    Each backend (e.g. "google", "whisper") has an optional budget of:
+      - requests_per_minute
+      - audio_seconds_per_hour
+      - cost_per_minute (of audio, used for the spend ledger only)
+
+    Requests without priority may only use (1 - priority_reserve) of each budget,
+    so utterances that already matched a trigger keep getting through after
+    background chatter has used up its share. The transcriber asks for priority
+    when a trigger has matched locally before the call: a streaming partial (or
+    a segment recognized before the call started) for the first pass,
+    the first pass for the refinement.
+    """
+    def __init__(self, budgets, ledger_path=None, priority_reserve=0.2):
+        self.budgets = budgets or {}
+        self.ledger_path = ledger_path
+        self.priority_reserve = min(max(float(priority_reserve), 0.0), 1.0)
+        self.lock = threading.Lock()
+        self.requests = {}   # backend -> deque of request timestamps (last minute)
+        self.audio = {}      # backend -> deque of (timestamp, audio_seconds) (last hour)
+        self.exhausted = set()
+        self.ledger = self._load_ledger()
+        self.last_save = time.time()
+        self.dirty = False
+
+    def _load_ledger(self):
+        if not self.ledger_path or not os.path.exists(self.ledger_path):
+            return {}
+        try:
+            with open(self.ledger_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            log.error("Error reading usage ledger %s: %s", self.ledger_path, e)
+            return {}
+
+    def _prune(self, backend, now):
+        requests = self.requests.setdefault(backend, deque())
+        while requests and now - requests[0] >= 60:
+            requests.popleft()
+        audio = self.audio.setdefault(backend, deque())
+        while audio and now - audio[0][0] >= 3600:
+            audio.popleft()
+        return requests, audio
+
+    def _limit(self, value, priority):
+        if not value:
+            return None
+        return float(value) if priority else float(value) * (1.0 - self.priority_reserve)
+
+    def try_acquire(self, backend, audio_seconds, priority=False):
+        """
+        Reserve budget for one recognition call.
+        Returns True if the call may go ahead (usage is recorded), False if over budget.
+        """
+        budget = self.budgets.get(backend, {})
+        now = time.time()
+        with self.lock:
+            requests, audio = self._prune(backend, now)
+
+            rpm_limit = self._limit(budget.get("requests_per_minute"), priority)
+            if rpm_limit is not None and len(requests) + 1 > rpm_limit:
+                self._mark_exhausted(backend, "requests per minute", priority)
+                return False
+
+            audio_limit = self._limit(budget.get("audio_seconds_per_hour"), priority)
+            used_audio = sum(seconds for _, seconds in audio)
+            if audio_limit is not None and used_audio + audio_seconds > audio_limit:
+                self._mark_exhausted(backend, "audio seconds per hour", priority)
+                return False
+
+            requests.append(now)
+            audio.append((now, audio_seconds))
+            if backend in self.exhausted:
+                self.exhausted.discard(backend)
+                log.info("Budget for %s available again", backend)
+            self._record_usage(backend, audio_seconds, budget)
+        self._maybe_save()
+        return True
+
+    def _mark_exhausted(self, backend, limit_name, priority):
+        if backend not in self.exhausted:
+            self.exhausted.add(backend)
+            scope = "priority" if priority else "non-priority"
+            log.warning("Budget exhausted for %s (%s, %s request). Degrading.", backend, limit_name, scope)
+
+    def _record_usage(self, backend, audio_seconds, budget):
+        day = time.strftime("%Y-%m-%d", time.localtime())
+        entry = self.ledger.setdefault(day, {}).setdefault(
+            backend, {"requests": 0, "audio_seconds": 0.0, "cost": 0.0}
+        )
+        entry["requests"] += 1
+        entry["audio_seconds"] = round(entry["audio_seconds"] + audio_seconds, 3)
+        cost = float(budget.get("cost_per_minute", 0.0)) * audio_seconds / 60.0
+        entry["cost"] = round(entry["cost"] + cost, 6)
+        self.dirty = True
+
+    def is_exhausted(self, backend):
+        with self.lock:
+            return backend in self.exhausted
+
+    def daily_usage(self, day=None):
+        """
+        Return {backend: {"requests", "audio_seconds", "cost"}} for the given day (default today).
+        """
+        day = day or time.strftime("%Y-%m-%d", time.localtime())
+        with self.lock:
+            return json.loads(json.dumps(self.ledger.get(day, {})))
+
+    def total_cost(self):
+        """
+        Return the total recorded spend over all days in the ledger.
+        """
+        with self.lock:
+            return sum(entry.get("cost", 0.0) for day in self.ledger.values() for entry in day.values())
+
+    def _maybe_save(self):
+        if time.time() - self.last_save >= LEDGER_SAVE_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Persist the usage ledger if it has changed.
+        """
+        if not self.ledger_path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.ledger, indent=4)
+            self.dirty = False
+            self.last_save = time.time()
+        try:
+            with open(self.ledger_path, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+        except Exception as e:
+            log.error("Error writing usage ledger %s: %s", self.ledger_path, e)
@@ -0,0 +1,296 @@
+"""
+Audio capture and VAD in a dedicated process (CAPTURE_MODE = "process").
+
+The capture process reads the microphone, runs the VAD and records each
+utterance straight into one of a fixed set of shared memory slots. Only a small
+("utterance", (slot, frames)) descriptor crosses the pipe; the recognition
+process reads the audio in place and sends ("free", slot) once it is done.
+("gate", bool) turns push-to-talk gating on or off.
+Input overflows (dropouts) are counted instead of silently ignored and reported
+with ("stats", dict) every STATS_INTERVAL seconds and on shutdown.
+Each frame's level and VAD state go to the GUI meter through the memory-mapped
+telemetry file (modules.telemetry), not the pipe.
+
+This module is imported in the capture process, so it must not import the
+configuration or any transcription/GUI modules.
+"""
+
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+from modules.audio_buffer import RecordingArena, PrebufferRing, arena_size
+from modules.telemetry import open_writer
+from modules.audio_devices import open_device_stream
+
+# pyaudio.paInputOverflowed; kept here so capture_loop runs without PyAudio (see the stress benchmark)
+PA_INPUT_OVERFLOWED = -9981
+STATS_INTERVAL = 10.0
+READY_TIMEOUT = 10.0
+
+def read_frame(stream, frame_size, stats):
+    """
+    Read one frame, counting input overflows instead of hiding them.
+    PyAudio discards the overflowed read, so the read is retried.
+    """
+    while True:
+        try:
+            return stream.read(frame_size, exception_on_overflow=True)
+        except IOError as e:
+            if PA_INPUT_OVERFLOWED not in e.args:
+                raise
+            stats["overflows"] += 1
+
+def capture_loop(stream, vad, conn, arenas, settings):
+    """
+    Record utterances into the given arenas (one per shared memory slot) until ("stop", None) arrives.
+
+    settings holds rate, frame_size, frame_bytes, prebuffer_frames,
+    max_recording_frames, min_speech_frames and max_silent_frames; frame_ms
+    and telemetry_file (optional) enable the level/VAD telemetry.
+    """
+    rate = settings["rate"]
+    frame_size = settings["frame_size"]
+    max_recording_frames = settings["max_recording_frames"]
+    min_speech_frames = settings["min_speech_frames"]
+    max_silent_frames = settings["max_silent_frames"]
+
+    free_slots = list(range(len(arenas)))
+    prebuffer = PrebufferRing(settings["prebuffer_frames"], settings["frame_bytes"])
+    # Used when every slot is still being transcribed: the utterance is recorded
+    # (so VAD state stays consistent) but dropped instead of blocking capture
+    spare = RecordingArena(arenas[0].max_frames, settings["frame_bytes"])
+
+    stats = {"frames": 0, "overflows": 0, "utterances": 0, "dropped_utterances": 0,
+             "max_read_gap_ms": 0.0, "wall_seconds": 0.0}
+    started = last_read = last_stats = time.monotonic()
+    is_recording = False
+    arena = None
+    slot = None
+    silent_frames = 0
+    speech_frames = 0
+    gated = False
+    telemetry = open_writer(settings["telemetry_file"], settings["frame_ms"]) if settings.get("telemetry_file") else None
+
+    while True:
+        # Slots handed back by the recognition process, push-to-talk gating, or a stop request
+        while conn.poll():
+            kind, payload = conn.recv()
+            if kind == "free":
+                free_slots.append(payload)
+            elif kind == "gate":
+                gated = payload
+            elif kind == "stop":
+                stats["wall_seconds"] = time.monotonic() - started
+                conn.send(("stats", stats))
+                if telemetry:
+                    telemetry.close()
+                return
+
+        frame = read_frame(stream, frame_size, stats)
+        now = time.monotonic()
+        stats["frames"] += 1
+        stats["max_read_gap_ms"] = max(stats["max_read_gap_ms"], (now - last_read) * 1000)
+        last_read = now
+
+        # Push-to-talk: nothing outside a button press is buffered or recorded
+        if gated and not is_recording:
+            prebuffer.clear()
+            speech_frames = 0
+            if telemetry:
+                telemetry.publish(frame, False, False, gated=True)
+            continue
+
+        try:
+            is_speech = vad.is_speech(frame, rate)
+        except Exception as e:
+            print(f"VAD error: {e}", flush=True)
+            is_speech = False
+
+        if not is_recording:
+            prebuffer.push(frame, is_speech)
+            if is_speech:
+                speech_frames += 1
+                if speech_frames >= min_speech_frames:
+                    is_recording = True
+                    if free_slots:
+                        slot = free_slots.pop()
+                        arena = arenas[slot]
+                    else:
+                        slot = None
+                        arena = spare
+                    arena.reset()
+                    prebuffer.copy_into(arena)
+                    silent_frames = 0
+                    speech_frames = 0
+            else:
+                speech_frames = 0
+        else:
+            arena.append(frame, is_speech)
+            silent_frames = silent_frames + 1 if not is_speech else 0
+
+            if gated or (silent_frames >= max_silent_frames) or (arena.frames >= max_recording_frames):
+                prebuffer.load_tail(arena)
+                if slot is None:
+                    stats["dropped_utterances"] += 1
+                else:
+                    stats["utterances"] += 1
+                    conn.send(("utterance", (slot, arena.frames)))
+                is_recording = False
+                arena = None
+                slot = None
+                silent_frames = 0
+                speech_frames = 0
+
+        if telemetry:
+            telemetry.publish(frame, is_speech, is_recording, gated)
+
+        if now - last_stats >= STATS_INTERVAL:
+            stats["wall_seconds"] = now - started
+            conn.send(("stats", dict(stats)))
+            stats["max_read_gap_ms"] = 0.0
+            last_stats = now
+
+def run_capture(conn, slot_names, settings, stream, vad):
+    """
+    Attach to the shared memory slots and run capture_loop on an already opened stream.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    arenas = [RecordingArena(settings["max_frames"], settings["frame_bytes"], buffer=block.buf)
+              for block in blocks]
+    conn.send(("ready", None))
+    try:
+        capture_loop(stream, vad, conn, arenas, settings)
+    finally:
+        for arena in arenas:
+            arena.close()
+        for block in blocks:
+            block.close()
+
+def capture_worker(conn, slot_names, settings):
+    """
+    Process entry point: open the microphone and VAD, then run the capture loop.
+    """
+    import pyaudio
+    import webrtcvad
+
+    p_audio = pyaudio.PyAudio()
+    stream = open_device_stream(p_audio, settings.get("device"), settings.get("native_rate", True),
+                                settings.get("device_channels"), settings["rate"], settings["frame_size"])
+    try:
+        run_capture(conn, slot_names, settings, stream, webrtcvad.Vad(settings["vad_mode"]))
+    finally:
+        stream.stop_stream()
+        stream.close()
+        p_audio.terminate()
+
+class CaptureProcess:
+    """
+    Owns the shared memory slots and the capture process, seen from the recognition side.
+
+    `worker` and `runner` are the process entry point and the class used to run
+    it; the dropout stress benchmark swaps in a simulated microphone and a thread.
+    """
+    def __init__(self, settings, slots, worker=capture_worker, runner=multiprocessing.Process):
+        self.settings = settings
+        size = arena_size(settings["max_frames"], settings["frame_bytes"])
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for _ in range(slots)]
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.send_lock = threading.Lock()
+        self.outstanding = set()  # slots handed to worker threads and not freed yet
+        self.stopped = False
+        self.process = runner(
+            target=worker, args=(child_conn, [block.name for block in self.blocks], settings), daemon=True
+        )
+        self.process.start()
+        if not self.conn.poll(READY_TIMEOUT):
+            self.stop()
+            raise RuntimeError("Capture process did not start")
+        kind, _ = self.conn.recv()
+        if kind != "ready":
+            self.stop()
+            raise RuntimeError(f"Unexpected message from capture process: {kind}")
+
+    def receive(self, timeout):
+        """
+        Return the next message from the capture process, or None after `timeout` seconds.
+        """
+        if self.conn.poll(timeout):
+            return self.conn.recv()
+        return None
+
+    def views(self, slot, frames):
+        """
+        Zero-copy views of an utterance's PCM and per-frame VAD flags.
+        """
+        with self.send_lock:
+            self.outstanding.add(slot)
+        frame_bytes = self.settings["frame_bytes"]
+        buf = self.blocks[slot].buf
+        vad_start = self.settings["max_frames"] * frame_bytes
+        return buf[:frames * frame_bytes], buf[vad_start:vad_start + frames]
+
+    def set_gate(self, gated):
+        """
+        Push-to-talk gating: while gated, no audio is buffered or recorded.
+        """
+        with self.send_lock:
+            self.conn.send(("gate", gated))
+
+    def free(self, slot):
+        """
+        Hand a slot back to the capture process (called from worker threads).
+        Once stopped, the last slot freed releases the shared memory instead.
+        """
+        with self.send_lock:
+            self.outstanding.discard(slot)
+            if not self.stopped:
+                try:
+                    self.conn.send(("free", slot))
+                except (OSError, ValueError):
+                    pass
+                return
+            release = not self.outstanding
+        if release:
+            self._release_blocks()
+
+    def stop(self):
+        """
+        Stop the capture process and release the shared memory, or leave that to the last
+        outstanding free() if worker threads are still reading slots. Returns its final stats, if any.
+        """
+        stats = None
+        try:
+            with self.send_lock:
+                self.conn.send(("stop", None))
+            deadline = time.monotonic() + 2
+            while stats is None and self.conn.poll(max(0, deadline - time.monotonic())):
+                kind, payload = self.conn.recv()
+                if kind == "stats":
+                    stats = payload
+        except (EOFError, OSError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive() and hasattr(self.process, "terminate"):
+            self.process.terminate()
+        with self.send_lock:
+            self.stopped = True
+            release = not self.outstanding
+        if release:
+            self._release_blocks()
+        return stats
+
+    def _release_blocks(self):
+        with self.send_lock:
+            blocks, self.blocks = self.blocks, []
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # A worker thread still holds a view; the mapping goes away at exit
+                pass
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,207 @@
+"""
+Audio conditioning of finished utterances before they are encoded (CONDITIONING_ENABLED).
+
+Quiet or boomy microphones are the main cause of first-pass misrecognitions.
+Each utterance is, in order:
+
+  - high-pass filtered (2nd-order Butterworth at CONDITIONING_HIGHPASS_HZ),
+    which also removes any DC offset; the IIR filter runs in blocks of
+    BLOCK samples as matrix products, and only its two output-state values
+    are carried from block to block in a scalar loop, so it is exact and
+    still vectorized,
+  - brought to CONDITIONING_TARGET_DBFS loudness, measured over the frames the
+    VAD marked as speech, with at most CONDITIONING_MAX_GAIN_DB of gain,
+  - peak limited to CONDITIONING_CEILING_DBFS with a look-ahead of one
+    LIMITER_WINDOW_MS window, so the gain never clips.
+
+Work buffers are preallocated per conditioner and conditioners are pooled, so
+concurrent utterances do not allocate per call. The PCM is rewritten in place
+when its buffer is writable (the recording arena), else a copy is returned.
+Requires NumPy; without it, conditioning is off.
+"""
+
+import logging
+import math
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+BLOCK = 256  # samples per filter block
+FRAME_MS = 30  # VAD frame length
+LIMITER_WINDOW_MS = 5
+MAX_CUT_DB = 12.0  # loud input is turned down at most this much
+SILENCE_DBFS = -50.0  # without VAD flags, quieter frames are not counted as speech
+FULL_SCALE = 32768.0
+
+def highpass_coefficients(cutoff, rate):
+    """
+    (b, a) of a 2nd-order Butterworth high-pass (Audio EQ Cookbook), a[0] = 1.
+    """
+    w0 = 2 * math.pi * cutoff / rate
+    alpha = math.sin(w0) / math.sqrt(2)  # Q = 1/sqrt(2)
+    cos_w0 = math.cos(w0)
+    a0 = 1 + alpha
+    b = ((1 + cos_w0) / 2 / a0, -(1 + cos_w0) / a0, (1 + cos_w0) / 2 / a0)
+    a = (1.0, -2 * cos_w0 / a0, (1 - alpha) / a0)
+    return b, a
+
+def _run_biquad(b, a, x, state=(0.0, 0.0, 0.0, 0.0)):
+    # Direct form I; state is (x[-1], x[-2], y[-1], y[-2])
+    x1, x2, y1, y2 = state
+    y = []
+    for sample in x:
+        out = b[0] * sample + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        x2, x1, y2, y1 = x1, sample, y1, out
+        y.append(out)
+    return y
+
+class Conditioner:
+    def __init__(self, rate=16000, highpass_hz=80.0, target_dbfs=-20.0, max_gain_db=20.0, ceiling_dbfs=-1.0,
+                 max_samples=16000 * 32):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.target_dbfs = target_dbfs
+        self.max_gain_db = max_gain_db
+        self.ceiling = math.floor(FULL_SCALE * 10 ** (ceiling_dbfs / 20))
+        self.window = max(1, int(rate * LIMITER_WINDOW_MS / 1000))
+        self.highpass = highpass_hz > 0
+        if self.highpass:
+            b, a = highpass_coefficients(highpass_hz, rate)
+            # Zero-state response of a block: x @ transfer; response to the carried-over state: state @ carry
+            impulse = np.array(_run_biquad(b, a, [1.0] + [0.0] * (BLOCK - 1)))
+            lags = np.arange(BLOCK)[None, :] - np.arange(BLOCK)[:, None]
+            self.transfer = np.where(lags >= 0, impulse[np.clip(lags, 0, None)], 0.0)
+            self.carry = np.array([_run_biquad(b, a, [0.0] * BLOCK, unit) for unit in np.eye(4)])
+        self._allocate(max_samples)
+
+    def _allocate(self, samples):
+        blocks = -(-samples // BLOCK)
+        self.input = np.zeros(blocks * BLOCK)
+        self.output = np.zeros(blocks * BLOCK)
+        self.state = np.zeros((blocks, 2))
+
+    def process(self, pcm, vad_flags=None):
+        """
+        Condition 16-bit mono PCM. Returns (pcm, info): the same buffer rewritten in
+        place if it is writable, else a conditioned copy; info has gain_db,
+        loudness_dbfs, limited and ms.
+        """
+        started = time.perf_counter()
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        n = len(samples)
+        if n > len(self.input):
+            self._allocate(n)
+        blocks = -(-n // BLOCK)
+        x = self.input[:blocks * BLOCK]
+        y = self.output[:blocks * BLOCK]
+        x[:n] = samples
+        x[n:] = 0
+
+        if self.highpass:
+            rows_in = x.reshape(blocks, BLOCK)
+            rows_out = y.reshape(blocks, BLOCK)
+            np.matmul(rows_in, self.transfer, out=rows_out)
+            rows_out[1:] += rows_in[:-1, ::-1][:, :2] @ self.carry[:2]
+            # Output state entering each block: (y[-1], y[-2]) of the finished previous block
+            (c11, c12), (c21, c22) = self.carry[2:, :-3:-1]
+            state = self.state[:blocks]
+            last = rows_out[:, -1].tolist()
+            second = rows_out[:, -2].tolist()
+            y1 = y2 = 0.0
+            for i in range(1, blocks):
+                y1, y2 = last[i - 1] + y1 * c11 + y2 * c21, second[i - 1] + y1 * c12 + y2 * c22
+                state[i] = y1, y2
+            rows_out[1:] += state[1:] @ self.carry[2:]
+        else:
+            y[:] = x
+        y = y[:n]
+
+        # Loudness of the speech frames
+        frames = n // self.frame
+        energy = np.square(y[:frames * self.frame]).reshape(frames, self.frame).mean(axis=1)
+        if vad_flags is not None and len(vad_flags) >= frames:
+            speech = np.frombuffer(bytes(vad_flags[:frames]), dtype=np.uint8) > 0
+        else:
+            speech = energy > (FULL_SCALE * 10 ** (SILENCE_DBFS / 20)) ** 2
+        if speech.any():
+            loudness = 10 * math.log10(max(float(energy[speech].mean()), 1e-9) / FULL_SCALE ** 2)
+            gain_db = min(max(self.target_dbfs - loudness, -MAX_CUT_DB), self.max_gain_db)
+        else:
+            loudness = None
+            gain_db = 0.0
+        y *= 10 ** (gain_db / 20)
+
+        limited = bool(n) and float(np.abs(y).max()) > self.ceiling
+        if limited:
+            y *= self._limiter_gain(y)
+        np.rint(y, out=y)
+        np.clip(y, -FULL_SCALE, FULL_SCALE - 1, out=y)
+
+        if isinstance(pcm, memoryview) and not pcm.readonly:
+            out = pcm
+            samples[:] = y
+        else:
+            out = y.astype(np.int16).tobytes()
+        return out, {"gain_db": gain_db, "loudness_dbfs": loudness, "limited": limited,
+                     "ms": (time.perf_counter() - started) * 1000}
+
+    def _limiter_gain(self, y):
+        """
+        Per-sample gain that keeps |y| under the ceiling: the minimum required gain over
+        each window and its neighbours, smoothed over one window (never above the requirement).
+        """
+        n = len(y)
+        w = self.window
+        chunks = -(-n // w)
+        required = np.ones(chunks * w)
+        np.minimum(1.0, self.ceiling / np.maximum(np.abs(y), 1.0), out=required[:n])
+        per_chunk = required.reshape(chunks, w).min(axis=1)
+        padded = np.concatenate(([1.0], per_chunk, [1.0]))
+        per_chunk = np.minimum(np.minimum(padded[:-2], padded[1:-1]), padded[2:])
+        gain = np.repeat(per_chunk, w)[:n]
+        smoothed = np.cumsum(np.concatenate(([0.0], np.pad(gain, (w // 2, w - 1 - w // 2), mode="edge"))))
+        return (smoothed[w:] - smoothed[:-w]) / w
+
+class ConditionerPool:
+    """
+    Conditioners with preallocated buffers, reused between utterances (one per concurrent utterance).
+    """
+    def __init__(self, **settings):
+        self.settings = settings
+        self.rate = settings.get("rate", 16000)
+        self.lock = threading.Lock()
+        self.free = [Conditioner(**settings)]
+
+    def process(self, pcm, vad_flags=None):
+        with self.lock:
+            conditioner = self.free.pop() if self.free else None
+        if conditioner is None:
+            conditioner = Conditioner(**self.settings)
+        try:
+            return conditioner.process(pcm, vad_flags)
+        finally:
+            with self.lock:
+                self.free.append(conditioner)
+
+_warned = False
+
+def make_conditioner(enabled, highpass_hz, target_dbfs, max_gain_db, ceiling_dbfs):
+    """
+    A ConditionerPool for a profile's CONDITIONING_* settings, or None if conditioning is off.
+    """
+    global _warned
+    if not enabled:
+        return None
+    if np is None:
+        if not _warned:
+            log.warning("Audio conditioning needs NumPy, which is not installed; conditioning is off")
+            _warned = True
+        return None
+    return ConditionerPool(highpass_hz=float(highpass_hz), target_dbfs=float(target_dbfs),
+                           max_gain_db=float(max_gain_db), ceiling_dbfs=float(ceiling_dbfs))
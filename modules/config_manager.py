@@ -30,20 +30,27 @@ def get_config_path():
 
 CONFIG_FILE = get_config_path()
 
-def load_config():
+def load_config(exit_on_error=True):
     """
     Load configuration from config.json.
+    With exit_on_error=False (live reload), a broken file raises ValueError instead of exiting.
     """
     config_file_path = CONFIG_FILE
     default_config = {
         "triggers": [],
         "program_path": "",
         "auto_launch": False,
+        "supervise_restarts": False,
+        "standby_instance": False,
         "trigger_words": [],
         "TRIGGER_URL": "YOUR_URL_HERE",
         "WHISPER_API_URL": "https://api.openai.com/v1/audio/transcriptions",
         "OPENAI_API_KEY": "API_KEY_HERE",
         "TRANSCRIPT_FILE": "whisperTranscript.txt",
+        "TRANSCRIPT_DELIVERY": "file",
+        "TRANSCRIPT_FILE_SINK": True,
+        "FIREBOT_TRANSPORT": "http",
+        "FIREBOT_WEBSOCKET_URL": "ws://127.0.0.1:7473/fire",
         "USE_GOOGLE_CLOUD": False,
         "GOOGLE_CLOUD_CREDENTIALS": "None",
         "FIREBOT_REQUIRED": True,
@@ -51,14 +58,73 @@ def load_config():
         "URL_CALL_COOLDOWN": 2.0,
         "SILENCE_DURATION": 1.5,
         "GOOGLE_LANGUAGE": "en-US",
+        "FIRST_PASS_LANGUAGES": [],
+        "FIRST_PASS_MAX_LANGUAGES": 3,
+        "FIRST_PASS_LANGUAGE_WORKERS": 4,
         "WHISPER_LANGUAGE": "en",
         "WHISPER_HISTORY_FILE": "whisperHistory.txt",
         "ENABLE_HISTORY": True,
         "HISTORY_LOG_PREFIX": "Oshimia",
-        "REQUIRED_PROCESS_NAME": "firebot"
+        "HISTORY_BACKEND": "text",
+        "HISTORY_DB_FILE": "whisperHistory.db",
+        "HISTORY_RETENTION_DAYS": 30,
+        "REQUIRED_PROCESS_NAME": "firebot",
+        "CLOUD_BUDGETS": {
+            "google": {"requests_per_minute": 30, "audio_seconds_per_hour": 1800, "cost_per_minute": 0.0},
+            "google_cloud": {"requests_per_minute": 30, "audio_seconds_per_hour": 1800, "cost_per_minute": 0.016},
+            "whisper": {"requests_per_minute": 20, "audio_seconds_per_hour": 900, "cost_per_minute": 0.006}
+        },
+        "BUDGET_PRIORITY_RESERVE": 0.2,
+        "USAGE_LEDGER_FILE": "cloudUsage.json",
+        "FIRST_PASS_ENGINE": "google",
+        "PRIMARY_ENGINE": "whisper",
+        "FALLBACK_ENGINE": "none",
+        "LOCAL_MODEL_PATH": "models/vosk-model-small-en-us-0.15",
+        "LOCAL_ENGINE_WORKERS": 1,
+        "STREAMING_MODE": "off",
+        "STREAMING_PARTIAL_INTERVAL": 1.0,
+        "PREWARM_CONNECTIONS": True,
+        "PREWARM_INTERVAL": 30,
+        "ENABLE_SEGMENTATION": False,
+        "SEGMENTATION_MIN_SECONDS": 8.0,
+        "SEGMENTATION_MIN_PAUSE_MS": 300,
+        "SEGMENTATION_MIN_SEGMENT_SECONDS": 2.0,
+        "SEGMENTATION_MAX_WORKERS": 4,
+        "CAPTURE_MODE": "thread",
+        "CAPTURE_SLOTS": 4,
+        "TELEMETRY_ENABLED": True,
+        "TELEMETRY_FILE": "audioTelemetry.bin",
+        "CONDITIONING_ENABLED": False,
+        "CONDITIONING_HIGHPASS_HZ": 80,
+        "CONDITIONING_TARGET_DBFS": -20,
+        "CONDITIONING_MAX_GAIN_DB": 20,
+        "CONDITIONING_CEILING_DBFS": -1,
+        "LOG_LEVEL": "INFO",
+        "LOG_FILE": "",
+        "LOG_FILE_MAX_BYTES": 1048576,
+        "LOG_FILE_BACKUPS": 3,
+        "LOG_RATE_LIMIT": 5,
+        "LOG_RATE_WINDOW": 10.0,
+        "CONTROL_API_ENABLED": False,
+        "CONTROL_API_HOST": "127.0.0.1",
+        "CONTROL_API_PORT": 8765,
+        "CONTROL_API_TOKEN": "",
+        "PUSH_TO_TALK": False,
+        "SERVER_WORKERS": 4,
+        "AUDIO_SOURCE": {"type": "device", "device": None},
+        "SHADOW_ENABLED": False,
+        "SHADOW_CONFIG": {},
+        "SHADOW_REPORT_INTERVAL": 600,
+        "SHADOW_REPORT_FILE": "shadowReport.json",
+        "SHADOW_WORKERS": 2,
+        "PROFILE_DIR": "profiles",
+        "PROFILE_SAMPLE_INTERVAL_MS": 10,
+        "PROFILE_SNAPSHOT_INTERVAL": 60,
+        "PROFILE_TRACEMALLOC_FRAMES": 10
     }
 
     if not os.path.exists(config_file_path):
+        if not exit_on_error: raise ValueError(f"{config_file_path} not found")
         print(f"INFO: {config_file_path} not found. Creating a default one.")
         try:
             with open(config_file_path, "w", encoding="utf-8") as cf: json.dump(default_config, cf, indent=4)
@@ -83,7 +149,8 @@ def load_config():
                     new_rule = {
                         "phrases": legacy_words if legacy_words else ["computer"],
                         "url": legacy_url,
-                        "cooldown": float(config.get("URL_CALL_COOLDOWN", 2.0))
+                        "cooldown": float(config.get("URL_CALL_COOLDOWN", 2.0)),
+                        "latency": "accurate"
                     }
                     config["triggers"].append(new_rule)
                     # We don't remove the old keys to avoid breaking generic get() calls elsewhere immediately,
@@ -97,8 +164,12 @@ def load_config():
 
             return config
 
-    except json.JSONDecodeError as e: print(f"CRITICAL: Error decoding {config_file_path}: {e}. Exiting."); sys.exit(1)
-    except Exception as e: print(f"CRITICAL: Could not read {config_file_path}: {e}. Exiting."); sys.exit(1)
+    except json.JSONDecodeError as e:
+        if not exit_on_error: raise ValueError(f"Error decoding {config_file_path}: {e}")
+        print(f"CRITICAL: Error decoding {config_file_path}: {e}. Exiting."); sys.exit(1)
+    except Exception as e:
+        if not exit_on_error: raise ValueError(f"Could not read {config_file_path}: {e}")
+        print(f"CRITICAL: Could not read {config_file_path}: {e}. Exiting."); sys.exit(1)
 
 def save_config(config):
     try:
@@ -110,15 +181,43 @@ def save_config(config):
 
 config = load_config()
 
+def reload_config():
+    """
+    Re-read config.json into `config` (in place) and return the top-level keys that changed.
+
+    The module-level settings below keep their startup values, except TRIGGERS,
+    which is updated in place; callers apply whatever else they can change live.
+    """
+    new_config = load_config(exit_on_error=False)
+    changed = sorted(key for key in set(config) | set(new_config) if config.get(key) != new_config.get(key))
+    config.clear()
+    config.update(new_config)
+    TRIGGERS[:] = config.get("triggers", [])
+    return changed
+
 # Configurable settings exposed as constants for compatibility
 TRIGGER_WORDS = config.get("trigger_words", ["computer"])
 TRIGGER_URL = config.get("TRIGGER_URL", "")
 WHISPER_API_URL = config.get("WHISPER_API_URL", "https://api.openai.com/v1/audio/transcriptions")
 OPENAI_API_KEY = config.get("OPENAI_API_KEY", "")
 TRANSCRIPT_FILE = config.get("TRANSCRIPT_FILE", "whisperTranscript.txt")
+# How Firebot gets the transcript: "file" (TRANSCRIPT_FILE written before the URL call), "body"
+# (JSON effect arguments in a POST) or "query" (GET parameters). With "body"/"query" the file is
+# still written in the background as a compatibility sink unless TRANSCRIPT_FILE_SINK is false.
+TRANSCRIPT_DELIVERY = config.get("TRANSCRIPT_DELIVERY", "file")
+TRANSCRIPT_FILE_SINK = config.get("TRANSCRIPT_FILE_SINK", True)
+# Trigger calls: "http" (one request per fire) or "websocket" (persistent connection to
+# FIREBOT_WEBSOCKET_URL with pipelined, acknowledged fires; see modules.firebot_transport)
+FIREBOT_TRANSPORT = config.get("FIREBOT_TRANSPORT", "http")
+FIREBOT_WEBSOCKET_URL = config.get("FIREBOT_WEBSOCKET_URL", "ws://127.0.0.1:7473/fire")
 WHISPER_HISTORY_FILE = config.get("WHISPER_HISTORY_FILE", "whisperHistory.txt")
 ENABLE_HISTORY = config.get("ENABLE_HISTORY", True)
 HISTORY_LOG_PREFIX = config.get("HISTORY_LOG_PREFIX", "")
+# History backend: "text" (WHISPER_HISTORY_FILE, last hour), "sqlite" (HISTORY_DB_FILE, searchable,
+# kept HISTORY_RETENTION_DAYS days, 0 = forever) or "both"
+HISTORY_BACKEND = config.get("HISTORY_BACKEND", "text")
+HISTORY_DB_FILE = config.get("HISTORY_DB_FILE", "whisperHistory.db")
+HISTORY_RETENTION_DAYS = float(config.get("HISTORY_RETENTION_DAYS", 30))
 USE_GOOGLE_CLOUD = config.get("USE_GOOGLE_CLOUD", False)
 GOOGLE_CLOUD_CREDENTIALS = config.get("GOOGLE_CLOUD_CREDENTIALS", "")
 FIREBOT_REQUIRED = config.get("FIREBOT_REQUIRED", False)
@@ -126,6 +225,86 @@ REQUIRED_PROCESS_NAME = config.get("REQUIRED_PROCESS_NAME", "firebot")
 URL_CALL_COOLDOWN = float(config.get("URL_CALL_COOLDOWN", 2.0))
 SILENCE_DURATION = float(config.get("SILENCE_DURATION", 1.5))
 GOOGLE_LANGUAGE = config.get("GOOGLE_LANGUAGE", "en-US")
+# Google first pass in several languages at once (e.g. ["en-US", "de-DE"], the first preferred on ties):
+# the first hypothesis that matches a trigger wins, else the most confident. At most FIRST_PASS_MAX_LANGUAGES
+# per utterance, FIRST_PASS_LANGUAGE_WORKERS calls in flight; every language is a billed call. Empty: GOOGLE_LANGUAGE
+FIRST_PASS_LANGUAGES = config.get("FIRST_PASS_LANGUAGES", [])
+FIRST_PASS_MAX_LANGUAGES = max(1, int(config.get("FIRST_PASS_MAX_LANGUAGES", 3)))
+FIRST_PASS_LANGUAGE_WORKERS = max(1, int(config.get("FIRST_PASS_LANGUAGE_WORKERS", 4)))
 WHISPER_LANGUAGE = config.get("WHISPER_LANGUAGE", "en")
 TRIGGERS = config.get("triggers", [])
+CLOUD_BUDGETS = config.get("CLOUD_BUDGETS", {})
+BUDGET_PRIORITY_RESERVE = float(config.get("BUDGET_PRIORITY_RESERVE", 0.2))
+USAGE_LEDGER_FILE = config.get("USAGE_LEDGER_FILE", "cloudUsage.json")
+# Recognition engines: "google", "whisper", "local" or "none"
+FIRST_PASS_ENGINE = config.get("FIRST_PASS_ENGINE", "google")
+PRIMARY_ENGINE = config.get("PRIMARY_ENGINE", "whisper")
+FALLBACK_ENGINE = config.get("FALLBACK_ENGINE", "none")
+LOCAL_MODEL_PATH = config.get("LOCAL_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+LOCAL_ENGINE_WORKERS = int(config.get("LOCAL_ENGINE_WORKERS", 1))
+# Streaming partial results: "off", "local" or "first_pass" (interval re-recognition stand-in);
+# "upload" streams the audio to the first-pass engine while the user speaks (chunked upload, Whisper)
+STREAMING_MODE = config.get("STREAMING_MODE", "off")
+STREAMING_PARTIAL_INTERVAL = float(config.get("STREAMING_PARTIAL_INTERVAL", 1.0))
+# Open connections to the cloud engines when speech starts, at most once per PREWARM_INTERVAL seconds
+PREWARM_CONNECTIONS = config.get("PREWARM_CONNECTIONS", True)
+PREWARM_INTERVAL = float(config.get("PREWARM_INTERVAL", 30))
+# Long recordings are split at internal pauses and the segments transcribed concurrently
+# (off by default: more cloud calls per recording, and a phrase can be cut at a pause)
+ENABLE_SEGMENTATION = config.get("ENABLE_SEGMENTATION", False)
+SEGMENTATION_MIN_SECONDS = float(config.get("SEGMENTATION_MIN_SECONDS", 8.0))
+SEGMENTATION_MIN_PAUSE_MS = int(config.get("SEGMENTATION_MIN_PAUSE_MS", 300))
+SEGMENTATION_MIN_SEGMENT_SECONDS = float(config.get("SEGMENTATION_MIN_SEGMENT_SECONDS", 2.0))
+SEGMENTATION_MAX_WORKERS = int(config.get("SEGMENTATION_MAX_WORKERS", 4))
+# Audio capture: "thread" (in this process) or "process" (dedicated capture process,
+# utterances handed over in CAPTURE_SLOTS shared memory slots)
+CAPTURE_MODE = config.get("CAPTURE_MODE", "thread")
+CAPTURE_SLOTS = max(1, int(config.get("CAPTURE_SLOTS", 4)))
+# Per-frame audio level and VAD state for the GUI meter, published through a memory-mapped file
+TELEMETRY_ENABLED = config.get("TELEMETRY_ENABLED", True)
+TELEMETRY_FILE = config.get("TELEMETRY_FILE", "audioTelemetry.bin")
+# Condition each utterance before it is encoded: high-pass at CONDITIONING_HIGHPASS_HZ (0 = off), gain towards
+# CONDITIONING_TARGET_DBFS speech loudness (at most CONDITIONING_MAX_GAIN_DB), peaks limited to CONDITIONING_CEILING_DBFS
+CONDITIONING_ENABLED = config.get("CONDITIONING_ENABLED", False)
+CONDITIONING_HIGHPASS_HZ = float(config.get("CONDITIONING_HIGHPASS_HZ", 80))
+CONDITIONING_TARGET_DBFS = float(config.get("CONDITIONING_TARGET_DBFS", -20))
+CONDITIONING_MAX_GAIN_DB = float(config.get("CONDITIONING_MAX_GAIN_DB", 20))
+CONDITIONING_CEILING_DBFS = float(config.get("CONDITIONING_CEILING_DBFS", -1))
+# Logging: level (DEBUG, INFO, WARNING, ERROR), optional rotating log file, and at most
+# LOG_RATE_LIMIT repeats of the same message per LOG_RATE_WINDOW seconds (0 = unlimited)
+LOG_LEVEL = config.get("LOG_LEVEL", "INFO")
+LOG_FILE = config.get("LOG_FILE", "")
+LOG_FILE_MAX_BYTES = int(config.get("LOG_FILE_MAX_BYTES", 1048576))
+LOG_FILE_BACKUPS = int(config.get("LOG_FILE_BACKUPS", 3))
+LOG_RATE_LIMIT = int(config.get("LOG_RATE_LIMIT", 5))
+LOG_RATE_WINDOW = float(config.get("LOG_RATE_WINDOW", 10.0))
+# Local control API (pause/resume, push-to-talk, reload, stats); also enabled by `whisper.py --daemon`
+CONTROL_API_ENABLED = config.get("CONTROL_API_ENABLED", False)
+CONTROL_API_HOST = config.get("CONTROL_API_HOST", "127.0.0.1")
+CONTROL_API_PORT = int(config.get("CONTROL_API_PORT", 8765))
+CONTROL_API_TOKEN = config.get("CONTROL_API_TOKEN", "")
+# Only process audio while the push-to-talk button (control API) is held
+PUSH_TO_TALK = config.get("PUSH_TO_TALK", False)
+# Audio input: {"type": "device", "device": index, name or null, "native_rate": true} or a network stream
+# ({"type": "network", "protocol": "tcp"/"websocket", "host", "port", "jitter_ms"}), see modules.input_sources
+AUDIO_SOURCE = config.get("AUDIO_SOURCE", {"type": "device", "device": None})
+# Shadow mode: evaluate SHADOW_CONFIG (candidate triggers/engines/keys/budgets, config.json-style
+# overrides) on a copy of every live utterance without firing anything; see modules.shadow
+SHADOW_ENABLED = config.get("SHADOW_ENABLED", False)
+SHADOW_CONFIG = config.get("SHADOW_CONFIG", {})
+SHADOW_REPORT_INTERVAL = float(config.get("SHADOW_REPORT_INTERVAL", 600))
+SHADOW_REPORT_FILE = config.get("SHADOW_REPORT_FILE", "shadowReport.json")
+SHADOW_WORKERS = int(config.get("SHADOW_WORKERS", 2))
+# Runtime profiling (`whisper.py --profile` or /profile/start): stack sampling interval,
+# tracemalloc snapshot interval and traceback depth; output in timestamped PROFILE_DIR subdirectories
+PROFILE_DIR = config.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(config.get("PROFILE_SAMPLE_INTERVAL_MS", 10))
+PROFILE_SNAPSHOT_INTERVAL = float(config.get("PROFILE_SNAPSHOT_INTERVAL", 60))
+PROFILE_TRACEMALLOC_FRAMES = int(config.get("PROFILE_TRACEMALLOC_FRAMES", 10))
+# Server mode (`whisper.py --server DIR`): utterance processing threads shared by all tenants
+SERVER_WORKERS = int(config.get("SERVER_WORKERS", 4))
+# Per-trigger latency policy: "instant" fires on the first-pass transcript,
+# "accurate" waits for the refined (Whisper) transcript when one is available.
+TRIGGER_LATENCY_MODES = ("accurate", "instant")
+DEFAULT_TRIGGER_LATENCY = "accurate"
 FIREBOT_CHECK_INTERVAL = 5
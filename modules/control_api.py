@@ -0,0 +1,193 @@
+"""
+Local HTTP control API for a long-running (daemon) listener.
+
+Listens on CONTROL_API_HOST:CONTROL_API_PORT (localhost by default). Every
+endpoint accepts GET or POST, so Firebot effects and Stream Deck buttons can
+call it with a plain URL, and returns JSON:
+
+    /status          listening state, counters, capture, cloud usage, shadow mode and Firebot transport stats
+    /pause           stop listening and close the input stream
+    /resume          reopen the input stream and listen again
+    /toggle          pause if listening, resume if paused
+    /ptt/press       push-to-talk: start processing audio (while held)
+    /ptt/release     push-to-talk: stop; ends the utterance in progress
+    /ptt/enable      turn push-to-talk gating on
+    /ptt/disable     turn push-to-talk gating off (always listening)
+    /reload          re-read config.json; triggers and LOG_LEVEL apply immediately
+    /profile/start   start the sampling profiler and memory tracker (see modules.profiler)
+    /profile/stop    stop profiling and write the final output
+    /profile         profiling status and output directory
+
+If CONTROL_API_TOKEN is set, requests must pass it as ?token=... or an
+X-Control-Token header.
+"""
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from modules.config_manager import (
+    CAPTURE_MODE, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_SNAPSHOT_INTERVAL, PROFILE_TRACEMALLOC_FRAMES,
+    config, reload_config
+)
+from modules.profiler import start_profiling, stop_profiling, profiling_status
+from modules.firebot_transport import transport_status
+from modules.utils import state
+from modules import transcriber
+from modules.transcriber import governor, reload_triggers, profiles, default_profile
+
+log = logging.getLogger(__name__)
+
+# Settings that take effect on /reload; other changed keys are reported as needing a restart
+LIVE_RELOAD_KEYS = ("triggers", "LOG_LEVEL")
+
+def status():
+    with state.counters_lock:
+        counters = dict(state.counters)
+    return {
+        "running": state.running,
+        "listening": state.listening.is_set(),
+        "push_to_talk": state.push_to_talk,
+        "ptt_held": state.ptt_held,
+        "capture_mode": CAPTURE_MODE,
+        "uptime_seconds": round(time.time() - state.started, 1),
+        "counters": counters,
+        "capture": dict(state.capture_stats),
+        "cloud_usage_today": governor.daily_usage(),
+        "tenants": {
+            profile.name: {"active": profile.active, "counters": profile.snapshot(),
+                           "cloud_usage_today": profile.governor.daily_usage()}
+            for profile in profiles if profile is not default_profile
+        },
+        "shadow": transcriber.shadow.summary() if transcriber.shadow else None,
+        "firebot_transport": transport_status(),
+    }
+
+def pause():
+    if state.listening.is_set():
+        state.listening.clear()
+        log.info("Listening paused via control API")
+    return {"listening": False}
+
+def resume():
+    if not state.listening.is_set():
+        # The pause is not a stalled audio loop (launcher heartbeats, modules.supervision);
+        # in server mode no loop drives loop_tick, so it stays unset
+        if state.loop_tick:
+            state.loop_tick = time.monotonic()
+        state.listening.set()
+        log.info("Listening resumed via control API")
+    return {"listening": True}
+
+def toggle():
+    return pause() if state.listening.is_set() else resume()
+
+def ptt_press():
+    state.ptt_held = True
+    return {"ptt_held": True}
+
+def ptt_release():
+    state.ptt_held = False
+    return {"ptt_held": False}
+
+def ptt_enable():
+    state.push_to_talk = True
+    log.info("Push-to-talk enabled")
+    return {"push_to_talk": True}
+
+def ptt_disable():
+    state.push_to_talk = False
+    log.info("Push-to-talk disabled")
+    return {"push_to_talk": False}
+
+def reload():
+    try:
+        changed = reload_config()
+    except ValueError as e:
+        log.error("Config reload failed: %s", e)
+        return {"error": str(e)}, 400
+    if "triggers" in changed:
+        reload_triggers()
+    if "LOG_LEVEL" in changed:
+        level = getattr(logging, str(config.get("LOG_LEVEL", "INFO")).upper(), logging.INFO)
+        logging.getLogger().setLevel(level)
+    applied = [key for key in changed if key in LIVE_RELOAD_KEYS]
+    restart = [key for key in changed if key not in LIVE_RELOAD_KEYS]
+    if restart:
+        log.info("Config reloaded; restart required for: %s", ", ".join(restart))
+    return {"applied": applied, "restart_required": restart}
+
+def profile_start():
+    return start_profiling(PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_SNAPSHOT_INTERVAL, PROFILE_TRACEMALLOC_FRAMES)
+
+ROUTES = {
+    "/": status,
+    "/status": status,
+    "/stats": status,
+    "/pause": pause,
+    "/resume": resume,
+    "/toggle": toggle,
+    "/ptt/press": ptt_press,
+    "/ptt/release": ptt_release,
+    "/ptt/enable": ptt_enable,
+    "/ptt/disable": ptt_disable,
+    "/reload": reload,
+    "/profile": profiling_status,
+    "/profile/start": profile_start,
+    "/profile/stop": stop_profiling,
+}
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    token = ""
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        if self.token:
+            supplied = self.headers.get("X-Control-Token") or parse_qs(url.query).get("token", [""])[0]
+            if supplied != self.token:
+                self._respond({"error": "invalid token"}, 403)
+                return
+        handler = ROUTES.get(url.path.rstrip("/") or "/")
+        if handler is None:
+            self._respond({"error": f"unknown endpoint {url.path}", "endpoints": sorted(ROUTES)}, 404)
+            return
+        result = handler()
+        if isinstance(result, tuple):
+            self._respond(*result)
+        else:
+            self._respond(result)
+
+    def _respond(self, body, code=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug("Control API: " + format, *args)
+
+def start_control_api(host, port, token=""):
+    """
+    Serve the control API on a daemon thread. Returns the server (or None if the port is unavailable).
+    """
+    handler = type("ConfiguredControlRequestHandler", (ControlRequestHandler,), {"token": token})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        log.error("Could not start control API on %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="control-api", daemon=True).start()
+    log.info("Control API listening on http://%s:%s", host, port)
+    return server
@@ -0,0 +1,213 @@
+"""
+Persistent WebSocket transport for trigger calls (FIREBOT_TRANSPORT "websocket").
+
+Instead of one HTTP request per effect, trigger calls are sent as messages on
+one long-lived WebSocket, so no connection setup is on the critical path and
+fires are pipelined (a fire never waits for the previous one's answer).
+
+Protocol (JSON text messages):
+
+    -> {"type": "fire", "id": 17, "url": "<trigger URL>", "args": {...} or null}
+    <- {"type": "ack", "id": 17, "ok": true, "response": "..."}
+
+"url" is the trigger's configured URL (e.g. a Firebot preset effect API path),
+"args" the transcript metadata of TRANSCRIPT_DELIVERY "body"/"query". The
+receiving end (a Firebot custom script or a local bridge in front of its API)
+runs the effect and acknowledges it with the same id.
+
+The connection is re-established in the background with backoff. While it is
+down, trigger_url_call falls back to HTTP, so no effect is lost. A fire that was
+sent but not acknowledged is only logged and counted: repeating it over HTTP
+could run the effect twice.
+"""
+
+import itertools
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from modules.network_audio import websocket_connect, websocket_frame, websocket_messages
+
+log = logging.getLogger(__name__)
+
+RECONNECT_DELAYS = (0.5, 1, 2, 5)
+
+class FireError(Exception):
+    """
+    The fire was not acknowledged (connection lost, timeout or a negative ack).
+    """
+
+class NotAcknowledgedError(FireError):
+    """
+    The fire was sent but not acknowledged. Firebot may have run it, so it must not be sent again.
+    """
+
+class PendingFire:
+    def __init__(self):
+        self.event = threading.Event()
+        self.ack = None
+
+class WebSocketTransport:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        if parts.scheme != "ws":
+            raise ValueError(f"Unsupported Firebot transport URL '{url}' (ws:// expected)")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.pending = {}  # id -> PendingFire
+        self.pending_lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.connected = threading.Event()
+        self.stopped = False
+        self.connections = 0
+        self.stats = {"fires": 0, "acks": 0, "failures": 0, "reconnects": 0}
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="firebot-transport", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        attempt = 0
+        while not self.stopped:
+            try:
+                conn = websocket_connect(self.host, self.port, self.path)
+            except OSError as e:
+                delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                if attempt == 0:
+                    log.warning("Firebot transport: cannot connect to ws://%s:%s%s (%s), retrying",
+                                self.host, self.port, self.path, e)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            if self.connections:
+                self.stats["reconnects"] += 1
+            self.connections += 1
+            attempt = 0
+            self.conn = conn
+            self.connected.set()
+            log.info("Firebot transport connected to ws://%s:%s%s", self.host, self.port, self.path)
+            try:
+                for message in websocket_messages(conn, text=True, masked=True):
+                    self._on_message(message)
+            except OSError as e:
+                if not self.stopped:
+                    log.warning("Firebot transport connection error: %s", e)
+            finally:
+                self.connected.clear()
+                self.conn = None
+                conn.close()
+                self._fail_pending()
+            if not self.stopped:
+                log.warning("Firebot transport disconnected, reconnecting")
+
+    def _on_message(self, message):
+        try:
+            ack = json.loads(message)
+        except ValueError:
+            return
+        if ack.get("type") != "ack":
+            return
+        with self.pending_lock:
+            pending = self.pending.pop(ack.get("id"), None)
+        if pending is not None:
+            pending.ack = ack
+            pending.event.set()
+
+    def _fail_pending(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        for fire in pending.values():
+            fire.event.set()
+
+    def fire(self, url, args=None, timeout=3.0):
+        """
+        Send one fire and wait for its acknowledgement; returns the ack's response.
+        Raises FireError if it is not acknowledged.
+        """
+        return self.wait(self.send(url, args), timeout)
+
+    def send(self, url, args=None):
+        """
+        Send one fire without waiting (pipelined); returns a handle for wait().
+        """
+        conn = self.conn
+        if conn is None:
+            raise FireError("not connected")
+        fire_id = next(self.ids)
+        pending = PendingFire()
+        with self.pending_lock:
+            self.pending[fire_id] = pending
+        message = json.dumps({"type": "fire", "id": fire_id, "url": url, "args": args}).encode("utf-8")
+        try:
+            with self.send_lock:
+                conn.sendall(websocket_frame(message, opcode=0x1))
+        except OSError as e:
+            with self.pending_lock:
+                self.pending.pop(fire_id, None)
+            raise FireError(e)
+        self.stats["fires"] += 1
+        return fire_id, pending
+
+    def wait(self, handle, timeout=3.0):
+        fire_id, pending = handle
+        if not pending.event.wait(timeout):
+            with self.pending_lock:
+                self.pending.pop(fire_id, None)
+            self.stats["failures"] += 1
+            raise NotAcknowledgedError("no acknowledgement")
+        ack = pending.ack
+        if ack is None or not ack.get("ok", False):
+            self.stats["failures"] += 1
+            raise NotAcknowledgedError((ack or {}).get("error", "connection lost"))
+        self.stats["acks"] += 1
+        return ack.get("response", "")
+
+    def status(self):
+        with self.pending_lock:
+            in_flight = len(self.pending)
+        return dict(self.stats, connected=self.connected.is_set(), in_flight=in_flight)
+
+    def stop(self):
+        self.stopped = True
+        conn = self.conn
+        if conn is not None:
+            try:
+                with self.send_lock:
+                    conn.sendall(websocket_frame(b"", 0x8))
+            except OSError:
+                pass
+            conn.close()
+
+_transport = None
+
+def start_transport(url):
+    """
+    Connect the persistent transport used by trigger_url_call.
+    """
+    global _transport
+    if _transport is None:
+        _transport = WebSocketTransport(url)
+        _transport.start()
+    return _transport
+
+def stop_transport():
+    global _transport
+    if _transport is not None:
+        _transport.stop()
+        _transport = None
+
+def get_transport():
+    """
+    The transport if it is connected, else None (trigger calls then use HTTP).
+    """
+    transport = _transport
+    return transport if transport is not None and transport.connected.is_set() else None
+
+def transport_status():
+    return _transport.status() if _transport is not None else None
@@ -0,0 +1,327 @@
+"""
+In-process FLAC encoder used for the Google recognizer.
+
+speech_recognition's AudioData.get_flac_data launches the external `flac`
+executable (plus temporary files on Windows) for every utterance. This module
+encodes 16-bit mono PCM to FLAC directly in Python using NumPy: each block is
+coded with the best fixed predictor (order 0-4) and a single Rice partition,
+and the bitstream is packed with vectorized operations.
+
+If NumPy is not installed the stock subprocess encoder is used instead.
+"""
+
+import math
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import speech_recognition as sr
+
+BLOCK_SIZE = 4096
+MAX_RICE_PARAMETER = 14  # 15 is the escape code for 4-bit Rice parameters
+
+# Frame header sample-rate codes from the FLAC specification
+SAMPLE_RATE_CODES = {
+    8000: 0b0100, 16000: 0b0101, 22050: 0b0110, 24000: 0b0111,
+    32000: 0b1000, 44100: 0b1001, 48000: 0b1010, 96000: 0b1011,
+}
+
+def _make_crc8_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+def _make_crc16_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+CRC8_TABLE = _make_crc8_table()
+CRC16_TABLE = _make_crc16_table()
+CRC16_CHUNK = 32  # bytes per lane when computing CRC-16 over many lanes at once
+
+def _make_crc16_shift_tables(num_bytes):
+    """
+    Build lookup tables that advance a CRC-16 register over num_bytes zero bytes.
+    The CRC is linear, so the advance of each register bit is computed once and
+    XORed together per high/low byte of the register.
+    """
+    columns = []
+    for bit in range(16):
+        crc = 1 << bit
+        for _ in range(num_bytes):
+            crc = ((crc << 8) & 0xFFFF) ^ CRC16_TABLE[crc >> 8]
+        columns.append(crc)
+
+    def table_for(offset):
+        table = []
+        for value in range(256):
+            out = 0
+            for bit in range(8):
+                if value & (1 << bit):
+                    out ^= columns[bit + offset]
+            table.append(out)
+        return table
+
+    return table_for(8), table_for(0)
+
+CRC16_SHIFT_HIGH, CRC16_SHIFT_LOW = _make_crc16_shift_tables(CRC16_CHUNK)
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+def crc16(data):
+    """
+    CRC-16 (polynomial 0x8005) as used in FLAC frame footers.
+    """
+    crc = 0
+    table = CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+def crc16_many(blocks):
+    """
+    CRC-16 of each byte string in blocks.
+
+    Every block is split into CRC16_CHUNK-byte lanes, the CRCs of all lanes
+    across all blocks are computed together with NumPy, and each block's lane
+    CRCs are then combined with the zero-byte shift tables.
+    """
+    if np is None:
+        return [crc16(block) for block in blocks]
+
+    padded = []
+    lane_counts = []
+    for block in blocks:
+        # Leading zero bytes do not change a CRC with a zero initial value
+        padding = (-len(block)) % CRC16_CHUNK
+        padded.append(bytes(padding))
+        padded.append(block)
+        lane_counts.append((padding + len(block)) // CRC16_CHUNK)
+    lanes = np.frombuffer(b"".join(padded), dtype=np.uint8).reshape(-1, CRC16_CHUNK)
+
+    np_table = _crc16_numpy_table()
+    lane_crcs = np.zeros(len(lanes), dtype=np.int32)
+    for i in range(CRC16_CHUNK):
+        lane_crcs = ((lane_crcs << 8) & 0xFFFF) ^ np_table[(lane_crcs >> 8) ^ lanes[:, i]]
+
+    results = []
+    high, low = CRC16_SHIFT_HIGH, CRC16_SHIFT_LOW
+    lane_iter = iter(lane_crcs.tolist())
+    for count in lane_counts:
+        crc = 0
+        for _ in range(count):
+            crc = high[crc >> 8] ^ low[crc & 0xFF] ^ next(lane_iter)
+        results.append(crc)
+    return results
+
+_CRC16_NUMPY_TABLE = None
+
+def _crc16_numpy_table():
+    global _CRC16_NUMPY_TABLE
+    if _CRC16_NUMPY_TABLE is None:
+        _CRC16_NUMPY_TABLE = np.array(CRC16_TABLE, dtype=np.int32)
+    return _CRC16_NUMPY_TABLE
+
+def is_available():
+    """
+    Return True if the in-process encoder can be used (NumPy is installed).
+    """
+    return np is not None
+
+def _utf8_frame_number(number):
+    """
+    Encode a frame number using FLAC's extended UTF-8 scheme.
+    """
+    if number < 0x80:
+        return bytes([number])
+    length = 2
+    while number >= (1 << (5 * length + 1)):
+        length += 1
+    out = []
+    for _ in range(length - 1):
+        out.append(0x80 | (number & 0x3F))
+        number >>= 6
+    first = ((0xFF << (8 - length)) & 0xFF) | number
+    return bytes([first] + out[::-1])
+
+class _BitWriter:
+    """
+    Collects (value, bit_width) fields and packs them MSB-first with NumPy.
+
+    Fields are laid end to end; only the low 25 bits of a field may be non-zero,
+    which holds for FLAC headers, 16-bit samples and Rice codes (whose unary
+    prefix is a run of zeros). Because fields never overlap, each one can be
+    split into bytes and summed into place with a single bincount.
+    """
+    def __init__(self):
+        self.values = []
+        self.widths = []
+
+    def write(self, value, bits):
+        self.values.append(np.array([value], dtype=np.int64))
+        self.widths.append(np.array([bits], dtype=np.int64))
+
+    def write_fields(self, values, widths):
+        self.values.append(values.astype(np.int64, copy=False))
+        self.widths.append(widths.astype(np.int64, copy=False))
+
+    def to_bytes(self):
+        if not self.values:
+            return b""
+        values = np.concatenate(self.values)
+        widths = np.concatenate(self.widths)
+        ends = np.cumsum(widths)
+        total_bytes = (int(ends[-1]) + 7) // 8
+        last_bytes = (ends - 1) // 8
+        # Align each value so its least significant bit lands on its final bit position
+        words = values << (7 - (ends - 1) % 8)
+        indices = np.concatenate([last_bytes - j for j in range(5)])
+        byte_values = np.concatenate([(words >> (8 * j)) & 0xFF for j in range(5)])
+        keep = (indices >= 0) & (byte_values != 0)
+        packed = np.bincount(indices[keep], weights=byte_values[keep], minlength=total_bytes)
+        return packed.astype(np.uint8).tobytes()
+
+def _zigzag(residual):
+    """
+    Map signed residuals to the unsigned values that Rice coding expects.
+    """
+    return (residual << 1) ^ (residual >> 31)
+
+def _write_rice(writer, unsigned, k):
+    """
+    Append the Rice codes for the zigzagged residual with parameter k.
+    Each code is the unary quotient (zeros terminated by a one) followed by
+    the k low bits, i.e. the value (1 << k) | low_bits in quotient + k + 1 bits.
+    """
+    codewords = (unsigned & ((1 << k) - 1)) | (1 << k)
+    writer.write_fields(codewords, (unsigned >> k) + (k + 1))
+
+def _best_rice_parameter(unsigned):
+    """
+    Pick the Rice parameter minimising the encoded size of the zigzagged residual.
+    """
+    if len(unsigned) == 0:
+        return 0, 0
+    mean = float(unsigned.mean())
+    guess = max(0, min(MAX_RICE_PARAMETER, int(math.log2(mean + 1))))
+    best_k, best_size = guess, None
+    for k in range(max(0, guess - 1), min(MAX_RICE_PARAMETER, guess + 1) + 1):
+        size = int((unsigned >> k).sum()) + len(unsigned) * (k + 1)
+        if best_size is None or size < best_size:
+            best_k, best_size = k, size
+    return best_k, best_size
+
+def _encode_subframe(writer, samples, bits_per_sample):
+    """
+    Append the cheapest fixed-predictor subframe (or a verbatim one) for the block.
+    """
+    # Choose the predictor order by the smallest total residual magnitude,
+    # which tracks the Rice-coded size closely and needs a single reduction per order
+    best_order, best_residual, best_magnitude = 0, samples, None
+    residual = samples
+    for order in range(min(4, len(samples) - 1) + 1):
+        if order:
+            residual = residual[1:] - residual[:-1]
+        magnitude = int(np.abs(residual).sum())
+        if best_magnitude is None or magnitude < best_magnitude:
+            best_order, best_residual, best_magnitude = order, residual, magnitude
+
+    unsigned = _zigzag(best_residual)
+    k, size = _best_rice_parameter(unsigned)
+    size += best_order * bits_per_sample
+    if size >= len(samples) * bits_per_sample:
+        # Verbatim subframe
+        writer.write(0b00000010, 8)
+        raw = samples & ((1 << bits_per_sample) - 1)
+        writer.write_fields(raw, np.full(len(raw), bits_per_sample))
+        return
+
+    writer.write(0b00010000 | (best_order << 1), 8)
+    for sample in samples[:best_order]:
+        writer.write(int(sample) & ((1 << bits_per_sample) - 1), bits_per_sample)
+    writer.write(0b00, 2)  # Rice coding with 4-bit parameters
+    writer.write(0, 4)  # partition order 0
+    writer.write(k, 4)
+    _write_rice(writer, unsigned, k)
+
+def _encode_frame(samples, frame_number, sample_rate):
+    """
+    Return the frame header and subframe bytes; the CRC-16 footer is added by the caller.
+    """
+    header = bytearray(b"\xFF\xF8")
+    block_size = len(samples)
+    block_code = 0b1100 if block_size == BLOCK_SIZE else 0b0111
+    rate_code = SAMPLE_RATE_CODES.get(sample_rate, 0b0000)
+    header.append((block_code << 4) | rate_code)
+    header.append((0b0000 << 4) | (0b100 << 1))  # mono, 16 bits per sample
+    header += _utf8_frame_number(frame_number)
+    if block_code == 0b0111:
+        header += struct.pack(">H", block_size - 1)
+    header.append(crc8(header))
+
+    writer = _BitWriter()
+    _encode_subframe(writer, samples.astype(np.int32), 16)
+    return bytes(header) + writer.to_bytes()
+
+def encode_flac(raw_data, sample_rate):
+    """
+    Encode 16-bit little-endian mono PCM to a complete FLAC stream.
+    """
+    samples = np.frombuffer(raw_data, dtype="<i2")
+    total_samples = len(samples)
+
+    bodies = [
+        _encode_frame(samples[start:start + BLOCK_SIZE], frame_number, sample_rate)
+        for frame_number, start in enumerate(range(0, total_samples, BLOCK_SIZE))
+    ]
+    frames = [body + struct.pack(">H", crc) for body, crc in zip(bodies, crc16_many(bodies))]
+    min_frame = min((len(frame) for frame in frames), default=0)
+    max_frame = max((len(frame) for frame in frames), default=0)
+
+    block_size = min(BLOCK_SIZE, total_samples) or BLOCK_SIZE
+    streaminfo = struct.pack(">HH", block_size, block_size)
+    streaminfo += min_frame.to_bytes(3, "big") + max_frame.to_bytes(3, "big")
+    # 20 bits sample rate, 3 bits channels-1, 5 bits bps-1, 36 bits total samples
+    packed = (sample_rate << 44) | (0 << 41) | (15 << 36) | total_samples
+    streaminfo += packed.to_bytes(8, "big")
+    streaminfo += bytes(16)  # MD5 signature left unset
+
+    metadata_header = bytes([0x80]) + len(streaminfo).to_bytes(3, "big")
+    return b"fLaC" + metadata_header + streaminfo + b"".join(frames)
+
+class InProcessFlacAudioData(sr.AudioData):
+    """
+    AudioData whose FLAC conversion runs in-process instead of spawning `flac`.
+    """
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        width = convert_width if convert_width is not None else self.sample_width
+        if width != 2:
+            # Only 16-bit samples are handled in-process
+            return super().get_flac_data(convert_rate, convert_width)
+        raw_data = self.get_raw_data(convert_rate, 2)
+        rate = self.sample_rate if convert_rate is None else convert_rate
+        return encode_flac(raw_data, rate)
+
+def with_inprocess_flac(audio):
+    """
+    Wrap an AudioData so the recognizers encode FLAC in-process when possible.
+    """
+    if not is_available() or isinstance(audio, InProcessFlacAudioData):
+        return audio
+    return InProcessFlacAudioData(audio.frame_data, audio.sample_rate, audio.sample_width)
@@ -8,6 +8,8 @@ from modules.config_manager import load_config, save_config, get_config_path
 from modules.utils import get_base_dir
 from modules.process_launcher import ProcessManager
 from modules.gui.config_editor import ConfigEditor
+from modules.gui.history_search import HistorySearch
+from modules.gui.level_meter import LevelMeter
 from modules.gui.utils import ConsoleRedirector
 
 class GUI(tk.Tk):
@@ -49,10 +51,16 @@ class GUI(tk.Tk):
         btn_frame.pack(side=tk.TOP, fill=tk.X, pady=(5,0))
         tk.Button(btn_frame, text="Change", command=self.change_program_path).pack(fill=tk.X, pady=2)
         tk.Button(btn_frame, text="Edit Config", command=self.open_config_editor).pack(fill=tk.X, pady=2)
+        tk.Button(btn_frame, text="Search History", command=self.open_history_search).pack(fill=tk.X, pady=2)
         tk.Button(btn_frame, text="Launch Program", command=self.launch_program).pack(fill=tk.X, pady=2)
         self.terminate_button = tk.Button(btn_frame, text="Terminate Program", command=self.terminate_program, state=tk.DISABLED)
         self.terminate_button.pack(fill=tk.X, pady=2)
         
+        # Input level and VAD state published by the listener (TELEMETRY_ENABLED)
+        if self.config_data.get("TELEMETRY_ENABLED", True):
+            self.level_meter = LevelMeter(self, self.program_file("TELEMETRY_FILE", "audioTelemetry.bin"))
+            self.level_meter.pack(side=tk.TOP, fill=tk.X, padx=10)
+
         self.terminal_output = scrolledtext.ScrolledText(self, height=30)
         self.terminal_output.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         sys.stdout = ConsoleRedirector(self.terminal_output)
@@ -61,7 +69,10 @@ class GUI(tk.Tk):
         
         self.process_manager = ProcessManager(
             on_output_callback=self.on_process_output,
-            on_exit_callback=self.on_process_exit
+            on_exit_callback=self.on_process_exit,
+            standby=self.config_data.get("standby_instance", False),
+            supervise=self.config_data.get("supervise_restarts", False),
+            config_path=CONFIG_FILE
         )
         
         if not self.program_path_var.get() or not os.path.exists(self.program_path_var.get()):
@@ -93,9 +104,22 @@ class GUI(tk.Tk):
     def open_config_editor(self):
         ConfigEditor(self, self.config_data, self.on_config_saved)
         
+    def program_file(self, key, default):
+        # The listener runs in the program's directory, so relative paths are resolved there
+        path = self.config_data.get(key, default)
+        program_dir = os.path.dirname(self.config_data.get("program_path", ""))
+        if not os.path.isabs(path) and program_dir:
+            path = os.path.join(program_dir, path)
+        return path
+
+    def open_history_search(self):
+        HistorySearch(self, self.program_file("HISTORY_DB_FILE", "whisperHistory.db"))
+
     def on_config_saved(self, new_config):
         self.config_data = new_config
         self.program_path_var.set(self.config_data.get("program_path", ""))
+        self.process_manager.configure(self.config_data.get("standby_instance", False),
+                                       self.config_data.get("supervise_restarts", False))
 
     def change_program_path(self):
         filepath = filedialog.askopenfilename(
@@ -117,8 +141,9 @@ class GUI(tk.Tk):
             
         self.is_launching = True
         
-        # Only terminate if there's an existing process
-        if self.process_manager.process:
+        # Only terminate if there's an existing process (a supervised listener is handed over
+        # to its standby instance by launch itself)
+        if self.process_manager.process and not self.process_manager.supervise:
             print("Terminating existing process before launching new one")
             self.terminate_program()
         
@@ -0,0 +1,93 @@
+import tkinter as tk
+from tkinter import ttk
+import os
+import sqlite3
+import time
+
+from modules.history_manager import search_history
+
+PAGE_SIZE = 100
+
+class HistorySearch:
+    """
+    Search panel for the SQLite transcript history (HISTORY_BACKEND "sqlite" or "both").
+    Results are fetched one page at a time, newest first.
+    """
+    def __init__(self, parent, db_path):
+        self.window = tk.Toplevel(parent)
+        self.window.title("Transcript History")
+        self.window.geometry("900x550")
+        self.db_path = db_path
+        self.query = ""
+        self.page = 0
+
+        # --- Search bar ---
+        search_frame = tk.Frame(self.window)
+        search_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.query_var = tk.StringVar()
+        entry = tk.Entry(search_frame, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        entry.bind("<Return>", lambda event: self.search())
+        entry.focus_set()
+        tk.Button(search_frame, text="Search", command=self.search, width=10).pack(side=tk.LEFT)
+
+        # --- Results ---
+        columns = ("time", "text", "trigger", "latency", "backend")
+        widths = {"time": 140, "text": 430, "trigger": 140, "latency": 70, "backend": 90}
+        table_frame = tk.Frame(self.window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.table = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for column in columns:
+            self.table.heading(column, text=column.capitalize())
+            self.table.column(column, width=widths[column], stretch=column == "text")
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # --- Paging ---
+        bottom_frame = tk.Frame(self.window)
+        bottom_frame.pack(fill=tk.X, padx=10, pady=10)
+        self.prev_button = tk.Button(bottom_frame, text="< Newer", command=lambda: self.show_page(self.page - 1), width=10)
+        self.prev_button.pack(side=tk.LEFT)
+        self.next_button = tk.Button(bottom_frame, text="Older >", command=lambda: self.show_page(self.page + 1), width=10)
+        self.next_button.pack(side=tk.LEFT, padx=5)
+        self.status_var = tk.StringVar()
+        tk.Label(bottom_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=10)
+        tk.Button(bottom_frame, text="Close", command=self.window.destroy, width=10).pack(side=tk.RIGHT)
+
+        self.show_page(0)
+
+    def search(self):
+        self.query = self.query_var.get().strip()
+        self.show_page(0)
+
+    def show_page(self, page):
+        if page < 0:
+            return
+        self.table.delete(*self.table.get_children())
+        if not os.path.exists(self.db_path):
+            self.status_var.set(f"No history database at {self.db_path} (set HISTORY_BACKEND to \"sqlite\")")
+            self.prev_button.config(state=tk.DISABLED)
+            self.next_button.config(state=tk.DISABLED)
+            return
+        try:
+            # One extra row tells whether there is a next page
+            rows = search_history(self.db_path, self.query, PAGE_SIZE + 1, page * PAGE_SIZE)
+        except sqlite3.Error as e:
+            self.status_var.set(f"Search failed: {e}")
+            return
+        self.page = page
+        for row in rows[:PAGE_SIZE]:
+            latency = f"{row['latency_ms']:.0f} ms" if row["latency_ms"] is not None else ""
+            self.table.insert("", tk.END, values=(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["time"])),
+                row["text"], row["trigger"] or "", latency, row["backend"] or ""))
+        shown = min(len(rows), PAGE_SIZE)
+        if shown:
+            self.status_var.set(f"Results {page * PAGE_SIZE + 1}-{page * PAGE_SIZE + shown}")
+        else:
+            self.status_var.set("No results")
+        self.prev_button.config(state=tk.NORMAL if page > 0 else tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL if len(rows) > PAGE_SIZE else tk.DISABLED)
@@ -0,0 +1,84 @@
+import tkinter as tk
+import math
+
+from modules.telemetry import TelemetryReader, SPEECH, RECORDING, GATED
+
+REFRESH_MS = 50  # 20 frames per second
+STALE_SECONDS = 1.0
+FLOOR_DB = -60.0
+PEAK_HOLD_SECONDS = 1.5
+PEAK_DECAY_DB = 0.6  # per refresh once the hold has expired
+TIMELINE_STEP = 2  # pixels per audio frame
+
+class LevelMeter(tk.Frame):
+    """
+    VU meter and VAD timeline fed by the listener's telemetry file (modules.telemetry).
+    The file is polled every REFRESH_MS; the listener is never contacted.
+    """
+    def __init__(self, parent, telemetry_path):
+        super().__init__(parent)
+        self.reader = TelemetryReader(telemetry_path)
+        self.peak_db = FLOOR_DB
+        self.peak_time = 0.0
+        self.elapsed = 0.0
+
+        self.canvas = tk.Canvas(self, height=46, bg="#202020", highlightthickness=0)
+        self.canvas.pack(fill=tk.X, expand=True)
+        self.bar = self.canvas.create_rectangle(0, 4, 0, 18, fill="#4caf50", width=0)
+        self.peak = self.canvas.create_line(0, 2, 0, 20, fill="#ffffff", width=2)
+        self.label = self.canvas.create_text(6, 11, anchor="w", fill="#bbbbbb", font=("TkDefaultFont", 8))
+
+        self.after(REFRESH_MS, self.refresh)
+
+    def refresh(self):
+        try:
+            self.update_meter()
+        finally:
+            self.after(REFRESH_MS, self.refresh)
+
+    def update_meter(self):
+        width = self.canvas.winfo_width()
+        frames = self.reader.read()
+        age = self.reader.age()
+        self.elapsed += REFRESH_MS / 1000
+
+        if age is None or age > STALE_SECONDS:
+            self.canvas.coords(self.bar, 0, 4, 0, 18)
+            self.canvas.coords(self.peak, 0, 2, 0, 20)
+            self.canvas.itemconfig(self.label, text="No audio telemetry (listener not running)" if age is None
+                                   else "Listener idle or paused")
+            self.peak_db = FLOOR_DB
+            return
+        if not frames:
+            return
+
+        level, flags = max(frames)
+        level_db = 20 * math.log10(level / 32768) if level else FLOOR_DB
+        level_db = max(FLOOR_DB, level_db)
+        if level_db >= self.peak_db:
+            self.peak_db = level_db
+            self.peak_time = self.elapsed
+        elif self.elapsed - self.peak_time > PEAK_HOLD_SECONDS:
+            self.peak_db = max(level_db, self.peak_db - PEAK_DECAY_DB)
+
+        x = lambda db: width * (db - FLOOR_DB) / -FLOOR_DB
+        color = "#4caf50" if level_db < -12 else "#ffc107" if level_db < -3 else "#f44336"
+        self.canvas.coords(self.bar, 0, 4, x(level_db), 18)
+        self.canvas.itemconfig(self.bar, fill=color)
+        self.canvas.coords(self.peak, x(self.peak_db), 2, x(self.peak_db), 20)
+        state = "gated" if flags & GATED else "recording" if flags & RECORDING else \
+            "speech" if flags & SPEECH else "silence"
+        self.canvas.itemconfig(self.label, text=f"{level_db:.0f} dBFS  {state}")
+
+        # Timeline: one column per frame, scrolling left; off-screen columns are deleted
+        shift = len(frames) * TIMELINE_STEP
+        self.canvas.move("timeline", -shift, 0)
+        for item in self.canvas.find_withtag("timeline"):
+            if self.canvas.coords(item)[2] < 0:
+                self.canvas.delete(item)
+        for i, (_, flags) in enumerate(frames):
+            left = width - shift + i * TIMELINE_STEP
+            if flags & SPEECH:
+                self.canvas.create_rectangle(left, 24, left + TIMELINE_STEP, 32, fill="#4caf50", width=0, tags="timeline")
+            if flags & RECORDING:
+                self.canvas.create_rectangle(left, 34, left + TIMELINE_STEP, 42, fill="#ff9800", width=0, tags="timeline")
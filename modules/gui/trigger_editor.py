@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox
 import json
+from modules.config_manager import TRIGGER_LATENCY_MODES, DEFAULT_TRIGGER_LATENCY
 
 class TriggerEditor:
     def __init__(self, parent, triggers_list, on_update):
@@ -61,6 +62,13 @@ class TriggerEditor:
         self.cooldown_var.trace_add("write", self.on_field_change)
         tk.Entry(right_frame, textvariable=self.cooldown_var).pack(fill=tk.X, pady=(0, 10))
 
+        # Latency policy
+        tk.Label(right_frame, text="Latency (instant = fire on first pass, accurate = wait for Whisper):").pack(anchor=tk.W)
+        self.latency_var = tk.StringVar(value=DEFAULT_TRIGGER_LATENCY)
+        self.latency_var.trace_add("write", self.on_field_change)
+        self.latency_menu = tk.OptionMenu(right_frame, self.latency_var, *TRIGGER_LATENCY_MODES)
+        self.latency_menu.pack(anchor=tk.W, pady=(0, 10))
+
         # Bottom: Actions
         bottom_frame = tk.Frame(self.window)
         bottom_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -109,6 +117,7 @@ class TriggerEditor:
         
         self.url_var.set(trigger.get("url", ""))
         self.cooldown_var.set(str(trigger.get("cooldown", 2.0)))
+        self.latency_var.set(trigger.get("latency", DEFAULT_TRIGGER_LATENCY))
         
         self.phrases_text.edit_modified(False)
         self.ignore_changes = False
@@ -139,6 +148,10 @@ class TriggerEditor:
         except ValueError:
             pass # Ignore invalid float for now
 
+        # Latency
+        if self.latency_var.get() in TRIGGER_LATENCY_MODES:
+            self.triggers[idx]["latency"] = self.latency_var.get()
+
         # Don't full refresh list on every keypress, but maybe update label?
         # A full refresh clears selection which is annoying.
         # Just update the Listbox text for this item
@@ -152,7 +165,8 @@ class TriggerEditor:
         new_trigger = {
             "phrases": ["new phrase"],
             "url": "",
-            "cooldown": 2.0
+            "cooldown": 2.0,
+            "latency": DEFAULT_TRIGGER_LATENCY
         }
         self.triggers.append(new_trigger)
         self.refresh_list()
@@ -181,6 +195,7 @@ class TriggerEditor:
         self.phrases_text.delete("1.0", tk.END)
         self.url_var.set("")
         self.cooldown_var.set("")
+        self.latency_var.set(DEFAULT_TRIGGER_LATENCY)
         self.ignore_changes = False
 
     def disable_form(self):
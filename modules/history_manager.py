@@ -1,11 +1,21 @@
+import atexit
+import logging
 import os
+import queue
+import sqlite3
 import time
 import threading
 import re
 from datetime import datetime, timedelta
+from urllib.request import pathname2url
 
 HISTORY_PRUNE_LOCK = threading.Lock()
 ONE_HOUR_IN_SECONDS = 3600
+# SQLite history: rows written per transaction, and how often expired rows are deleted
+HISTORY_BATCH_SIZE = 500
+HISTORY_PRUNE_INTERVAL = 3600
+
+log = logging.getLogger(__name__)
 
 def parse_timestamp_robust(line):
     """
@@ -38,7 +48,7 @@ def prune_transcript_history(history_file_path, max_age_seconds=ONE_HOUR_IN_SECO
         if not os.path.exists(history_file_path): return
         try:
             with open(history_file_path, "r", encoding="utf-8") as hf: lines = hf.readlines()
-        except Exception as e: print(f"Error reading history file for pruning {history_file_path}: {e}"); return
+        except Exception as e: log.error("Error reading history file for pruning %s: %s", history_file_path, e); return
         if not lines: return
 
         cutoff_time = datetime.now() - timedelta(seconds=max_age_seconds)
@@ -58,8 +68,8 @@ def prune_transcript_history(history_file_path, max_age_seconds=ONE_HOUR_IN_SECO
         if pruned_count > 0 or len(valid_lines) < len(lines):
             try:
                 with open(history_file_path, "w", encoding="utf-8") as hf: hf.writelines(valid_lines)
-                if pruned_count > 0: print(f"Pruned {pruned_count} old entries from {history_file_path}.")
-            except Exception as e: print(f"Error writing pruned history file {history_file_path}: {e}")
+                if pruned_count > 0: log.debug("Pruned %d old entries from %s.", pruned_count, history_file_path)
+            except Exception as e: log.error("Error writing pruned history file %s: %s", history_file_path, e)
 
 def append_to_transcript_history(transcript_text, history_file_path, prefix="Oshimia"):
     if not transcript_text or not transcript_text.strip(): return
@@ -71,4 +81,171 @@ def append_to_transcript_history(transcript_text, history_file_path, prefix="Osh
     try:
         with open(history_file_path, "a", encoding="utf-8") as hf: hf.write(log_entry + "\n")
         prune_transcript_history(history_file_path, ONE_HOUR_IN_SECONDS)
-    except Exception as e: print(f"Error appending to or pruning transcript history {history_file_path}: {e}")
+    except Exception as e: log.error("Error appending to or pruning transcript history %s: %s", history_file_path, e)
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,        -- epoch seconds
+    profile TEXT,              -- tenant name ("default" outside server mode)
+    prefix TEXT,               -- HISTORY_LOG_PREFIX
+    text TEXT NOT NULL,
+    trigger TEXT,              -- first phrase of each trigger fired, comma-separated
+    latency_ms REAL,           -- end of utterance to first trigger fired (or to the final transcript)
+    backend TEXT               -- engine that produced the transcript
+);
+CREATE INDEX IF NOT EXISTS history_time ON history(time);
+"""
+HISTORY_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(text, content='history', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts(history_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+HISTORY_COLUMNS = ("id", "time", "profile", "prefix", "text", "trigger", "latency_ms", "backend")
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+class HistoryStore:
+    """
+    Transcript history in an SQLite database (WAL mode) with a full-text index.
+
+    add() only queues the row; a background thread writes queued rows in one
+    transaction per batch and deletes rows older than retention_days, so
+    recording never waits on the disk. Searches use their own connection and
+    are not blocked by the writer.
+    """
+    def __init__(self, path, retention_days=30):
+        self.path = path
+        self.retention_days = retention_days
+        self.queue = queue.Queue()
+        self.fts = True
+        conn = self._connect()
+        try:
+            conn.executescript(HISTORY_SCHEMA)
+            try:
+                conn.executescript(HISTORY_FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                # SQLite built without FTS5: searches fall back to LIKE
+                log.warning("Full-text index unavailable for %s (%s), using plain search", path, e)
+                self.fts = False
+        finally:
+            conn.close()
+        self.writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, text, prefix="", trigger=None, latency_ms=None, backend=None, profile=None):
+        if not text or not text.strip(): return
+        self.queue.put((time.time(), profile, prefix, text, trigger, latency_ms, backend))
+
+    def _write_loop(self):
+        conn = self._connect()
+        last_prune = 0
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.queue.get(timeout=HISTORY_PRUNE_INTERVAL)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < HISTORY_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [row for row in batch if row is not None]
+            try:
+                with conn:
+                    if batch:
+                        conn.executemany("INSERT INTO history (time, profile, prefix, text, trigger, latency_ms, backend) "
+                                         "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+                    if self.retention_days and time.time() - last_prune >= HISTORY_PRUNE_INTERVAL:
+                        cursor = conn.execute("DELETE FROM history WHERE time < ?",
+                                              (time.time() - self.retention_days * 86400,))
+                        last_prune = time.time()
+                        if cursor.rowcount > 0:
+                            log.debug("Pruned %d old entries from %s.", cursor.rowcount, self.path)
+            except sqlite3.Error as e:
+                log.error("Error writing transcript history %s: %s", self.path, e)
+        conn.close()
+
+    def search(self, query="", limit=50, offset=0, since=None, until=None, profile=None):
+        return search_history(self.path, query, limit, offset, since, until, profile, fts=self.fts)
+
+    def close(self):
+        """
+        Write everything queued and stop the writer.
+        """
+        self.queue.put(None)
+        self.writer.join(timeout=10)
+
+def get_history_store(path, retention_days=30):
+    """
+    The HistoryStore for a database file, created (and closed at exit) on first use.
+    """
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = HistoryStore(path, retention_days)
+            atexit.register(store.close)
+        return store
+
+def fts_query(query):
+    """
+    Turn free text into an FTS5 query: every word must appear, the last one as a prefix.
+    """
+    words = re.findall(r"\w+", query)
+    if not words: return ""
+    return " ".join(f'"{w}"' for w in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
+
+def search_history(path, query="", limit=50, offset=0, since=None, until=None, profile=None, fts=True):
+    """
+    Newest-first page of history rows (dicts) matching all words of query.
+    Opens the database read-only, so it can be used from another process (the GUI).
+    """
+    if not os.path.exists(path): return []
+    conditions, params = [], []
+    match = fts_query(query) if fts else ""
+    if match:
+        source = "history_fts JOIN history h ON h.id = history_fts.rowid"
+        conditions.append("history_fts MATCH ?")
+        params.append(match)
+    else:
+        source = "history h"
+        for word in re.findall(r"\w+", query):
+            conditions.append("h.text LIKE ?")
+            params.append(f"%{word}%")
+    if since is not None:
+        conditions.append("h.time >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("h.time < ?")
+        params.append(until)
+    if profile is not None:
+        conditions.append("h.profile = ?")
+        params.append(profile)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = (f"SELECT {', '.join('h.' + c for c in HISTORY_COLUMNS)} FROM {source} {where} "
+           f"ORDER BY h.id DESC LIMIT ? OFFSET ?")
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, timeout=10)
+    try:
+        try:
+            rows = conn.execute(sql, params + [limit, offset]).fetchall()
+        except sqlite3.OperationalError:
+            if not match: raise
+            # No full-text index in this database
+            return search_history(path, query, limit, offset, since, until, profile, fts=False)
+    finally:
+        conn.close()
+    return [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
@@ -0,0 +1,15 @@
+"""
+Shared HTTP client: one keep-alive connection pool for trigger URL calls and
+cloud API requests, shared by every tenant in server mode.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = 10  # distinct hosts kept alive
+POOL_MAXSIZE = 32      # concurrent connections per host
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
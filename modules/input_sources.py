@@ -0,0 +1,249 @@
+"""
+Audio input sources for the recorder (vad_based_recording).
+
+A source delivers 30 ms frames of 16 kHz mono 16-bit PCM:
+    open()       start capturing (called again after a pause)
+    read(stats)  the next frame, or None when no audio is available right now
+    close()      stop capturing and release the device/socket
+    finished     True once a finite source (file, stdin) is exhausted
+It may add counters (overflows, lost packets, ...) to `stats`, which is
+shown as capture stats in /status.
+
+AUDIO_SOURCE in config.json (or a tenant profile) selects the source:
+    {"type": "device", "device": null}       local microphone: device index, (part of the) name, or null
+                                             for the default device; captured at the device's native
+                                             rate ("native_rate": false for 16 kHz mono from the host
+                                             audio stack), at most "channels" channels mixed to mono
+    {"type": "network", "protocol": "tcp", "host": "127.0.0.1", "port": 8766, "jitter_ms": 60}
+                                             listens on loopback only unless "host" is set, e.g.
+                                             "0.0.0.0" to accept senders from other machines
+    {"type": "file", "path": "session.wav", "realtime": true}
+                                             a WAV file, or every *.wav in a directory (sorted)
+    {"type": "stdin"}                        raw 16 kHz mono s16le PCM piped to stdin
+Any source can also have "tap": "recordings/" to save everything it delivers
+as a WAV file for later replay (whisper.py --tap/--replay/--stdin set these).
+"""
+
+import glob
+import logging
+import os
+import sys
+import time
+import wave
+
+from modules.capture_process import read_frame
+from modules.network_audio import NetworkSource
+
+log = logging.getLogger(__name__)
+
+SOURCE_TYPES = ("device", "network", "file", "stdin")
+# Sources that follow a live stream; the Firebot process check only applies to these
+LIVE_SOURCE_TYPES = ("device", "network")
+RATE = 16000
+FRAME_SECONDS = 0.03
+DEFAULT_NETWORK_PORT = 8766
+DEFAULT_JITTER_MS = 60
+
+class DeviceSource:
+    """
+    A local input device through PyAudio. open_stream(device, native, channels) opens the stream
+    (see modules.audio_devices.open_device_stream).
+    """
+    sample_width = 2
+    finished = False
+
+    def __init__(self, open_stream, frame_size, device=None, native=True, channels=None):
+        self.open_stream = open_stream
+        self.frame_size = frame_size
+        self.device = device
+        self.native = native
+        self.channels = channels
+        self.stream = None
+
+    def open(self):
+        self.stream = self.open_stream(self.device, self.native, self.channels)
+
+    def read(self, stats):
+        # Overflows are counted rather than hidden
+        return read_frame(self.stream, self.frame_size, stats)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+class FileSource:
+    """
+    Replays a WAV file, or every *.wav in a directory in name order.
+
+    With realtime=True frames are delivered at the rate they were recorded;
+    otherwise as fast as the recorder reads them, so a session can be
+    re-run deterministically at many times real time. read() returns None
+    once between files, which ends any utterance at a file boundary.
+    Files must be 16 kHz mono 16-bit.
+    """
+    sample_width = 2
+
+    def __init__(self, path, frame_size, realtime=True):
+        if os.path.isdir(path):
+            self.files = sorted(glob.glob(os.path.join(path, "*.wav")))
+        else:
+            self.files = [path]
+        self.frame_size = frame_size
+        self.realtime = realtime
+        self.index = 0
+        self.position = 0
+        self.wav = None
+        self.finished = not self.files
+        self.clock = None
+        self.frames_read = 0
+
+    def open(self):
+        # Resuming after a pause continues where playback stopped
+        self.clock = None
+        self._open_current()
+
+    def _open_current(self):
+        while self.index < len(self.files):
+            path = self.files[self.index]
+            try:
+                wav = wave.open(path, "rb")
+            except (OSError, wave.Error, EOFError) as e:
+                log.error("Skipping %s: %s", path, e)
+                self.index += 1
+                continue
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (RATE, 1, self.sample_width):
+                log.error("Skipping %s: %d Hz, %d channel(s), %d-bit; replay needs 16 kHz mono 16-bit",
+                          path, wav.getframerate(), wav.getnchannels(), wav.getsampwidth() * 8)
+                wav.close()
+                self.index += 1
+                continue
+            wav.setpos(self.position)
+            self.wav = wav
+            log.info("Replaying %s", path)
+            return
+        self.finished = True
+
+    def read(self, stats):
+        if self.wav is None:
+            return None
+        frame = self.wav.readframes(self.frame_size)
+        if len(frame) < self.frame_size * self.sample_width:
+            # End of this file: one idle read, then the next file
+            self.wav.close()
+            self.wav = None
+            self.index += 1
+            self.position = 0
+            self._open_current()
+            return None
+        self.position += self.frame_size
+        self.frames_read += 1
+        stats["replayed_frames"] = self.frames_read
+        if self.realtime:
+            now = time.monotonic()
+            if self.clock is None:
+                self.clock = now
+            self.clock += FRAME_SECONDS
+            if self.clock > now:
+                time.sleep(self.clock - now)
+        return frame
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+class StdinSource:
+    """
+    Raw 16 kHz mono s16le PCM from stdin, e.g. `ffmpeg ... -f s16le -ar 16000 -ac 1 - | python whisper.py --stdin`.
+    The writer sets the pace; end of input finishes the source.
+    """
+    sample_width = 2
+
+    def __init__(self, frame_bytes, stream=None):
+        self.frame_bytes = frame_bytes
+        self.stream = stream
+        self.finished = False
+
+    def open(self):
+        if self.stream is None:
+            self.stream = sys.stdin.buffer
+
+    def read(self, stats):
+        frame = self.stream.read(self.frame_bytes)
+        if len(frame) < self.frame_bytes:
+            self.finished = True
+            return None
+        return frame
+
+    def close(self):
+        pass
+
+class TapSource:
+    """
+    Wraps another source and writes every frame it delivers to a WAV file in
+    `directory` (one file per open, tap_YYYYmmdd_HHMMSS.wav) for later replay.
+    """
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+        self.wav = None
+        self.path = None
+
+    @property
+    def sample_width(self):
+        return self.source.sample_width
+
+    @property
+    def finished(self):
+        return self.source.finished
+
+    def open(self):
+        self.source.open()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, time.strftime("tap_%Y%m%d_%H%M%S.wav"))
+        self.wav = wave.open(self.path, "wb")
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(self.source.sample_width)
+        self.wav.setframerate(RATE)
+        log.info("Recording input to %s", self.path)
+
+    def read(self, stats):
+        frame = self.source.read(stats)
+        if frame is not None:
+            self.wav.writeframesraw(frame)
+        return frame
+
+    def close(self):
+        self.source.close()
+        if self.wav is not None:
+            # Writes the final header sizes
+            self.wav.close()
+            self.wav = None
+
+def is_live(spec):
+    return (spec or {}).get("type", "device") in LIVE_SOURCE_TYPES
+
+def make_source(spec, open_stream, frame_size, frame_bytes):
+    """
+    Build the input source described by an AUDIO_SOURCE setting.
+    """
+    spec = spec or {}
+    source_type = spec.get("type", "device")
+    if source_type == "device":
+        source = DeviceSource(open_stream, frame_size, spec.get("device"), spec.get("native_rate", True),
+                              spec.get("channels"))
+    elif source_type == "network":
+        source = NetworkSource(spec.get("host", "127.0.0.1"), int(spec.get("port", DEFAULT_NETWORK_PORT)),
+                               spec.get("protocol", "tcp"), frame_bytes,
+                               float(spec.get("jitter_ms", DEFAULT_JITTER_MS)))
+    elif source_type == "file":
+        source = FileSource(spec.get("path", ""), frame_size, spec.get("realtime", True))
+    elif source_type == "stdin":
+        source = StdinSource(frame_bytes)
+    else:
+        raise ValueError(f"Unknown audio source type '{source_type}'")
+    if spec.get("tap"):
+        source = TapSource(source, spec["tap"])
+    return source
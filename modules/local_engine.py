@@ -0,0 +1,113 @@
+"""
+Offline speech recognition worker processes (Vosk).
+
+The model is loaded once per worker process by the pool initializer (or by the
+streaming worker) and reused for every utterance. This module is imported in
+the workers, so it must not import the configuration or any GUI/audio modules.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor, wait
+
+log = logging.getLogger(__name__)
+
+# Per-process model, set by init_worker
+_model = None
+
+def is_available(model_path):
+    """
+    Return True if Vosk is installed and the model directory exists.
+    """
+    return importlib.util.find_spec("vosk") is not None and bool(model_path) and os.path.isdir(model_path)
+
+def init_worker(model_path):
+    """
+    Pool initializer: load the model into this worker process.
+    """
+    global _model
+    import vosk
+    vosk.SetLogLevel(-1)
+    _model = vosk.Model(model_path)
+
+def warmup():
+    """
+    No-op task used to make sure a worker has finished loading its model.
+    """
+    return os.getpid()
+
+def transcribe_pcm(pcm, rate):
+    """
+    Transcribe 16-bit mono PCM with the worker's model.
+    """
+    import vosk
+    recognizer = vosk.KaldiRecognizer(_model, rate)
+    recognizer.AcceptWaveform(bytes(pcm))
+    return json.loads(recognizer.FinalResult()).get("text", "")
+
+def transcribe_file(filename):
+    """
+    Transcribe a 16-bit mono WAV file with the worker's model.
+    """
+    with wave.open(filename, 'rb') as wf:
+        return transcribe_pcm(wf.readframes(wf.getnframes()), wf.getframerate())
+
+def start_pool(model_path, workers=1):
+    """
+    Start a pool of worker processes and block until every worker has loaded the model.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path,))
+    wait([pool.submit(warmup) for _ in range(workers)])
+    log.info("Local recognition engine ready (%d worker(s), model: %s)", workers, model_path)
+    return pool
+
+def streaming_worker(conn, model_path):
+    """
+    Process entry point for streaming recognition.
+
+    Messages received on conn (in order, one utterance at a time):
+      ("start", rate), ("audio", pcm_bytes)..., ("end", None), or ("stop", None).
+    Sends ("ready", None) once the model is loaded, ("partial", text) whenever the
+    hypothesis changes and ("final", text) after each "end".
+    """
+    init_worker(model_path)
+    import vosk
+    conn.send(("ready", None))
+
+    recognizer = None
+    segments = []
+    last_partial = ""
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if kind == "start":
+            recognizer = vosk.KaldiRecognizer(_model, payload)
+            segments = []
+            last_partial = ""
+        elif kind == "audio" and recognizer is not None:
+            if recognizer.AcceptWaveform(payload):
+                # Vosk found an internal endpoint; keep the finished segment
+                text = json.loads(recognizer.Result()).get("text", "")
+                if text:
+                    segments.append(text)
+                hypothesis = " ".join(segments)
+            else:
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                hypothesis = " ".join(segments + [partial]).strip()
+            if hypothesis and hypothesis != last_partial:
+                last_partial = hypothesis
+                conn.send(("partial", hypothesis))
+        elif kind == "end":
+            text = ""
+            if recognizer is not None:
+                text = json.loads(recognizer.FinalResult()).get("text", "")
+            conn.send(("final", " ".join(segments + [text]).strip()))
+            recognizer = None
+        elif kind == "stop":
+            break
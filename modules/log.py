@@ -0,0 +1,208 @@
+"""
+Logging for the voice trigger process.
+
+Modules log through the standard library (`log = logging.getLogger(__name__)`);
+setup_logging() routes every record through a queue to one background writer
+thread, so callers never block on the console pipe or the log file:
+  - Records are written in batches with one flush per batch.
+  - Repeats of the same message are rate limited before they are queued.
+  - An optional size-rotated log file receives the same records.
+  - Debug records are dropped by the level check, before any formatting, so
+    debug calls cost almost nothing when disabled. Pass arguments %-style
+    (log.debug("Saved %s", name)) rather than pre-formatting an f-string.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+from modules.profiler import register_gauge
+
+MAX_BATCH = 256
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_writer = None
+
+class RateLimitFilter(logging.Filter):
+    """
+    Allow at most `limit` identical messages (same logger, level and text) every `window` seconds.
+    The first record after a suppressed run reports how many were dropped.
+    """
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.entries = {}  # (logger, level, message) -> [window_start, count, suppressed]
+
+    def filter(self, record):
+        if self.limit <= 0:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                if len(self.entries) > 1000:
+                    self._prune(now)
+                self.entries[key] = [now, 1, 0]
+                if suppressed:
+                    # The message is already formatted (it may contain a literal %)
+                    record.msg = f"{key[2]} [{suppressed} similar message(s) suppressed]"
+                    record.args = ()
+                return True
+            if entry[1] < self.limit:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            return False
+
+    def _prune(self, now):
+        for key in [k for k, e in self.entries.items() if now - e[0] >= self.window]:
+            del self.entries[key]
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Plain messages for INFO, level-prefixed otherwise (matches the old print output).
+    """
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"{record.levelname}: {message}"
+
+class RotatingFile:
+    """
+    Append-only log file rotated by size (name, name.1 ... name.N).
+    Written by the background writer only, so no locking is needed.
+    """
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.stream = open(path, "a", encoding="utf-8")
+        self.size = self.stream.tell()
+
+    def write(self, text):
+        if self.max_bytes > 0 and self.size + len(text) > self.max_bytes and self.size > 0:
+            self.rotate()
+        self.stream.write(text)
+        self.size += len(text)
+
+    def rotate(self):
+        self.stream.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.stream = open(self.path, "w", encoding="utf-8")
+        self.size = 0
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+class BackgroundLogWriter:
+    """
+    Drains the log queue on a daemon thread and writes each batch to the sinks.
+    """
+    def __init__(self, log_queue, console=None, log_file=None):
+        self.queue = log_queue
+        self.console = console
+        self.log_file = log_file
+        self.console_formatter = ConsoleFormatter(CONSOLE_FORMAT)
+        self.file_formatter = logging.Formatter(FILE_FORMAT)
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [record for record in batch if record is not None]
+            self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            if self.console is not None:
+                self.console.write("".join(self.console_formatter.format(r) + "\n" for r in batch))
+                self.console.flush()
+            if self.log_file is not None:
+                # Line by line so rotation happens at the size limit; the file itself is buffered
+                for record in batch:
+                    self.log_file.write(self.file_formatter.format(record) + "\n")
+                self.log_file.flush()
+        except Exception as e:
+            if sys.__stderr__ is not None:
+                sys.__stderr__.write(f"Log writer error: {e}\n")
+
+    def stop(self, timeout=2.0):
+        self.queue.put(None)
+        self.thread.join(timeout)
+        if self.log_file is not None:
+            self.log_file.close()
+
+def setup_logging(level="INFO", log_file="", max_bytes=1048576, backups=3, rate_limit=5, rate_window=10.0):
+    """
+    Route all logging through the background writer (console plus optional rotating file).
+    Safe to call more than once; later calls replace the previous setup.
+    """
+    global _writer
+    shutdown_logging()
+
+    log_queue = queue.SimpleQueue()
+    file_sink = None
+    if log_file:
+        try:
+            file_sink = RotatingFile(log_file, max_bytes, backups)
+        except OSError as e:
+            print(f"Could not open log file {log_file}: {e}")
+    _writer = BackgroundLogWriter(log_queue, console=sys.stdout, log_file=file_sink)
+
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(rate_limit, rate_window))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    # requests/urllib3 log every connection at debug level; too noisy even when debugging
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+def shutdown_logging():
+    """
+    Write out everything queued so far and stop the writer thread.
+    """
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+def queue_depth():
+    return _writer.queue.qsize() if _writer is not None else 0
+
+register_gauge("log_queue", queue_depth)
+atexit.register(shutdown_logging)
@@ -0,0 +1,402 @@
+"""
+Network audio: receive 16 kHz mono 16-bit PCM from another machine (an OBS
+script, `audio_sender.py`) over TCP or WebSocket.
+
+Every packet is a 6-byte header followed by little-endian PCM:
+
+    sequence  uint32, big-endian, +1 per packet
+    length    uint16, big-endian, payload bytes (even, <= MAX_PAYLOAD)
+
+Over TCP packets are sent back to back on the stream; over WebSocket each
+binary message is one packet. Packets can carry any number of samples; the
+receiver re-chunks them into the recorder's 30 ms frames.
+
+The receiver puts packets through a JitterBuffer, which restores sequence
+order, waits up to jitter_ms for a missing packet and then conceals the gap
+with silence (so VAD timing and segmentation stay aligned with real time) and
+counts packets lost, late, duplicated or reordered.
+"""
+
+import base64
+import hashlib
+import logging
+import socket
+import struct
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+PACKET_HEADER = struct.Struct("!IH")
+MAX_PAYLOAD = 65534
+# A gap larger than this (e.g. a restarted sender) is skipped instead of filled with silence
+MAX_CONCEALED_PACKETS = 50
+ACCEPT_TIMEOUT = 0.5
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def encode_packet(sequence, payload):
+    return PACKET_HEADER.pack(sequence & 0xFFFFFFFF, len(payload)) + bytes(payload)
+
+class JitterBuffer:
+    """
+    Reorders packets by sequence number and conceals lost ones.
+
+    pop() returns the next packet as soon as it is available. If a later packet
+    has arrived but the next one has not, it waits until jitter_ms after the gap
+    was first seen (or until max_packets are queued), then returns silence in its
+    place. Packets that arrive after their slot was concealed are dropped as late.
+    """
+    def __init__(self, jitter_ms=60, max_packets=64, default_size=960):
+        self.jitter = jitter_ms / 1000.0
+        self.max_packets = max_packets
+        self.default_size = default_size
+        self.cond = threading.Condition()
+        self.stats = {"packets": 0, "lost": 0, "late": 0, "duplicates": 0, "reordered": 0,
+                      "max_depth": 0, "skipped_gaps": 0}
+        self.reset()
+
+    def reset(self):
+        """
+        Start over for a new sender (sequence numbers restart).
+        """
+        with self.cond:
+            self.packets = {}
+            self.next_seq = None
+            self.highest = None
+            self.gap_since = None
+            self.last_size = self.default_size
+
+    def push(self, sequence, payload):
+        with self.cond:
+            self.stats["packets"] += 1
+            if self.next_seq is None:
+                self.next_seq = sequence
+            if sequence < self.next_seq:
+                self.stats["late"] += 1
+                return
+            if sequence in self.packets:
+                self.stats["duplicates"] += 1
+                return
+            if self.highest is not None and sequence < self.highest:
+                self.stats["reordered"] += 1
+            self.highest = sequence if self.highest is None else max(self.highest, sequence)
+            self.packets[sequence] = payload
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self.packets))
+            self.cond.notify()
+
+    def pop(self, timeout):
+        """
+        Return the next payload in sequence order (silence for a lost packet),
+        or None if nothing arrived within `timeout` seconds.
+        """
+        idle_deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                payload = self.packets.pop(self.next_seq, None) if self.next_seq is not None else None
+                if payload is not None:
+                    self.next_seq += 1
+                    self.gap_since = None
+                    self.last_size = len(payload) or self.last_size
+                    return payload
+                now = time.monotonic()
+                if self.packets:
+                    # A later packet is here but the next one is not
+                    if self.gap_since is None:
+                        self.gap_since = now
+                    gap_deadline = self.gap_since + self.jitter
+                    if now >= gap_deadline or len(self.packets) >= self.max_packets:
+                        return self._conceal()
+                    self.cond.wait(gap_deadline - now)
+                else:
+                    if now >= idle_deadline:
+                        return None
+                    self.cond.wait(idle_deadline - now)
+
+    def _conceal(self):
+        missing = min(self.packets) - self.next_seq
+        if missing > MAX_CONCEALED_PACKETS:
+            # Too long to fill with silence; continue from the next packet we have
+            self.stats["lost"] += missing
+            self.stats["skipped_gaps"] += 1
+            self.next_seq += missing
+            payload = self.packets.pop(self.next_seq)
+            self.next_seq += 1
+            self.gap_since = None
+            return payload
+        self.stats["lost"] += 1
+        self.next_seq += 1
+        return bytes(self.last_size)
+
+def recv_exact(conn, size):
+    """
+    Read exactly `size` bytes, or return None if the connection closed first.
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+def unmask(payload, mask):
+    if not payload:
+        return payload
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+def websocket_handshake(conn):
+    """
+    Answer a WebSocket upgrade request. Returns False if the request is not one.
+    """
+    request = bytearray()
+    while b"\r\n\r\n" not in request:
+        chunk = conn.recv(4096)
+        if not chunk or len(request) > 16384:
+            return False
+        request += chunk
+    key = None
+    for line in bytes(request).decode("latin-1").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sec-websocket-key":
+            key = value.strip()
+    if not key:
+        conn.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        return False
+    accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+    conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("ascii"))
+    return True
+
+def websocket_connect(host, port, path="/"):
+    """
+    Open a client WebSocket connection; returns the socket.
+    """
+    conn = socket.create_connection((host, port))
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    key = base64.b64encode(hashlib.sha1(str(time.time()).encode("ascii")).digest()[:16]).decode("ascii")
+    conn.sendall((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                  "Sec-WebSocket-Version: 13\r\n\r\n").encode("ascii"))
+    response = bytearray()
+    while b"\r\n\r\n" not in response:
+        chunk = conn.recv(4096)
+        if not chunk:
+            conn.close()
+            raise ConnectionError("WebSocket handshake failed")
+        response += chunk
+    if b" 101 " not in response.split(b"\r\n", 1)[0]:
+        conn.close()
+        raise ConnectionError("WebSocket upgrade refused")
+    return conn
+
+def websocket_frame(data, opcode=0x2, masked=True):
+    """
+    Encode one WebSocket frame. Client frames must be masked (RFC 6455); a zero
+    mask keeps the payload as is.
+    """
+    mask_bit = 0x80 if masked else 0
+    if len(data) < 126:
+        header = bytes([0x80 | opcode, mask_bit | len(data)])
+    elif len(data) < 65536:
+        header = bytes([0x80 | opcode, mask_bit | 126]) + struct.pack("!H", len(data))
+    else:
+        header = bytes([0x80 | opcode, mask_bit | 127]) + struct.pack("!Q", len(data))
+    return header + (bytes(4) if masked else b"") + data
+
+def websocket_messages(conn, text=False, masked=False):
+    """
+    Yield the binary (and with text=True, text) messages of a WebSocket connection
+    until it closes. Pings are answered; masked is set on the client side.
+    """
+    message = bytearray()
+    while True:
+        header = recv_exact(conn, 2)
+        if header is None:
+            return
+        fin, opcode = header[0] & 0x80, header[0] & 0x0F
+        frame_masked, length = header[1] & 0x80, header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", recv_exact(conn, 2) or b"\0\0")[0]
+        elif length == 127:
+            length = struct.unpack("!Q", recv_exact(conn, 8) or bytes(8))[0]
+        mask = recv_exact(conn, 4) if frame_masked else None
+        payload = recv_exact(conn, length) if length else b""
+        if payload is None:
+            return
+        if mask:
+            payload = unmask(payload, mask)
+        if opcode == 0x8:
+            conn.sendall(websocket_frame(b"", 0x8, masked))
+            return
+        if opcode == 0x9:
+            conn.sendall(websocket_frame(payload[:125], 0xA, masked))
+            continue
+        if opcode in (0x0, 0x2) or (text and opcode == 0x1):
+            message += payload
+            if fin:
+                yield bytes(message)
+                message.clear()
+
+def tcp_packets(conn):
+    """
+    Yield (sequence, payload) from a raw TCP connection until it closes.
+    """
+    while True:
+        header = recv_exact(conn, PACKET_HEADER.size)
+        if header is None:
+            return
+        sequence, length = PACKET_HEADER.unpack(header)
+        payload = recv_exact(conn, length) if length else b""
+        if payload is None:
+            return
+        yield sequence, payload
+
+class NetworkSource:
+    """
+    Input source that listens for one sender at a time and yields 30 ms frames.
+
+    protocol is "tcp" or "websocket". Senders are served one at a time; the
+    next connection is accepted once the current sender disconnects. While no
+    audio arrives read() returns None, which ends an utterance in progress.
+    """
+    sample_width = 2
+    finished = False
+
+    def __init__(self, host="127.0.0.1", port=8766, protocol="tcp", frame_bytes=960, jitter_ms=60,
+                 idle_timeout=0.5):
+        if protocol not in ("tcp", "websocket"):
+            raise ValueError(f"Unknown network audio protocol '{protocol}'")
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.frame_bytes = frame_bytes
+        self.idle_timeout = idle_timeout
+        self.jitter = JitterBuffer(jitter_ms, default_size=frame_bytes)
+        self.pending = bytearray()
+        self.server = None
+        self.conn = None
+        self.thread = None
+        self.connections = 0
+        self.bytes_received = 0
+        self.connected = False
+
+    def open(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(1)
+        self.server.settimeout(ACCEPT_TIMEOUT)
+        # Port 0 picks a free port (loopback benchmark)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept_loop, args=(self.server,),
+                                       name="network-audio", daemon=True)
+        self.thread.start()
+        log.info("Network audio (%s) listening on %s:%s", self.protocol, self.host, self.port)
+
+    def _accept_loop(self, server):
+        while True:
+            try:
+                conn, address = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # closed
+            conn.settimeout(None)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections += 1
+            self.jitter.reset()
+            log.info("Network audio sender connected from %s:%s", *address[:2])
+            self.conn = conn
+            self.connected = True
+            try:
+                self._receive(conn)
+            except OSError as e:
+                log.warning("Network audio connection error: %s", e)
+            finally:
+                self.connected = False
+                self.conn = None
+                conn.close()
+                log.info("Network audio sender disconnected")
+
+    def _receive(self, conn):
+        if self.protocol == "websocket":
+            if not websocket_handshake(conn):
+                return
+            for message in websocket_messages(conn):
+                if len(message) < PACKET_HEADER.size:
+                    continue
+                sequence, length = PACKET_HEADER.unpack_from(message)
+                self.bytes_received += len(message)
+                self.jitter.push(sequence, message[PACKET_HEADER.size:PACKET_HEADER.size + length])
+        else:
+            for sequence, payload in tcp_packets(conn):
+                self.bytes_received += PACKET_HEADER.size + len(payload)
+                self.jitter.push(sequence, payload)
+
+    def read(self, stats):
+        """
+        Return the next 30 ms frame, or None if no audio arrived for idle_timeout seconds.
+        """
+        while len(self.pending) < self.frame_bytes:
+            payload = self.jitter.pop(self.idle_timeout)
+            if payload is None:
+                self.pending.clear()
+                stats.update(self.jitter.stats)
+                return None
+            self.pending += payload
+        frame = bytes(self.pending[:self.frame_bytes])
+        del self.pending[:self.frame_bytes]
+        stats.update(self.jitter.stats)
+        return frame
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        conn = self.conn
+        if conn is not None:
+            # Wakes the receive loop blocked on the sender's connection
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.thread is not None:
+            self.thread.join(timeout=ACCEPT_TIMEOUT * 2)
+            self.thread = None
+
+class NetworkSender:
+    """
+    Client side: send PCM to a NetworkSource (used by audio_sender.py and the loopback benchmark).
+    """
+    def __init__(self, host, port, protocol="tcp"):
+        self.protocol = protocol
+        self.sequence = 0
+        if protocol == "websocket":
+            self.conn = websocket_connect(host, port, "/audio")
+        else:
+            self.conn = socket.create_connection((host, port))
+            self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def packet(self, payload, sequence=None):
+        """
+        Encode one packet (the next sequence number unless given).
+        """
+        if sequence is None:
+            sequence = self.sequence
+            self.sequence += 1
+        data = encode_packet(sequence, payload)
+        if self.protocol != "websocket":
+            return data
+        return websocket_frame(data)
+
+    def send(self, payload, sequence=None):
+        self.conn.sendall(self.packet(payload, sequence))
+
+    def close(self):
+        if self.protocol == "websocket":
+            try:
+                self.conn.sendall(websocket_frame(b"", 0x8))
+            except OSError:
+                pass
+        self.conn.close()
@@ -1,40 +1,121 @@
+import codecs
 import subprocess
 import os
 import sys
 import threading
 import time
 
+from modules.supervision import MARKER
+
 # Windows-specific imports for Job objects
 if os.name == 'nt':
     import win32job
     import win32api
 
+OUTPUT_READ_SIZE = 4096
+
+# Supervision (supervise_restarts / standby_instance)
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 10.0  # no pong for this long: the listener is hung and gets restarted
+STARTUP_GRACE = 60.0  # time for imports and engine start-up before the first pong is due
+STALL_SECONDS = 15.0  # audio loop not running for this long while listening: restarted
+RESTART_DELAYS = (1, 2, 5, 10, 30)  # crash-loop backoff, by number of crashes in a row
+STABLE_SECONDS = 60.0  # a listener that ran this long resets the crash count
+STANDBY_DELAY = 2.0  # before starting a new standby, so it does not compete with the listener starting up
+STANDBY_TAIL = 4000  # characters of a standby's output kept to show if it fails
+
+class Child:
+    """
+    One supervised listener process and its heartbeat and takeover state.
+    role is "active", "standby" or "retired" (being stopped; its exit is not a crash).
+    """
+    def __init__(self, process, job, role):
+        self.process = process
+        self.job = job
+        self.role = role
+        self.started = time.monotonic()
+        self.config_mtime = None
+        self.read_thread = None
+        self.partial = ""  # unfinished control line carried over between reads
+        self.tail = ""
+        self.ready = threading.Event()
+        self.pings = 0
+        self.last_ping = 0.0
+        self.last_pong = None
+        self.healthy = True
+        self.killed = False
+        self.exit_code = None
+        self.exited_at = None
+        self.notify_exit = False
+        self.takeover_from = None
+        self.takeover_kind = None
+
+    def send(self, command):
+        try:
+            self.process.stdin.write(f"{command}\n".encode("utf-8"))
+            self.process.stdin.flush()
+            return True
+        except (OSError, ValueError):
+            return False
+
 class ProcessManager:
-    def __init__(self, on_output_callback=None, on_exit_callback=None):
+    """
+    Runs the listener program and forwards its output.
+
+    With supervise set, the listener is started with --supervised: it answers
+    heartbeats on its stdin and is restarted when it crashes, hangs or its audio
+    loop stalls, with growing delays while it keeps crashing. With standby set, a
+    second, fully initialized instance (--standby) waits to take over, so a crash
+    or a relaunch costs the time to open the audio input instead of a cold start.
+    Failover and restart times are printed and kept in failover_times/restart_times (ms).
+    """
+    def __init__(self, on_output_callback=None, on_exit_callback=None, standby=False, supervise=False, config_path=None):
         self.process = None
         self.job = None
         self.read_thread = None
         self.stop_thread = False
         self.on_output = on_output_callback or (lambda x: print(x, end=""))
         self.on_exit = on_exit_callback or (lambda x: None)
+        self.config_path = config_path  # a standby started before the config changed is not used
+        self.target_path = None
+        self.active = None
+        self.standby = None
+        self.lock = threading.RLock()
+        self.wake = threading.Event()
+        self.generation = 0
+        self.crashes = 0
+        self.restart_at = None
+        self.restart_from = None
+        self.standby_at = None
+        self.failover_times = []
+        self.restart_times = []
+        self.use_standby = self.supervise = False
+        self.configure(standby, supervise)
+        self._apply_settings()
 
-    def launch(self, target_path):
-        if self.process:
-            self.terminate()
-
-        if not target_path or not os.path.exists(target_path):
-            raise FileNotFoundError(f"Invalid target program path: '{target_path}'")
+    def configure(self, standby=False, supervise=False):
+        """
+        Supervision settings; they apply from the next launch.
+        """
+        self.settings = (bool(standby), bool(supervise) or bool(standby))
 
-        print(f"Launching: {target_path}")
+    def _apply_settings(self):
+        if (self.use_standby, self.supervise) != self.settings:
+            # Stop the listener under the old settings before switching
+            if self.process or self.active or self.standby:
+                self.terminate()
+            self.use_standby, self.supervise = self.settings
 
+    def _spawn(self, target_path, args=()):
         # On Windows, set flags to create a new process group and prepare a Job object.
+        job = None
         if os.name == 'nt':
             creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW
             # Create the Job object configured to kill all processes on job close.
-            self.job = win32job.CreateJobObject(None, "")
-            job_info = win32job.QueryInformationJobObject(self.job, win32job.JobObjectExtendedLimitInformation)
+            job = win32job.CreateJobObject(None, "")
+            job_info = win32job.QueryInformationJobObject(job, win32job.JobObjectExtendedLimitInformation)
             job_info['BasicLimitInformation']['LimitFlags'] |= win32job.JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
-            win32job.SetInformationJobObject(self.job, win32job.JobObjectExtendedLimitInformation, job_info)
+            win32job.SetInformationJobObject(job, win32job.JobObjectExtendedLimitInformation, job_info)
         else:
             creation_flags = 0
 
@@ -47,8 +128,8 @@ class ProcessManager:
         else:
             cmd = [target_path]
 
-        self.process = subprocess.Popen(
-            cmd,
+        process = subprocess.Popen(
+            cmd + list(args),
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             stdin=subprocess.PIPE,
@@ -59,8 +140,24 @@ class ProcessManager:
         )
 
         # On Windows, assign the process to the Job object.
-        if os.name == 'nt' and self.job:
-            win32job.AssignProcessToJobObject(self.job, self.process._handle)
+        if os.name == 'nt' and job:
+            win32job.AssignProcessToJobObject(job, process._handle)
+        return process, job
+
+    def launch(self, target_path):
+        if not target_path or not os.path.exists(target_path):
+            raise FileNotFoundError(f"Invalid target program path: '{target_path}'")
+
+        self._apply_settings()
+        if self.supervise:
+            self._launch_supervised(target_path)
+            return
+
+        if self.process:
+            self.terminate()
+
+        print(f"Launching: {target_path}")
+        self.process, self.job = self._spawn(target_path)
 
         self.stop_thread = False
         self.read_thread = threading.Thread(target=self._read_process_output)
@@ -68,6 +165,10 @@ class ProcessManager:
         self.read_thread.start()
 
     def terminate(self):
+        if self.supervise:
+            self._terminate_supervised()
+            return
+
         if not self.process:
             return
 
@@ -108,17 +209,21 @@ class ProcessManager:
     def _read_process_output(self):
         if not self.process:
             return
-        
+
+        # Read whatever is available (the child writes log output in batches) instead of
+        # one byte at a time; the incremental decoder handles characters split across reads
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
         try:
             while self.process and not self.stop_thread:
                 if self.process.poll() is not None:
                     break
                 try:
-                    output = self.process.stdout.read(1)
+                    output = self.process.stdout.read1(OUTPUT_READ_SIZE)
                     if output:
                         try:
-                            text = output.decode('utf-8', errors='replace')
-                            self.on_output(text)
+                            text = decoder.decode(output)
+                            if text:
+                                self.on_output(text)
                         except Exception as e:
                             print(f"Decoding error: {e}")
                     else:
@@ -138,3 +243,264 @@ class ProcessManager:
                 except:
                     pass
             self.on_exit(exit_code)
+
+    # --- supervised listeners -------------------------------------------------
+
+    def _launch_supervised(self, target_path):
+        with self.lock:
+            now = time.monotonic()
+            self.target_path = target_path
+            if self.active and self._standby_ready():
+                # Relaunch: the standby takes over while the old instance is stopped
+                print(f"Relaunching: {target_path} (handing over to the standby instance)")
+                old, self.active = self.active, None
+                self._stop_child(old)
+                self._promote(now, "Relaunch")
+            else:
+                self._terminate_supervised()
+                print(f"Launching: {target_path}")
+                self._start_active(now, "Start")
+            self.crashes = 0
+            self.restart_at = None
+            if self.use_standby and self.standby is None:
+                self.standby_at = now + STANDBY_DELAY
+            self.generation += 1
+            threading.Thread(target=self._supervise, args=(self.generation,), name="listener-supervisor",
+                             daemon=True).start()
+
+    def _terminate_supervised(self):
+        with self.lock:
+            self.generation += 1  # stops the supervisor
+            children = [child for child in (self.active, self.standby) if child]
+            if self.active:
+                self.active.notify_exit = True
+            self.active = self.standby = None
+            self.process = self.job = None
+            self.restart_at = self.standby_at = None
+        if children:
+            print("Terminating running process and its children...")
+        for child in children:
+            self._stop_child(child)
+        if children:
+            print("Process terminated")
+
+    def _start_child(self, role, args):
+        process, job = self._spawn(self.target_path, args)
+        child = Child(process, job, role)
+        if self.config_path and os.path.exists(self.config_path):
+            child.config_mtime = os.path.getmtime(self.config_path)
+        child.read_thread = threading.Thread(target=self._read_child_output, args=(child,), daemon=True)
+        child.read_thread.start()
+        return child
+
+    def _start_active(self, since, kind):
+        child = self._start_child("active", ["--supervised"])
+        child.takeover_from, child.takeover_kind = since, kind
+        self.active = child
+        self.process, self.job = child.process, child.job
+
+    def _standby_ready(self):
+        standby = self.standby
+        if standby is None or not standby.ready.is_set() or standby.exited_at is not None:
+            return False
+        if self.config_path and os.path.exists(self.config_path) \
+                and os.path.getmtime(self.config_path) != standby.config_mtime:
+            # Started with an older configuration: replace it rather than switch to it
+            print("Configuration changed since the standby instance started; restarting it")
+            self.standby = None
+            self._stop_child(standby)
+            self.standby_at = time.monotonic()
+            return False
+        return True
+
+    def _promote(self, since, kind):
+        child, self.standby = self.standby, None
+        child.role = "active"
+        child.started = time.monotonic()
+        child.takeover_from, child.takeover_kind = since, kind
+        child.tail = ""
+        child.send("activate")
+        self.active = child
+        self.process, self.job = child.process, child.job
+        if self.use_standby:
+            self.standby_at = time.monotonic() + max(STANDBY_DELAY, self._backoff())
+
+    def _backoff(self):
+        if not self.crashes:
+            return 0
+        return RESTART_DELAYS[min(self.crashes, len(RESTART_DELAYS)) - 1]
+
+    def _stop_child(self, child):
+        child.role = "retired"
+        child.send("stop")
+        try:
+            # On Windows, close the Job object handle; this kills all processes in the job.
+            if os.name == 'nt' and child.job:
+                win32api.CloseHandle(child.job)
+                child.job = None
+            try:
+                child.process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                print("Process did not terminate within timeout, killing forcefully...")
+                child.process.kill()
+                child.process.wait(timeout=3)
+        except Exception as e:
+            print(f"Error terminating process: {e}")
+        if child.read_thread and child.read_thread is not threading.current_thread():
+            child.read_thread.join(timeout=3)
+
+    def _kill(self, child, reason):
+        print(f"Listener {reason}; killing it")
+        child.killed = True
+        try:
+            if os.name == 'nt' and child.job:
+                win32api.CloseHandle(child.job)
+                child.job = None
+            else:
+                child.process.kill()
+        except Exception as e:
+            print(f"Error killing process: {e}")
+
+    def _read_child_output(self, child):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            while True:
+                output = child.process.stdout.read1(OUTPUT_READ_SIZE)
+                if not output:
+                    break
+                text = self._take_control_lines(child, decoder.decode(output))
+                if not text:
+                    continue
+                if child.role == "active":
+                    self.on_output(text)
+                elif child.role == "standby":
+                    child.tail = (child.tail + text)[-STANDBY_TAIL:]
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                child.exit_code = child.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                child.process.stdout.close()
+                child.process.stdin.close()
+            except OSError:
+                pass
+            child.exited_at = time.monotonic()
+            if child.notify_exit:
+                self.on_exit(child.exit_code)
+            self.wake.set()
+
+    def _take_control_lines(self, child, text):
+        """
+        Handle the listener's control lines (MARKER ... newline) and return the rest of the output.
+        """
+        text = child.partial + text
+        child.partial = ""
+        output = []
+        while True:
+            start = text.find(MARKER)
+            if start < 0:
+                output.append(text)
+                break
+            output.append(text[:start])
+            end = text.find("\n", start)
+            if end < 0:
+                child.partial = text[start:]
+                break
+            self._on_control(child, text[start + 1:end].split())
+            text = text[end + 1:]
+        return "".join(output)
+
+    def _on_control(self, child, parts):
+        if not parts:
+            return
+        now = time.monotonic()
+        if parts[0] == "pong" and len(parts) >= 4:
+            child.last_pong = now
+            loop_age = float(parts[3])
+            child.healthy = parts[2] == "1" and loop_age < STALL_SECONDS
+        elif parts[0] == "standby":
+            child.ready.set()
+            print(f"Standby instance ready ({now - child.started:.1f} s to initialize)")
+            self.wake.set()
+        elif parts[0] == "active" and child.takeover_from is not None:
+            elapsed_ms = (now - child.takeover_from) * 1000
+            (self.failover_times if child.takeover_kind in ("Failover", "Relaunch") else self.restart_times).append(elapsed_ms)
+            print(f"{child.takeover_kind}: listening after {elapsed_ms:.0f} ms")
+            child.takeover_from = None
+
+    def _supervise(self, generation):
+        while True:
+            self.wake.wait(0.5)
+            self.wake.clear()
+            with self.lock:
+                if generation != self.generation:
+                    return
+                now = time.monotonic()
+                self._check_exits(now)
+                self._check_heartbeats(now)
+                self._check_schedule(now)
+
+    def _check_exits(self, now):
+        standby = self.standby
+        if standby and standby.exited_at is not None:
+            self.standby = None
+            self.crashes += 1
+            print(f"Standby instance exited with code {standby.exit_code}")
+            if standby.tail:
+                print(standby.tail.rstrip()[-1000:])
+            self.standby_at = now + max(STANDBY_DELAY, self._backoff())
+
+        active = self.active
+        if active is None or active.exited_at is None:
+            return
+        self.active = None
+        self.process = self.job = None
+        if active.exit_code == 0 and not active.killed:
+            # A deliberate shutdown (e.g. Firebot closed or a termination trigger) is not restarted
+            self.generation += 1
+            if self.standby:
+                self._stop_child(self.standby)
+                self.standby = None
+            self.on_exit(active.exit_code)
+            return
+
+        self.crashes = 1 if now - active.started >= STABLE_SECONDS else self.crashes + 1
+        reason = "stopped responding" if active.killed else f"exited with code {active.exit_code}"
+        if self._standby_ready():
+            print(f"Listener {reason}; switching to the standby instance")
+            self._promote(active.exited_at, "Failover")
+        else:
+            delay = self._backoff()
+            print(f"Listener {reason}; restarting in {delay} s ({self.crashes} crash(es) in a row)")
+            self.restart_at = now + delay
+            self.restart_from = active.exited_at
+
+    def _check_heartbeats(self, now):
+        for child in (self.active, self.standby):
+            if child is None or child.exited_at is not None or child.killed:
+                continue
+            if now - child.last_ping >= HEARTBEAT_INTERVAL:
+                child.pings += 1
+                child.send(f"ping {child.pings}")
+                child.last_ping = now
+            deadline = child.last_pong + HEARTBEAT_TIMEOUT if child.last_pong else child.started + STARTUP_GRACE
+            if now > deadline:
+                self._kill(child, "stopped answering heartbeats")
+            elif child is self.active and not child.healthy:
+                self._kill(child, "audio loop stalled")
+
+    def _check_schedule(self, now):
+        if self.active is None and self.restart_at is not None:
+            if self._standby_ready():
+                # A standby became ready during the backoff
+                self.restart_at = None
+                self._promote(self.restart_from, "Failover")
+            elif now >= self.restart_at:
+                self.restart_at = None
+                self._start_active(self.restart_from, "Restart")
+        if self.use_standby and self.standby is None and self.standby_at is not None and now >= self.standby_at:
+            self.standby_at = None
+            self.standby = self._start_child("standby", ["--standby"])
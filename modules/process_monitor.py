@@ -1,8 +1,11 @@
+import logging
 import time
 import psutil
 import threading
 from modules.config_manager import FIREBOT_REQUIRED, FIREBOT_CHECK_INTERVAL, REQUIRED_PROCESS_NAME
 
+log = logging.getLogger(__name__)
+
 # Global instances (module-level state)
 firebot_running = True
 firebot_lock = threading.Lock()
@@ -42,7 +45,7 @@ def check_firebot_status(running_state):
         if FIREBOT_REQUIRED:
             firebot_running = check_firebot()
             if not firebot_running:
-                print(f"Required process '{REQUIRED_PROCESS_NAME}' is no longer running. Terminating...")
+                log.warning("Required process '%s' is no longer running. Terminating...", REQUIRED_PROCESS_NAME)
 
                 running_state.running = False
 
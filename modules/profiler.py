@@ -0,0 +1,203 @@
+"""
+Built-in profiling for a running listener, switched on with `whisper.py --profile`
+or the control API (/profile/start, /profile/stop, /profile).
+
+While a session runs it writes to PROFILE_DIR/profile_YYYYmmdd_HHMMSS/:
+  stacks.folded   sampled stacks of every thread in collapsed ("folded") format,
+                  one "thread;outer;...;inner count" line per stack; open it with
+                  speedscope or flamegraph.pl to get a flame graph
+  memory_NNN.txt  tracemalloc snapshot: top allocation sites, and growth since
+                  the previous and the first snapshot
+  gauges.jsonl    thread counts (by name), queue depths and traced memory per interval
+
+The sampler is a Python thread reading sys._current_frames() every
+PROFILE_SAMPLE_INTERVAL_MS, so nothing is instrumented and no code runs
+while profiling is off (tracemalloc is only started for a session).
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+TOP_ALLOCATIONS = 25
+# Thread names are refreshed every this many samples
+THREAD_NAME_REFRESH = 100
+
+# name -> callable returning a number (queue depth, pending work, ...), see register_gauge
+_gauges = {}
+_session = None
+_session_lock = threading.Lock()
+
+def register_gauge(name, getter):
+    """
+    Report getter() in gauges.jsonl while profiling (e.g. a queue's depth).
+    """
+    _gauges[name] = getter
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def thread_group(name):
+    """
+    "segment_3" -> "segment", "Thread-12 (process_recording_async)" -> "process_recording_async".
+    """
+    if name.endswith(")") and " (" in name:
+        return name[name.index(" (") + 2:-1]
+    base, _, suffix = name.rpartition("_")
+    return base if base and suffix.isdigit() else name
+
+class ProfilingSession:
+    def __init__(self, directory, sample_interval_ms=10, snapshot_interval=60, traceback_frames=10):
+        self.directory = directory
+        self.sample_interval = sample_interval_ms / 1000.0
+        self.snapshot_interval = snapshot_interval
+        self.traceback_frames = traceback_frames
+        self.stacks = Counter()
+        self.stacks_lock = threading.Lock()
+        self.samples = 0
+        self.snapshots = 0
+        self.first_snapshot = None
+        self.last_snapshot = None
+        self.started_tracemalloc = False
+        self.started = None
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.started = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+            self.started_tracemalloc = True
+        self.threads = [
+            threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True),
+            threading.Thread(target=self._snapshot_loop, name="profiler-snapshots", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _sample_loop(self):
+        names = {}
+        while not self.stop_event.wait(self.sample_interval):
+            if self.samples % THREAD_NAME_REFRESH == 0:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            sample = []
+            for ident, frame in sys._current_frames().items():
+                if names.get(ident, "").startswith("profiler-"):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                sample.append(";".join(reversed(stack)))
+            with self.stacks_lock:
+                self.stacks.update(sample)
+            self.samples += 1
+
+    def _snapshot_loop(self):
+        self._snapshot()
+        while not self.stop_event.wait(self.snapshot_interval):
+            self._snapshot()
+
+    def _snapshot(self):
+        """
+        Write a tracemalloc snapshot diff, the gauges and the stacks collected so far.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced memory: current {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB", "",
+                 f"top {TOP_ALLOCATIONS} allocation sites:"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
+        if self.last_snapshot is not None:
+            lines += ["", "growth since previous snapshot:"]
+            lines += [str(stat) for stat in snapshot.compare_to(self.last_snapshot, "lineno")[:TOP_ALLOCATIONS]]
+            lines += ["", "growth since first snapshot:"]
+            lines += [str(stat) for stat in snapshot.compare_to(self.first_snapshot, "lineno")[:TOP_ALLOCATIONS]]
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        self.last_snapshot = snapshot
+        self._write(f"memory_{self.snapshots:03d}.txt", "\n".join(lines) + "\n")
+        self.snapshots += 1
+
+        threads = Counter(thread_group(t.name) for t in threading.enumerate())
+        gauges = {}
+        for name, getter in list(_gauges.items()):
+            try:
+                gauges[name] = getter()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        record = {"time": round(time.time(), 3), "threads": sum(threads.values()), "threads_by_name": dict(threads),
+                  "gauges": gauges, "traced_kib": round(current / 1024), "peak_kib": round(peak / 1024),
+                  "samples": self.samples}
+        self._write("gauges.jsonl", json.dumps(record) + "\n", mode="a")
+        self.write_stacks()
+
+    def write_stacks(self):
+        with self.stacks_lock:
+            stacks = list(self.stacks.items())
+        self._write("stacks.folded", "".join(f"{stack} {count}\n" for stack, count in stacks))
+
+    def _write(self, name, text, mode="w"):
+        try:
+            with open(os.path.join(self.directory, name), mode, encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            log.error("Profiler could not write %s: %s", name, e)
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self._snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        return self.status()
+
+    def status(self):
+        return {"directory": self.directory, "running": not self.stop_event.is_set(),
+                "seconds": round(time.time() - self.started, 1), "samples": self.samples,
+                "snapshots": self.snapshots}
+
+def start_profiling(base_directory, sample_interval_ms=10, snapshot_interval=60, traceback_frames=10):
+    """
+    Start a profiling session in a new timestamped directory. Returns its status.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session.status()
+        directory = os.path.join(base_directory, time.strftime("profile_%Y%m%d_%H%M%S"))
+        _session = ProfilingSession(directory, sample_interval_ms, snapshot_interval, traceback_frames)
+        _session.start()
+    log.info("Profiling started, writing to %s", directory)
+    return _session.status()
+
+def stop_profiling():
+    """
+    Stop the running session (if any) and write its final output. Returns its status.
+    """
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is None:
+        return {"running": False}
+    status = session.stop()
+    log.info("Profiling stopped after %.0fs (%d samples), output in %s",
+             status["seconds"], status["samples"], status["directory"])
+    return status
+
+def profiling_status():
+    with _session_lock:
+        return _session.status() if _session is not None else {"running": False}
@@ -0,0 +1,305 @@
+"""
+Pluggable speech recognition backends.
+
+Every backend takes a WAV file path and returns the transcript in lower case,
+or None if no speech was recognized. Service failures raise RecognitionError so
+the caller can fall back to another engine.
+
+Backends with supports_upload_stream can also receive the audio while it is
+being captured (open_upload_stream), so only the tail is left to send at the
+end of speech.
+"""
+
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import speech_recognition as sr
+from modules.http_client import session
+from modules.flac_encoder import with_inprocess_flac
+from modules import local_engine
+
+class RecognitionError(Exception):
+    """
+    The backend could not produce a transcript (network, service or engine failure).
+    """
+
+class BudgetExhaustedError(RecognitionError):
+    """
+    The backend's cloud budget does not allow another call right now.
+    """
+
+PREWARM_TIMEOUT = 5.0
+# Pending frames joined into one HTTP chunk at most
+UPLOAD_MAX_CHUNK = 64 * 1024
+
+def streaming_wav_header(rate, sample_width, channels):
+    """
+    WAV header for audio of unknown length: the sizes are set to the maximum,
+    which decoders (ffmpeg) read as "until the end of the file".
+    """
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 0xFFFFFFFF, b"WAVE", b"fmt ", 16, 1, channels, rate,
+                       rate * sample_width * channels, sample_width * channels, sample_width * 8, b"data", 0xFFFFFFFF)
+
+class UploadStream:
+    """
+    One chunked HTTP upload that is fed while the audio is still being captured.
+
+    feed() queues bytes and never blocks; the request body is produced from the
+    queue by a background thread. finish() ends the body, abort() drops the
+    request before it is complete (the service never sees a full upload).
+    on_done(text, error) is called from the upload thread with the result.
+    tail_bytes is what was still queued when finish() was called.
+    """
+    def __init__(self, send, preamble, epilogue, on_done):
+        self.send = send
+        self.preamble = preamble
+        self.epilogue = epilogue
+        self.on_done = on_done
+        self.queue = queue.Queue()
+        self.aborted = False
+        self.bytes_fed = 0
+        self.bytes_sent = 0
+        self.tail_bytes = None
+        self.finished_at = None
+        self.thread = threading.Thread(target=self._run, name="upload-stream", daemon=True)
+        self.thread.start()
+
+    def feed(self, data):
+        self.bytes_fed += len(data)
+        self.queue.put(bytes(data))
+
+    def finish(self):
+        self.tail_bytes = self.bytes_fed - self.bytes_sent
+        self.finished_at = time.monotonic()
+        self.queue.put(None)
+
+    def abort(self):
+        self.aborted = True
+        self.queue.put(None)
+
+    def _body(self):
+        yield self.preamble
+        done = False
+        while not done:
+            chunks = [self.queue.get()]
+            size = len(chunks[0] or b"")
+            while size < UPLOAD_MAX_CHUNK and not self.queue.empty():
+                chunks.append(self.queue.get_nowait())
+                size += len(chunks[-1] or b"")
+            if None in chunks:
+                done = True
+                chunks = [c for c in chunks if c is not None]
+            if self.aborted:
+                raise RecognitionError("upload aborted")
+            if chunks:
+                data = b"".join(chunks)
+                yield data
+                self.bytes_sent += len(data)
+        yield self.epilogue
+
+    def _run(self):
+        try:
+            text = self.send(self._body())
+        except Exception as e:
+            self.on_done(None, e)
+            return
+        self.on_done(text, None)
+
+class RecognitionBackend:
+    """
+    Base class for recognition backends.
+
+    budget_key names the backend in the cloud budget governor; local engines
+    leave it as None and are never rate limited.
+    """
+    name = "base"
+    label = "Base"
+    budget_key = None
+    supports_upload_stream = False
+
+    def available(self):
+        return True
+
+    def prewarm(self):
+        """
+        Open (or refresh) a connection to the service at speech onset, so the
+        request at the end of speech does not pay for DNS and handshakes.
+        """
+
+    def start(self):
+        """
+        Prepare the backend (load models, open pools). Called once before use.
+        """
+
+    def transcribe(self, filename):
+        raise NotImplementedError
+
+    def transcribe_with_confidence(self, filename):
+        """
+        (transcript, confidence 0-1 or None if the service does not report one).
+        """
+        return self.transcribe(filename), None
+
+    def close(self):
+        pass
+
+class GoogleBackend(RecognitionBackend):
+    """
+    Google Speech Recognition (free web API) or Google Cloud Speech.
+    """
+    name = "google"
+
+    def __init__(self, language, use_cloud=False, credentials=None, preferred_phrases=None):
+        self.language = language
+        self.use_cloud = use_cloud
+        self.credentials = credentials
+        self.preferred_phrases = preferred_phrases or []
+        self.label = "Google Cloud" if use_cloud else "Google"
+        self.budget_key = "google_cloud" if use_cloud else "google"
+
+    def prewarm(self):
+        # speech_recognition opens its own connection per request, so only the DNS lookup can be done early
+        try:
+            socket.getaddrinfo("speech.googleapis.com" if self.use_cloud else "www.google.com", 443)
+        except OSError:
+            pass
+
+    def _load(self, filename):
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(filename) as source:
+            audio = recognizer.record(source)
+        # Encode FLAC in-process rather than spawning the flac binary per utterance
+        return recognizer, with_inprocess_flac(audio)
+
+    def transcribe(self, filename):
+        try:
+            recognizer, audio = self._load(filename)
+            if self.use_cloud:
+                return recognizer.recognize_google_cloud(
+                    audio,
+                    credentials_json=self.credentials,
+                    preferred_phrases=self.preferred_phrases,
+                    language=self.language
+                ).lower()
+            return recognizer.recognize_google(audio, language=self.language).lower()
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            raise RecognitionError(e)
+
+    def transcribe_with_confidence(self, filename):
+        if self.use_cloud:
+            return super().transcribe_with_confidence(filename)
+        try:
+            recognizer, audio = self._load(filename)
+            # The raw response: the first alternative is the best one and carries the confidence
+            result = recognizer.recognize_google(audio, language=self.language, show_all=True)
+        except sr.UnknownValueError:
+            return None, None
+        except sr.RequestError as e:
+            raise RecognitionError(e)
+        alternatives = result.get("alternative") if isinstance(result, dict) else None
+        if not alternatives or "transcript" not in alternatives[0]:
+            return None, None
+        return alternatives[0]["transcript"].lower(), alternatives[0].get("confidence")
+
+class WhisperApiBackend(RecognitionBackend):
+    """
+    OpenAI Whisper transcription over HTTP.
+    """
+    name = "whisper"
+    label = "Whisper"
+    budget_key = "whisper"
+    supports_upload_stream = True
+
+    def __init__(self, api_url, api_key, language):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.language = language
+
+    def available(self):
+        return bool(self.api_key and self.api_key.strip() and self.api_key != "API_KEY_HERE")
+
+    def prewarm(self):
+        # Any response leaves a kept-alive connection in the shared pool for the upload
+        parts = urlsplit(self.api_url)
+        try:
+            session.head(f"{parts.scheme}://{parts.netloc}/", timeout=PREWARM_TIMEOUT)
+        except Exception:
+            pass
+
+    def open_upload_stream(self, rate, sample_width, channels, on_done):
+        """
+        Start a chunked multipart upload of a WAV file whose audio is fed as it is captured.
+        """
+        boundary = uuid.uuid4().hex
+        preamble = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"model\"\r\n\r\nwhisper-1\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"language\"\r\n\r\n{self.language}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"audio.wav\"\r\n"
+            f"Content-Type: audio/wav\r\n\r\n"
+        ).encode("utf-8") + streaming_wav_header(rate, sample_width, channels)
+        epilogue = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        headers = {"Authorization": f"Bearer {self.api_key}",
+                   "Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+        def send(body):
+            response = session.post(self.api_url, headers=headers, data=body)
+            response.raise_for_status()
+            return response.json().get("text", "").strip() or None
+        return UploadStream(send, preamble, epilogue, on_done)
+
+    def transcribe(self, filename):
+        try:
+            with open(filename, 'rb') as audio_file:
+                headers = {"Authorization": f"Bearer {self.api_key}"}
+                data = {"language": self.language}
+                files = {
+                    "file": audio_file,
+                    "model": (None, "whisper-1")
+                }
+                response = session.post(self.api_url, headers=headers, data=data, files=files)
+                response.raise_for_status()
+                return response.json().get("text", "").strip() or None
+        except Exception as e:
+            raise RecognitionError(e)
+
+class LocalBackend(RecognitionBackend):
+    """
+    Offline CPU recognition with a model kept warm in a pool of worker processes.
+    Inference runs outside this process, so it never holds the capture thread's GIL.
+    """
+    name = "local"
+    label = "Local"
+
+    def __init__(self, model_path, workers=1, timeout=30.0):
+        self.model_path = model_path
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.pool = None
+
+    def available(self):
+        return local_engine.is_available(self.model_path)
+
+    def start(self):
+        if self.pool is None:
+            self.pool = local_engine.start_pool(self.model_path, self.workers)
+
+    def transcribe(self, filename):
+        if self.pool is None:
+            self.start()
+        try:
+            text = self.pool.submit(local_engine.transcribe_file, filename).result(timeout=self.timeout)
+        except Exception as e:
+            raise RecognitionError(e)
+        return text.lower() if text else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
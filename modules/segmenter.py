@@ -0,0 +1,39 @@
+def split_at_pauses(vad_flags, min_pause_frames, min_segment_frames):
+    """
+    Split a recording into segments at internal pauses.
+
+    Args:
+        vad_flags: Per-frame VAD decisions (True = speech) for the whole recording.
+        min_pause_frames: Shortest run of non-speech frames that counts as a pause.
+        min_segment_frames: Segments shorter than this are merged into a neighbour.
+
+    Returns:
+        A list of (start, end) frame ranges covering the recording in order.
+        Cuts are placed in the middle of each pause so no speech is clipped.
+    """
+    total = len(vad_flags)
+    if total == 0:
+        return []
+
+    # Find internal pauses (ignore leading/trailing silence, which belongs to the edge segments)
+    cuts = []
+    run_start = None
+    seen_speech = False
+    for i, is_speech in enumerate(vad_flags):
+        if is_speech:
+            if run_start is not None and seen_speech and i - run_start >= min_pause_frames:
+                cuts.append((run_start + i) // 2)
+            run_start = None
+            seen_speech = True
+        elif run_start is None:
+            run_start = i
+
+    # Drop cuts that would create segments shorter than the minimum
+    segments = []
+    start = 0
+    for cut in cuts:
+        if cut - start >= min_segment_frames and total - cut >= min_segment_frames:
+            segments.append((start, cut))
+            start = cut
+    segments.append((start, total))
+    return segments
@@ -0,0 +1,268 @@
+"""
+Shadow mode: evaluate a candidate trigger table and/or recognizer configuration
+on live audio without ever firing it.
+
+Every live utterance is copied to the shadow pipeline, which transcribes it
+with the SHADOW_CONFIG settings (config.json-style overrides: triggers,
+FIRST_PASS_ENGINE, PRIMARY_ENGINE, API keys, CLOUD_BUDGETS, ...) under its own
+budget governor and ledger, and records which triggers it would have fired
+and when. Nothing is dispatched: no URL calls, no transcript file, no history.
+
+Triggers are compared by their URL (or phrases, if they have none). Every
+SHADOW_REPORT_INTERVAL seconds (and at exit) a report comparing agreement,
+latency from the end of the utterance and cloud spend against the live
+configuration is logged and written to SHADOW_REPORT_FILE.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.config_manager import (
+    SHADOW_CONFIG, SHADOW_REPORT_INTERVAL, SHADOW_REPORT_FILE, SHADOW_WORKERS,
+    CLOUD_BUDGETS, BUDGET_PRIORITY_RESERVE, TRIGGERS
+)
+from modules.budget_governor import BudgetGovernor
+from modules.profiler import register_gauge
+from modules.recognizers import RecognitionError
+from modules.transcriber import (
+    Profile, governor, set_shadow, write_wav, condition_audio, recognize_first_pass, transcribe_audio,
+    find_triggers, is_instant_trigger, FRAME_DURATION_MS
+)
+
+log = logging.getLogger(__name__)
+
+# Disagreements kept in the report for inspection
+MAX_EXAMPLES = 20
+# Utterances waiting for the shadow pipeline; beyond this they are skipped, never queued without bound
+MAX_PENDING = 8
+
+def trigger_key(t_set):
+    return t_set.get("url") or "/".join(t_set.get("phrases", []))
+
+def mean(values):
+    return round(sum(values) / len(values), 1) if values else None
+
+class ShadowJob:
+    """
+    One utterance seen by both pipelines; compared once both have finished.
+    """
+    def __init__(self, evaluator, started):
+        self.evaluator = evaluator
+        self.started = started
+        self.lock = threading.Lock()
+        self.live = None
+        self.shadow = None
+
+    def live_done(self, fired, transcript):
+        claimed = fired.claimed if fired is not None else []
+        self._set("live", {
+            "transcript": transcript,
+            "fired": {trigger_key(t_set): (at - self.started) * 1000 for t_set, at in claimed},
+        })
+
+    def shadow_done(self, result):
+        self._set("shadow", result)
+
+    def _set(self, side, result):
+        with self.lock:
+            setattr(self, side, result)
+            complete = self.live is not None and self.shadow is not None
+        if complete:
+            self.evaluator.compare(self.live, self.shadow)
+
+class ShadowEvaluator:
+    def __init__(self, settings, report_interval=SHADOW_REPORT_INTERVAL, report_file=SHADOW_REPORT_FILE,
+                 workers=SHADOW_WORKERS):
+        settings = dict(settings)
+        # Without a candidate trigger table the live triggers are evaluated (recognizer-only change)
+        settings.setdefault("triggers", list(TRIGGERS))
+        self.governor = BudgetGovernor(settings.get("CLOUD_BUDGETS", CLOUD_BUDGETS),
+                                       settings.get("USAGE_LEDGER_FILE", "shadowUsage.json"),
+                                       settings.get("BUDGET_PRIORITY_RESERVE", BUDGET_PRIORITY_RESERVE))
+        self.profile = Profile("shadow", settings, self.governor, register=False)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shadow")
+        self.report_interval = report_interval
+        self.report_file = report_file
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stop_event = threading.Event()
+        self._reset_window()
+        register_gauge("shadow_pending", lambda: self.pending)
+
+    def _reset_window(self):
+        self.window_started = time.time()
+        self.live_cost_start = governor.total_cost()
+        self.shadow_cost_start = self.governor.total_cost()
+        self.stats = {"utterances": 0, "skipped": 0, "agree": 0, "disagree": 0, "shadow_errors": 0,
+                      "live_fired": 0, "shadow_fired": 0, "both": 0, "live_only": 0, "shadow_only": 0}
+        self.latency = {"live": [], "shadow": [], "delta": []}
+        self.per_trigger = {}
+        self.examples = []
+
+    def start(self, pcm, channels, sample_width, rate, started):
+        """
+        Queue a copy of a live utterance for the shadow pipeline.
+        Returns its job, or None if the shadow pipeline is too far behind.
+        """
+        with self.lock:
+            if self.pending >= MAX_PENDING:
+                self.stats["skipped"] += 1
+                return None
+            self.pending += 1
+        job = ShadowJob(self, started)
+        self.pool.submit(self._evaluate, job, bytes(pcm), channels, sample_width, rate)
+        return job
+
+    def _evaluate(self, job, pcm, channels, sample_width, rate):
+        profile = self.profile
+        frame_bytes = int(rate * FRAME_DURATION_MS / 1000) * sample_width * channels
+        audio_seconds = len(pcm) // frame_bytes * FRAME_DURATION_MS / 1000
+        filename = f"shadow_recording_{int(time.time() * 1000)}_{id(job)}.wav"
+        result = {"transcript": None, "fired": {}, "error": None}
+        try:
+            pcm = condition_audio(pcm, channels, sample_width, rate, profile=profile)
+            write_wav(filename, pcm, channels, sample_width, rate)
+            first_pass = profile.get_backend(profile.first_pass_engine)
+            if first_pass is None:
+                raise RecognitionError(f"shadow first-pass engine '{profile.first_pass_engine}' unavailable")
+            transcript, first_pass, _ = recognize_first_pass(first_pass, filename, audio_seconds, profile=profile)
+            first_pass_ms = (time.monotonic() - job.started) * 1000
+            transcript = transcript or ""
+            result["transcript"] = transcript
+            detected = find_triggers(transcript, profile) if transcript else []
+            for t_set in detected:
+                if is_instant_trigger(t_set):
+                    result["fired"][trigger_key(t_set)] = first_pass_ms
+
+            accurate = [t_set for t_set in detected if not is_instant_trigger(t_set)]
+            primary = profile.get_backend(profile.primary_engine)
+            if accurate and primary is not None and primary is not first_pass:
+                refined = transcribe_audio(filename, audio_seconds, priority=True, profile=profile)
+                if refined:
+                    result["transcript"] = refined
+                    accurate = [t_set for t_set in find_triggers(refined, profile) if not is_instant_trigger(t_set)]
+            done_ms = (time.monotonic() - job.started) * 1000
+            for t_set in accurate:
+                result["fired"].setdefault(trigger_key(t_set), done_ms)
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            with self.lock:
+                self.pending -= 1
+        job.shadow_done(result)
+
+    def compare(self, live, shadow):
+        live_keys = set(live["fired"])
+        shadow_keys = set(shadow["fired"])
+        with self.lock:
+            stats = self.stats
+            stats["utterances"] += 1
+            if shadow["error"]:
+                stats["shadow_errors"] += 1
+            stats["live_fired"] += len(live_keys)
+            stats["shadow_fired"] += len(shadow_keys)
+            stats["both"] += len(live_keys & shadow_keys)
+            stats["live_only"] += len(live_keys - shadow_keys)
+            stats["shadow_only"] += len(shadow_keys - live_keys)
+            for key in live_keys | shadow_keys:
+                entry = self.per_trigger.setdefault(key, {"live": 0, "shadow": 0, "both": 0})
+                entry["live"] += key in live_keys
+                entry["shadow"] += key in shadow_keys
+                entry["both"] += key in live_keys and key in shadow_keys
+            for key in live_keys & shadow_keys:
+                self.latency["live"].append(live["fired"][key])
+                self.latency["shadow"].append(shadow["fired"][key])
+                self.latency["delta"].append(shadow["fired"][key] - live["fired"][key])
+            if live_keys == shadow_keys:
+                stats["agree"] += 1
+            else:
+                stats["disagree"] += 1
+                if len(self.examples) < MAX_EXAMPLES:
+                    self.examples.append({
+                        "live_transcript": live["transcript"], "shadow_transcript": shadow["transcript"],
+                        "live_fired": sorted(live_keys), "shadow_fired": sorted(shadow_keys),
+                        "shadow_error": shadow["error"],
+                    })
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+            utterances = stats["utterances"]
+            return {
+                "window_seconds": round(time.time() - self.window_started, 1),
+                "agreement": round(stats["agree"] / utterances, 3) if utterances else None,
+                "stats": stats,
+                "mean_latency_ms": {
+                    "live": mean(self.latency["live"]),
+                    "shadow": mean(self.latency["shadow"]),
+                    "shadow_minus_live": mean(self.latency["delta"]),
+                },
+                "cost": {
+                    "live": round(governor.total_cost() - self.live_cost_start, 6),
+                    "shadow": round(self.governor.total_cost() - self.shadow_cost_start, 6),
+                },
+                "per_trigger": {key: dict(entry) for key, entry in self.per_trigger.items()},
+                "disagreements": list(self.examples),
+            }
+
+    def report(self, reset=True):
+        """
+        Log the comparison for the current window and write it to the report file.
+        """
+        summary = self.summary()
+        stats = summary["stats"]
+        if stats["utterances"]:
+            latency = summary["mean_latency_ms"]
+            log.info("Shadow report: %d utterance(s), agreement %.0f%%, fired live %d / shadow %d "
+                     "(live only %d, shadow only %d), latency live %s ms / shadow %s ms, cost live $%.4f / shadow $%.4f",
+                     stats["utterances"], summary["agreement"] * 100, stats["live_fired"], stats["shadow_fired"],
+                     stats["live_only"], stats["shadow_only"], latency["live"], latency["shadow"],
+                     summary["cost"]["live"], summary["cost"]["shadow"])
+        if self.report_file:
+            try:
+                with open(self.report_file, "w", encoding="utf-8") as f:
+                    json.dump(summary, f, indent=4)
+            except OSError as e:
+                log.error("Error writing shadow report %s: %s", self.report_file, e)
+        if reset:
+            with self.lock:
+                self._reset_window()
+        return summary
+
+    def _report_loop(self):
+        while not self.stop_event.wait(self.report_interval):
+            self.report()
+
+    def run(self):
+        threading.Thread(target=self._report_loop, name="shadow-report", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.pool.shutdown(wait=False)
+        self.report(reset=False)
+        self.governor.flush()
+        for backend in self.profile.backends.values():
+            if backend is not None:
+                backend.close()
+
+def start_shadow(settings=SHADOW_CONFIG):
+    """
+    Create the shadow evaluator and attach it to the live pipeline.
+    """
+    evaluator = ShadowEvaluator(settings)
+    evaluator.run()
+    set_shadow(evaluator)
+    atexit.register(evaluator.stop)
+    log.info("Shadow mode enabled: %d candidate trigger set(s), engines %s/%s; report every %ss to %s",
+             len(evaluator.profile.triggers), evaluator.profile.first_pass_engine,
+             evaluator.profile.primary_engine, evaluator.report_interval, evaluator.report_file)
+    return evaluator
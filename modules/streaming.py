@@ -0,0 +1,326 @@
+"""
+Streaming recognition: fire triggers on partial hypotheses while the user is still talking.
+
+The recorder opens a session when speech starts, feeds it every captured frame and
+calls end_input() when the utterance ends. Partial transcripts go through the
+trigger matcher and "instant" triggers fire immediately. The session remembers
+what it fired so process_recording_async can suppress duplicates from the final
+result.
+
+Two session types exist:
+  - "local": frames are streamed to a dedicated local engine process that
+    returns partial hypotheses as they change.
+  - "first_pass": a stand-in for engines without a streaming API; the audio
+    captured so far is re-submitted to the first-pass engine every
+    STREAMING_PARTIAL_INTERVAL seconds (each call counts against the budget).
+
+"upload" gives no partials: the audio is uploaded to the first-pass engine
+(chunked HTTP transfer) while it is captured, so at the end of speech only the
+tail is left to send, and its transcript is used as the first pass.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+
+from modules.config_manager import (
+    STREAMING_MODE, STREAMING_PARTIAL_INTERVAL, FIRST_PASS_ENGINE, LOCAL_MODEL_PATH
+)
+from modules import local_engine
+from modules.recognizers import RecognitionError
+from modules.transcriber import (
+    find_triggers, is_instant_trigger, dispatch_triggers, get_backend, recognize_with, write_wav,
+    FiredTriggers, default_profile
+)
+
+log = logging.getLogger(__name__)
+
+FRAME_DURATION_MS = 30
+FINAL_RESULT_TIMEOUT = 5.0
+# A streamed upload's transcript still needs the service's processing time after the tail is sent
+UPLOAD_RESULT_TIMEOUT = 15.0
+
+class StreamingSession(FiredTriggers):
+    """
+    One utterance's worth of streaming recognition.
+    """
+    engine_name = None
+    label = "Streaming"
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.closed = False
+        self.final_text = None
+        self.final_event = threading.Event()
+
+    def on_partial(self, text):
+        if self.closed or not text:
+            return
+        instant = [t_set for t_set in find_triggers(text) if is_instant_trigger(t_set)]
+        to_fire = [t_set for t_set in instant if self.claim(t_set)]
+        if to_fire:
+            log.info("Trigger word detected in partial transcript (%s): %s", self.label, text)
+            dispatch_triggers(to_fire, text, engine=self.label, fired=self)
+
+    def on_final(self, text):
+        self.final_text = text
+        self.final_event.set()
+
+    def feed(self, frame):
+        raise NotImplementedError
+
+    def feed_many(self, frames):
+        for frame in frames:
+            self.feed(frame)
+
+    def end_input(self):
+        """
+        Called by the recorder when the utterance is over.
+        """
+        self.closed = True
+
+    def abort(self):
+        """
+        Called by the recorder instead of end_input() when the utterance is dropped
+        (listening paused); nobody waits for its result.
+        """
+        self.end_input()
+
+    def wait_final(self, timeout=FINAL_RESULT_TIMEOUT):
+        """
+        Wait for the engine's final transcript; returns None if the engine gives none.
+        """
+        if self.final_event.wait(timeout):
+            return self.final_text
+        return None
+
+class LocalStreamingEngine:
+    """
+    Dedicated process running the local model in streaming mode.
+    Utterances are processed in order; results are routed back to their session.
+    """
+    def __init__(self, model_path):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=local_engine.streaming_worker, args=(child_conn, model_path), daemon=True
+        )
+        self.process.start()
+        kind, _ = self.conn.recv()
+        if kind != "ready":
+            raise RuntimeError(f"Unexpected message from streaming engine: {kind}")
+        self.send_lock = threading.Lock()
+        self.sessions = deque()
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+        log.info("Local streaming engine ready (model: %s)", model_path)
+
+    def _send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def begin(self, session):
+        self.sessions.append(session)
+        self._send(("start", session.rate))
+
+    def feed(self, frame):
+        self._send(("audio", bytes(frame)))
+
+    def end(self):
+        self._send(("end", None))
+
+    def _read_results(self):
+        while True:
+            try:
+                kind, text = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if not self.sessions:
+                continue
+            if kind == "partial":
+                self.sessions[0].on_partial(text)
+            elif kind == "final":
+                self.sessions.popleft().on_final(text)
+        # Unblock anyone still waiting on a final result
+        while self.sessions:
+            self.sessions.popleft().on_final(None)
+
+    def stop(self):
+        try:
+            self._send(("stop", None))
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+class LocalStreamingSession(StreamingSession):
+    engine_name = "local"
+    label = "Local streaming"
+
+    def __init__(self, engine, rate):
+        super().__init__(rate)
+        self.engine = engine
+        engine.begin(self)
+
+    def feed(self, frame):
+        self.engine.feed(frame)
+
+    def end_input(self):
+        self.engine.end()
+        super().end_input()
+
+class FirstPassStandInSession(StreamingSession):
+    """
+    Re-runs the first-pass engine on the audio captured so far at a fixed interval.
+    """
+    engine_name = "first_pass"
+
+    def __init__(self, rate, backend, interval):
+        super().__init__(rate)
+        self.backend = backend
+        self.label = f"{backend.label} partial"
+        self.interval_frames = max(1, int(interval * 1000 / FRAME_DURATION_MS))
+        self.frames = []
+        self.frames_at_last_job = 0
+        self.job = None
+
+    def feed(self, frame):
+        # Copy: the recorder's arena is recycled once the utterance is processed,
+        # while a partial job may still be running
+        self.frames.append(bytes(frame))
+        if self.closed or len(self.frames) - self.frames_at_last_job < self.interval_frames:
+            return
+        if self.job is not None and self.job.is_alive():
+            return
+        self.frames_at_last_job = len(self.frames)
+        self.job = threading.Thread(target=self._recognize_partial, args=(list(self.frames),), daemon=True)
+        self.job.start()
+
+    def _recognize_partial(self, frames):
+        filename = f"recording_partial_{int(time.time() * 1000)}.wav"
+        try:
+            write_wav(filename, b"".join(frames), 1, 2, self.rate)
+            text = recognize_with(self.backend, filename, len(frames) * FRAME_DURATION_MS / 1000)
+            self.on_partial(text)
+        except RecognitionError as e:
+            log.debug("Partial recognition skipped: %s", e)
+        except Exception as e:
+            log.error("Error in partial recognition: %s", e)
+        finally:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def end_input(self):
+        super().end_input()
+        # No streaming final result; the regular first pass provides it
+        self.on_final(None)
+
+class StreamedUploadSession(StreamingSession):
+    """
+    Uploads the utterance to the first-pass engine while the user is speaking.
+
+    The budget is checked at the end of speech, when the length is known; over
+    budget the upload is aborted before it is complete. Bytes still queued at
+    the end of speech and the time from there to the transcript are counted
+    (upload_* counters in /status) and logged.
+    """
+    label = "Streamed upload"
+
+    def __init__(self, rate, backend, sample_width=2, channels=1):
+        super().__init__(rate)
+        self.backend = backend
+        self.engine_name = backend.name
+        self.label = backend.label
+        self.frame_bytes = int(rate * FRAME_DURATION_MS / 1000) * sample_width * channels
+        self.upload = backend.open_upload_stream(rate, sample_width, channels, self._on_done)
+
+    def feed(self, frame):
+        self.upload.feed(frame)
+
+    def end_input(self):
+        super().end_input()
+        audio_seconds = self.upload.bytes_fed // self.frame_bytes * FRAME_DURATION_MS / 1000
+        if self.backend.budget_key and not default_profile.governor.try_acquire(self.backend.budget_key, audio_seconds):
+            log.warning("%s budget exhausted, abandoning streamed upload", self.backend.label)
+            self.upload.abort()
+            return
+        self.upload.finish()
+
+    def abort(self):
+        # A dropped utterance is neither charged to the budget nor completed
+        StreamingSession.end_input(self)
+        self.upload.abort()
+
+    def _on_done(self, text, error):
+        upload = self.upload
+        if error is not None or upload.aborted:
+            if error is not None and not upload.aborted:
+                log.warning("Streamed upload to %s failed: %s", self.backend.label, error)
+            self.on_final(None)
+            return
+        tail_ms = (time.monotonic() - upload.finished_at) * 1000
+        default_profile.count("upload_streams")
+        default_profile.count("upload_early_bytes", upload.bytes_fed - upload.tail_bytes)
+        default_profile.count("upload_tail_bytes", upload.tail_bytes)
+        default_profile.count("upload_tail_ms", round(tail_ms))
+        log.info("Streamed upload: %.1f KiB sent while speaking, %.1f KiB in flight at end of speech, "
+                 "transcript %.0f ms after end of speech", (upload.bytes_fed - upload.tail_bytes) / 1024,
+                 upload.tail_bytes / 1024, tail_ms)
+        self.on_final(text.lower() if text else None)
+
+    def wait_final(self, timeout=UPLOAD_RESULT_TIMEOUT):
+        text = super().wait_final(timeout)
+        if not self.final_event.is_set():
+            # The regular first pass takes over; stop the upload so the audio is not sent (and billed) twice
+            log.warning("No transcript from the streamed upload to %s after %.0fs, aborting it",
+                        self.backend.label, timeout)
+            self.upload.abort()
+        return text
+
+_local_engine = None
+
+def start_streaming():
+    """
+    Start the streaming engine selected by STREAMING_MODE, if any.
+    """
+    global _local_engine
+    if STREAMING_MODE == "local" and _local_engine is None:
+        if not local_engine.is_available(LOCAL_MODEL_PATH):
+            log.warning("Local streaming engine unavailable (Vosk or model missing); streaming disabled")
+            return
+        try:
+            _local_engine = LocalStreamingEngine(LOCAL_MODEL_PATH)
+        except Exception as e:
+            log.error("Could not start local streaming engine: %s", e)
+
+def stop_streaming():
+    global _local_engine
+    if _local_engine is not None:
+        _local_engine.stop()
+        _local_engine = None
+
+def open_session(rate):
+    """
+    Return a new streaming session for an utterance, or None if streaming is off.
+    """
+    if STREAMING_MODE == "local":
+        if _local_engine is None:
+            return None
+        return LocalStreamingSession(_local_engine, rate)
+    if STREAMING_MODE == "first_pass":
+        backend = get_backend(FIRST_PASS_ENGINE)
+        if backend is None:
+            return None
+        return FirstPassStandInSession(rate, backend, STREAMING_PARTIAL_INTERVAL)
+    if STREAMING_MODE == "upload":
+        backend = get_backend(FIRST_PASS_ENGINE)
+        if backend is None or not backend.supports_upload_stream:
+            return None
+        return StreamedUploadSession(rate, backend)
+    return None
@@ -0,0 +1,100 @@
+"""
+Listener side of the launcher's supervision protocol (whisper.py --supervised / --standby).
+
+The launcher (modules.process_launcher.ProcessManager) writes one command per
+line to stdin:
+
+    ping <n>    heartbeat, answered with "pong <n> <recorder alive 0/1> <seconds since the audio loop last ran, -1 if idle>"
+    activate    a standby instance starts listening
+    stop        shut down
+
+Replies go to stdout as lines starting with MARKER (the ASCII record separator);
+the launcher takes them out of the terminal output. Besides pongs the listener
+reports "standby" once a standby instance is initialized and "active" once the
+audio loop is running.
+
+Closing stdin (the launcher went away) shuts the listener down.
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from modules.utils import state
+
+log = logging.getLogger(__name__)
+
+MARKER = "\x1e"
+ACTIVE_REPORT_TIMEOUT = 10.0
+
+activated = threading.Event()
+_record_thread = None
+_server_mode = False  # report_active(None): tenant loops do not update state.loop_tick
+_write_lock = threading.Lock()
+
+def reply(text):
+    with _write_lock:
+        sys.stdout.write(f"{MARKER}{text}\n")
+        sys.stdout.flush()
+
+def health():
+    """
+    (recorder alive, seconds since the audio loop last ran or -1 while paused/not started
+    and in server mode). Before the recorder starts (and in server mode) the process counts
+    as alive while it is running.
+    """
+    alive = _record_thread.is_alive() if _record_thread is not None else state.running
+    if _server_mode or not state.listening.is_set() or not state.loop_tick:
+        return alive, -1.0
+    return alive, time.monotonic() - state.loop_tick
+
+def _read_commands():
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "ping":
+            alive, age = health()
+            reply(f"pong {parts[1] if len(parts) > 1 else 0} {int(alive)} {age:.2f}")
+        elif parts[0] == "activate":
+            activated.set()
+        elif parts[0] == "stop":
+            log.info("Stop requested by the launcher")
+            state.running = False
+            activated.set()
+    if state.running:
+        log.info("Launcher closed the command pipe, shutting down...")
+    state.running = False
+    activated.set()
+
+def start_supervision():
+    threading.Thread(target=_read_commands, name="supervision", daemon=True).start()
+
+def wait_for_activation():
+    """
+    Standby: block until the launcher activates this instance. Returns False if it was stopped instead.
+    """
+    reply("standby")
+    while not activated.wait(0.5):
+        pass
+    return state.running
+
+def report_active(record_thread):
+    """
+    Tell the launcher once the audio loop is running (the end of a failover).
+    record_thread is the recorder the heartbeats report on (None in server mode).
+    """
+    global _record_thread, _server_mode
+    _record_thread = record_thread
+    _server_mode = record_thread is None
+    started = time.monotonic()
+
+    def wait_for_audio():
+        while state.running and time.monotonic() - started < ACTIVE_REPORT_TIMEOUT:
+            if state.loop_tick >= started:
+                break
+            time.sleep(0.005)
+        reply("active")
+
+    threading.Thread(target=wait_for_audio, name="supervision-active", daemon=True).start()
@@ -0,0 +1,156 @@
+"""
+Live audio level and VAD state for the GUI, published through a memory-mapped ring.
+
+The listener writes one slot per audio frame into TELEMETRY_FILE: the frame's
+RMS level and flags for the VAD decision, recording and push-to-talk gating.
+The file is mapped into memory, so publishing a frame is a few stores into the
+mapping; there is no write, flush or pipe message per frame. The GUI maps the
+same file read-only and picks up the frames written since its last refresh.
+
+Layout (little endian):
+
+    header  magic b"FBTL", version (u16), slots (u16), write_index (u64),
+            updated (f64, time.time() of the last frame), frame_ms (u32), padding to 32 bytes
+    slots   slots x (level u16, flags u8, pad u8); frame n is in slot n % slots
+
+write_index counts frames ever written and is stored after the slot, so a
+reader never sees an index ahead of its data. A reader that falls more than
+`slots` frames behind skips to the oldest frame still in the ring.
+
+This module is imported in the capture process, so it must not import the
+configuration.
+"""
+
+import math
+import mmap
+import os
+import struct
+import time
+from array import array
+
+try:
+    import audioop  # C implementation of the RMS; removed in Python 3.13
+except ImportError:
+    audioop = None
+
+MAGIC = b"FBTL"
+VERSION = 1
+SLOTS = 1024  # ~30 s of 30 ms frames
+HEADER = struct.Struct("<4sHHQdI4x")
+SLOT = struct.Struct("<HBx")
+INDEX_OFFSET = 8
+UPDATED_OFFSET = 16
+
+SPEECH = 0x1
+RECORDING = 0x2
+GATED = 0x4
+
+def file_size(slots=SLOTS):
+    return HEADER.size + slots * SLOT.size
+
+def rms(frame):
+    """
+    RMS level of 16-bit PCM (0-32767).
+    """
+    if audioop is not None:
+        return audioop.rms(frame, 2)
+    samples = array("h", bytes(frame))
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(s * s for s in samples) / len(samples)))
+
+class TelemetryWriter:
+    def __init__(self, path, frame_ms, slots=SLOTS):
+        size = file_size(slots)
+        # The GUI may still have the file mapped: reuse it as long as the size fits
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.slots = slots
+        self.index = 0
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, slots, 0, time.time(), frame_ms)
+
+    def publish(self, frame, is_speech, is_recording, gated=False):
+        flags = (SPEECH if is_speech else 0) | (RECORDING if is_recording else 0) | (GATED if gated else 0)
+        SLOT.pack_into(self.map, HEADER.size + (self.index % self.slots) * SLOT.size, min(rms(frame), 0xFFFF), flags)
+        self.index += 1
+        struct.pack_into("<Qd", self.map, INDEX_OFFSET, self.index, time.time())
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+def open_writer(path, frame_ms, log=None):
+    """
+    TelemetryWriter for path, or None if the file cannot be mapped (telemetry is then off).
+    """
+    try:
+        return TelemetryWriter(path, frame_ms)
+    except (OSError, ValueError) as e:
+        if log is not None:
+            log.warning("Audio telemetry disabled, cannot map %s: %s", path, e)
+        return None
+
+class TelemetryReader:
+    """
+    Read side for the GUI. read() returns the (level, flags) frames written since
+    the previous call; it returns nothing until the listener has created the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.slots = 0
+        self.frame_ms = 30
+        self.last_index = None
+
+    def _open(self):
+        try:
+            self.file = open(self.path, "rb")
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.close()
+            return False
+        magic, version, slots, _, _, frame_ms = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or len(self.map) < file_size(slots):
+            self.close()
+            return False
+        self.slots = slots
+        self.frame_ms = frame_ms or 30
+        self.last_index = None
+        return True
+
+    def read(self):
+        if self.map is None and not self._open():
+            return []
+        magic, _, slots, index, _, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or slots != self.slots:
+            # The listener recreated the file with another layout
+            self.close()
+            return []
+        if self.last_index is None or index < self.last_index:
+            # First read, or the listener restarted: start from the current frame
+            self.last_index = index
+            return []
+        start = max(self.last_index, index - slots)
+        frames = [SLOT.unpack_from(self.map, HEADER.size + (n % slots) * SLOT.size) for n in range(start, index)]
+        self.last_index = index
+        return frames
+
+    def age(self):
+        """
+        Seconds since the listener last published a frame (None if there is no telemetry file).
+        """
+        if self.map is None and not self._open():
+            return None
+        return time.time() - struct.unpack_from("<d", self.map, UPDATED_OFFSET)[0]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        if self.file is not None:
+            self.file.close()
+        self.map = None
+        self.file = None
@@ -0,0 +1,140 @@
+"""
+Multi-tenant server mode (`whisper.py --server DIR`): one process serving
+several streamers.
+
+Each tenant is a JSON file in DIR (tenants/streamer_a.json). It holds
+config.json-style overrides, e.g. triggers, TRANSCRIPT_FILE, WHISPER_HISTORY_FILE,
+API keys, engines and CLOUD_BUDGETS, plus an AUDIO_SOURCE (modules.input_sources):
+
+    {"AUDIO_SOURCE": {"type": "device", "device": 2}, "triggers": [...], ...}
+    {"AUDIO_SOURCE": {"type": "network", "protocol": "websocket", "port": 8771}, ...}
+
+Missing keys fall back to config.json. Output files default to the global
+names prefixed with the tenant name, so tenants never overwrite each other.
+
+Shared by all tenants:
+  - one worker pool (SERVER_WORKERS threads) for processing utterances
+  - one keep-alive HTTP session (modules.http_client)
+  - one trigger-matching automaton (transcriber.matcher)
+  - the local recognition model pool
+Per tenant:
+  - trigger URL cooldowns, the terminate command, counters
+  - cloud budget governor and usage ledger
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.config_manager import (
+    config, SERVER_WORKERS, TRANSCRIPT_FILE, WHISPER_HISTORY_FILE, HISTORY_DB_FILE, USAGE_LEDGER_FILE,
+    CLOUD_BUDGETS, BUDGET_PRIORITY_RESERVE
+)
+from modules.budget_governor import BudgetGovernor
+from modules.profiler import register_gauge
+from modules.transcriber import Profile, process_recording_async, start_backends
+from modules.audio_recorder import vad_based_recording
+from modules.input_sources import SOURCE_TYPES
+
+log = logging.getLogger(__name__)
+
+# Output files that get a per-tenant name unless the tenant sets them
+PER_TENANT_FILES = {
+    "TRANSCRIPT_FILE": TRANSCRIPT_FILE,
+    "WHISPER_HISTORY_FILE": WHISPER_HISTORY_FILE,
+    "HISTORY_DB_FILE": HISTORY_DB_FILE,
+    "USAGE_LEDGER_FILE": USAGE_LEDGER_FILE,
+}
+# Profile names taken by the listener's own profiles (trigger matcher owners, history, stats)
+RESERVED_NAMES = ("default", "shadow")
+
+def tenant_file_name(name, path):
+    directory, base = os.path.split(path)
+    return os.path.join(directory, f"{name}_{base}")
+
+def load_tenant(path):
+    """
+    Read one tenant file and return (name, settings); the name is the file name without .json.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name.lower() in RESERVED_NAMES:
+        raise ValueError(f"'{name}' is a reserved profile name, rename the tenant file")
+    with open(path, "r", encoding="utf-8") as f:
+        settings = json.load(f)
+    if not isinstance(settings, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    for key, default in PER_TENANT_FILES.items():
+        settings.setdefault(key, tenant_file_name(name, default))
+    settings.setdefault("triggers", config.get("triggers", []))
+    return name, settings
+
+class Tenant:
+    """
+    One tenant: its profile, cloud budget and audio source thread.
+    """
+    def __init__(self, name, settings, pool):
+        self.name = name
+        self.source = settings.get("AUDIO_SOURCE", {"type": "device"})
+        self.governor = BudgetGovernor(settings.get("CLOUD_BUDGETS", CLOUD_BUDGETS),
+                                       settings["USAGE_LEDGER_FILE"],
+                                       settings.get("BUDGET_PRIORITY_RESERVE", BUDGET_PRIORITY_RESERVE))
+        self.profile = Profile(name, settings, self.governor)
+        self.pool = pool
+        self.thread = None
+
+    def submit(self, audio_data, stream_session, vad_flags, release):
+        self.pool.submit(process_recording_async, audio_data, stream_session, vad_flags, release, self.profile)
+
+    def start(self):
+        source_type = self.source.get("type", "device")
+        if source_type not in SOURCE_TYPES:
+            log.error("Tenant %s: unsupported audio source type '%s'", self.name, source_type)
+            return False
+        start_backends(self.profile)
+        self.thread = threading.Thread(
+            target=vad_based_recording,
+            kwargs={"profile": self.profile, "source_spec": self.source, "submit": self.submit},
+            name=f"tenant-{self.name}",
+            daemon=True
+        )
+        self.thread.start()
+        log.info("Tenant %s started (%d trigger set(s), %s audio source)",
+                 self.name, len(self.profile.triggers), source_type)
+        return True
+
+    def stop(self):
+        self.profile.active = False
+        self.governor.flush()
+
+class TenantServer:
+    """
+    Loads every tenant in a directory and runs them on a shared worker pool.
+    """
+    def __init__(self, directory, workers=SERVER_WORKERS):
+        self.directory = directory
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tenant-worker")
+        self.tenants = {}
+        register_gauge("tenant_queue", lambda: self.pool._work_queue.qsize())
+
+    def load(self):
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            try:
+                name, settings = load_tenant(path)
+            except (OSError, ValueError) as e:
+                log.error("Skipping tenant file %s: %s", path, e)
+                continue
+            self.tenants[name] = Tenant(name, settings, self.pool)
+        return len(self.tenants)
+
+    def start(self):
+        started = [name for name, tenant in self.tenants.items() if tenant.start()]
+        log.info("Server mode: %d of %d tenant(s) running", len(started), len(self.tenants))
+        return started
+
+    def stop(self):
+        for tenant in self.tenants.values():
+            tenant.stop()
+        self.pool.shutdown(wait=False)
@@ -1,200 +1,807 @@
+import atexit
+import itertools
+import logging
 import time
 import wave
 import os
 import threading
-import requests
-import speech_recognition as sr
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from modules.config_manager import (
     TRIGGER_WORDS, WHISPER_API_URL, OPENAI_API_KEY, 
-    TRANSCRIPT_FILE, USE_GOOGLE_CLOUD, GOOGLE_CLOUD_CREDENTIALS,
+    TRANSCRIPT_FILE, TRANSCRIPT_DELIVERY, TRANSCRIPT_FILE_SINK, USE_GOOGLE_CLOUD, GOOGLE_CLOUD_CREDENTIALS,
     GOOGLE_LANGUAGE, WHISPER_LANGUAGE, WHISPER_HISTORY_FILE, ENABLE_HISTORY,
-    HISTORY_LOG_PREFIX, TRIGGERS
+    HISTORY_LOG_PREFIX, HISTORY_BACKEND, HISTORY_DB_FILE, HISTORY_RETENTION_DAYS, TRIGGERS, DEFAULT_TRIGGER_LATENCY,
+    CLOUD_BUDGETS, BUDGET_PRIORITY_RESERVE, USAGE_LEDGER_FILE,
+    FIRST_PASS_ENGINE, PRIMARY_ENGINE, FALLBACK_ENGINE, LOCAL_MODEL_PATH, LOCAL_ENGINE_WORKERS,
+    ENABLE_SEGMENTATION, SEGMENTATION_MIN_SECONDS, SEGMENTATION_MIN_PAUSE_MS,
+    SEGMENTATION_MIN_SEGMENT_SECONDS, SEGMENTATION_MAX_WORKERS, PREWARM_CONNECTIONS, PREWARM_INTERVAL,
+    CONDITIONING_ENABLED, CONDITIONING_HIGHPASS_HZ, CONDITIONING_TARGET_DBFS, CONDITIONING_MAX_GAIN_DB,
+    CONDITIONING_CEILING_DBFS, FIRST_PASS_LANGUAGES, FIRST_PASS_MAX_LANGUAGES, FIRST_PASS_LANGUAGE_WORKERS
 )
 from modules.utils import state
-from modules.trigger_handler import trigger_url_call
-from modules.history_manager import append_to_transcript_history
+from modules.trigger_handler import trigger_url_call, last_call_times
+from modules.history_manager import append_to_transcript_history, get_history_store
+from modules.budget_governor import BudgetGovernor
+from modules.segmenter import split_at_pauses
+from modules.conditioning import make_conditioner
+from modules.trigger_matcher import TriggerMatcher
+from modules.profiler import register_gauge
+from modules.recognizers import (
+    RecognitionError, BudgetExhaustedError, GoogleBackend, WhisperApiBackend, LocalBackend
+)
+
+log = logging.getLogger(__name__)
+log.debug("transcriber.py loaded. TRIGGERS count: %d", len(TRIGGERS))
+
+# All cloud recognition calls go through the governor for rate limits and spend accounting
+governor = BudgetGovernor(CLOUD_BUDGETS, USAGE_LEDGER_FILE, BUDGET_PRIORITY_RESERVE)
+atexit.register(governor.flush)
+
+# One matching engine for every profile's triggers (see Profile)
+matcher = TriggerMatcher()
+
+FRAME_DURATION_MS = 30
+
+# Backends without per-tenant credentials (the local model pool) are shared by all profiles
+_shared_backends = {}
+profiles = []
+# id(backend) -> time of the last prewarm_backends() connection
+_prewarmed = {}
+
+# Sequence number in recording file names: replayed utterances can finish within the same millisecond
+_recording_ids = itertools.count(1)
+
+# Shadow evaluator (modules.shadow) that receives a copy of every live utterance, if enabled
+shadow = None
+
+# Shared pool for transcribing the segments of long recordings concurrently
+segment_pool = ThreadPoolExecutor(max_workers=max(1, SEGMENTATION_MAX_WORKERS), thread_name_prefix="segment")
+register_gauge("segment_queue", lambda: segment_pool._work_queue.qsize())
 
-print(f"DEBUG: transcriber.py loaded. TRIGGERS count: {len(TRIGGERS)}")
+# Shared pool for the per-language first-pass calls (FIRST_PASS_LANGUAGES)
+language_pool = ThreadPoolExecutor(max_workers=FIRST_PASS_LANGUAGE_WORKERS, thread_name_prefix="language")
+register_gauge("language_queue", lambda: language_pool._work_queue.qsize())
 
-def transcribe_audio(filename):
+class Profile:
     """
-    Transcribe the given WAV file using the Whisper API if available,
-    otherwise fall back to Google Speech Recognition.
+    Everything that differs between tenants: triggers, output files, engine
+    choice, API keys, cloud budget, URL cooldowns and counters.
+
+    The single-tenant listener uses default_profile, built from config.json.
+    Server mode (modules.tenant_server) creates one per tenant. Processing
+    functions below take an optional profile and fall back to the default.
     """
-    if OPENAI_API_KEY and OPENAI_API_KEY.strip() and OPENAI_API_KEY != "API_KEY_HERE":
-        try:
-            with open(filename, 'rb') as audio_file:
-                headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-                data = {"language": WHISPER_LANGUAGE}
-                files = {
-                    "file": audio_file,
-                    "model": (None, "whisper-1")
-                }
-                response = requests.post(WHISPER_API_URL, headers=headers, data=data, files=files)
-                response.raise_for_status()
-                return response.json().get("text", "").strip()
-        except Exception as e:
-            print("Whisper transcription error:", e)
+    def __init__(self, name, settings, governor, on_terminate=None, counters=None, counters_lock=None, register=True):
+        self.name = name
+        self.triggers = settings.get("triggers", [])
+        self.transcript_file = settings.get("TRANSCRIPT_FILE", TRANSCRIPT_FILE)
+        self.transcript_delivery = settings.get("TRANSCRIPT_DELIVERY", TRANSCRIPT_DELIVERY)
+        self.transcript_file_sink = settings.get("TRANSCRIPT_FILE_SINK", TRANSCRIPT_FILE_SINK)
+        self.history_file = settings.get("WHISPER_HISTORY_FILE", WHISPER_HISTORY_FILE)
+        self.history_prefix = settings.get("HISTORY_LOG_PREFIX", HISTORY_LOG_PREFIX)
+        self.enable_history = settings.get("ENABLE_HISTORY", ENABLE_HISTORY)
+        self.history_backend = settings.get("HISTORY_BACKEND", HISTORY_BACKEND)
+        self.history_db_file = settings.get("HISTORY_DB_FILE", HISTORY_DB_FILE)
+        self.history_retention_days = float(settings.get("HISTORY_RETENTION_DAYS", HISTORY_RETENTION_DAYS))
+        self.first_pass_engine = settings.get("FIRST_PASS_ENGINE", FIRST_PASS_ENGINE)
+        self.primary_engine = settings.get("PRIMARY_ENGINE", PRIMARY_ENGINE)
+        self.fallback_engine = settings.get("FALLBACK_ENGINE", FALLBACK_ENGINE)
+        self.google_language = settings.get("GOOGLE_LANGUAGE", GOOGLE_LANGUAGE)
+        languages = settings.get("FIRST_PASS_LANGUAGES", FIRST_PASS_LANGUAGES) or [self.google_language]
+        self.first_pass_languages = languages[:int(settings.get("FIRST_PASS_MAX_LANGUAGES", FIRST_PASS_MAX_LANGUAGES))]
+        self.use_google_cloud = settings.get("USE_GOOGLE_CLOUD", USE_GOOGLE_CLOUD)
+        self.google_credentials = settings.get("GOOGLE_CLOUD_CREDENTIALS", GOOGLE_CLOUD_CREDENTIALS)
+        self.whisper_api_url = settings.get("WHISPER_API_URL", WHISPER_API_URL)
+        self.openai_api_key = settings.get("OPENAI_API_KEY", OPENAI_API_KEY)
+        self.whisper_language = settings.get("WHISPER_LANGUAGE", WHISPER_LANGUAGE)
+        self.conditioner = make_conditioner(
+            settings.get("CONDITIONING_ENABLED", CONDITIONING_ENABLED),
+            settings.get("CONDITIONING_HIGHPASS_HZ", CONDITIONING_HIGHPASS_HZ),
+            settings.get("CONDITIONING_TARGET_DBFS", CONDITIONING_TARGET_DBFS),
+            settings.get("CONDITIONING_MAX_GAIN_DB", CONDITIONING_MAX_GAIN_DB),
+            settings.get("CONDITIONING_CEILING_DBFS", CONDITIONING_CEILING_DBFS))
+        self.governor = governor
+        self.on_terminate = on_terminate
+        self.active = True
+        self.termination_triggered = False
+        self.last_call_times = {}
+        self.counters = counters if counters is not None else {}
+        self.counters_lock = counters_lock or threading.Lock()
+        self.backends = {}
+        # Flatten all trigger words for Google Cloud hints
+        self.all_phrases = []
+        self.set_triggers(self.triggers)
+        if register:
+            profiles.append(self)
+
+    def set_triggers(self, triggers):
+        self.triggers = triggers
+        self.all_phrases[:] = [phrase for t_set in triggers for phrase in t_set.get("phrases", [])]
+        matcher.set_triggers(self.name, triggers)
+
+    def count(self, name, amount=1):
+        with self.counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+    def get_backend(self, name):
+        """
+        Return the recognition backend for an engine name, or None for "none"
+        or an engine that is not usable with this profile's configuration.
+        """
+        if not name or name == "none":
             return None
-    else:
-        recognizer = sr.Recognizer()
+        backends = _shared_backends if name == "local" else self.backends
+        if name not in backends:
+            if name == "google":
+                backend = GoogleBackend(self.google_language, self.use_google_cloud, self.google_credentials, self.all_phrases)
+            elif name == "whisper":
+                backend = WhisperApiBackend(self.whisper_api_url, self.openai_api_key, self.whisper_language)
+            elif name == "local":
+                backend = LocalBackend(LOCAL_MODEL_PATH, LOCAL_ENGINE_WORKERS)
+            else:
+                log.warning("Unknown recognition engine '%s', ignoring", name)
+                backend = None
+            if backend is not None and not backend.available():
+                log.warning("Recognition engine '%s' is not available with the current configuration", name)
+                backend = None
+            backends[name] = backend
+        return backends[name]
+
+    def language_backends(self):
+        """
+        One Google backend per first-pass language, in order of preference.
+        """
+        backends = []
+        for language in self.first_pass_languages:
+            key = f"google:{language}"
+            if key not in self.backends:
+                backend = GoogleBackend(language, self.use_google_cloud, self.google_credentials, self.all_phrases)
+                backend.label = f"{backend.label} {language}"
+                self.backends[key] = backend
+            backends.append(self.backends[key])
+        return backends
+
+    def terminate(self):
+        self.termination_triggered = True
+        self.active = False
+        if self.on_terminate is not None:
+            self.on_terminate()
+
+def _stop_listener():
+    state.termination_triggered = True
+    state.running = False
+
+default_profile = Profile("default", {"triggers": TRIGGERS}, governor, on_terminate=_stop_listener,
+                          counters=state.counters, counters_lock=state.counters_lock)
+# The default profile shares the module-level cooldown table
+default_profile.last_call_times = last_call_times
+ALL_TRIGGER_PHRASES = default_profile.all_phrases
+
+def set_shadow(evaluator):
+    global shadow
+    shadow = evaluator
+
+def reload_triggers():
+    """
+    Refresh derived trigger data after config_manager.reload_config() replaced TRIGGERS.
+    """
+    default_profile.set_triggers(TRIGGERS)
+    log.info("Triggers reloaded: %d trigger set(s), %d phrase(s)", len(TRIGGERS), len(ALL_TRIGGER_PHRASES))
+
+def get_backend(name, profile=None):
+    """
+    Return the recognition backend for an engine name, or None for "none"
+    or an engine that is not usable with the current configuration.
+    """
+    return (profile or default_profile).get_backend(name)
+
+def start_backends(profile=None):
+    """
+    Warm up the configured engines (e.g. load local models into the worker pool).
+    """
+    profile = profile or default_profile
+    for name in (profile.first_pass_engine, profile.primary_engine, profile.fallback_engine):
+        backend = profile.get_backend(name)
+        if backend is not None:
+            backend.start()
+
+def prewarm_backends(profile=None):
+    """
+    Called at speech onset: open connections to the cloud engines in the background
+    while the user is still talking (at most once per PREWARM_INTERVAL per backend).
+    """
+    if not PREWARM_CONNECTIONS:
+        return
+    profile = profile or default_profile
+    now = time.monotonic()
+    for name in (profile.first_pass_engine, profile.primary_engine):
+        backend = profile.get_backend(name)
+        if backend is None or not backend.budget_key or now - _prewarmed.get(id(backend), -PREWARM_INTERVAL) < PREWARM_INTERVAL:
+            continue
+        _prewarmed[id(backend)] = now
+        threading.Thread(target=backend.prewarm, name="prewarm", daemon=True).start()
+
+def close_backends():
+    for backend in [b for p in profiles for b in p.backends.values()] + list(_shared_backends.values()):
+        if backend is not None:
+            backend.close()
+
+def wav_duration(filename):
+    """
+    Return the duration of a WAV file in seconds.
+    """
+    with wave.open(filename, 'rb') as wf:
+        return wf.getnframes() / float(wf.getframerate())
+
+def write_wav(filename, pcm, channels, sample_width, rate):
+    """
+    Write captured PCM (any bytes-like object, e.g. a memoryview of the recording arena) to a WAV file.
+    """
+    with wave.open(filename, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+
+def condition_audio(pcm, channels, sample_width, rate, vad_flags=None, profile=None):
+    """
+    Apply the profile's audio conditioning (modules.conditioning) to an utterance, if enabled.
+    Returns the PCM to encode: the same buffer rewritten in place when it is writable, else a copy.
+    """
+    profile = profile or default_profile
+    conditioner = profile.conditioner
+    if conditioner is None or channels != 1 or sample_width != 2 or rate != conditioner.rate:
+        return pcm
+    pcm, info = conditioner.process(pcm, vad_flags)
+    loudness = "silent" if info["loudness_dbfs"] is None else f"speech at {info['loudness_dbfs']:.1f} dBFS"
+    log.debug("Conditioned audio: %s, gain %+.1f dB%s, %.2f ms", loudness, info["gain_db"],
+              ", limited" if info["limited"] else "", info["ms"])
+    profile.count("conditioned")
+    profile.count("conditioning_ms", info["ms"])
+    return pcm
+
+class FiredTriggers:
+    """
+    Tracks which trigger sets have already fired for one utterance, so partial,
+    per-segment and final results never fire the same trigger twice.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fired = set()
+        self.claimed = []  # (t_set, time.monotonic()) in firing order, for shadow comparison
+        self.started = None  # end of the utterance (time.monotonic()), set once it is being processed
+        self.matched = False  # a recognized segment matched a trigger (budget priority for later segments)
+
+    def claim(self, t_set):
+        """
+        Mark a trigger set as fired for this utterance.
+        Returns False if it was already fired.
+        """
+        with self.lock:
+            if id(t_set) in self.fired:
+                return False
+            self.fired.add(id(t_set))
+            self.claimed.append((t_set, time.monotonic()))
+            return True
+
+def claim_triggers(triggers, fired=None):
+    """
+    Drop trigger sets that already fired for this utterance (on a partial
+    transcript or an earlier segment).
+    """
+    if fired is None:
+        return list(triggers)
+    return [t_set for t_set in triggers if fired.claim(t_set)]
+
+def recognize_with(backend, filename, audio_seconds, priority=False, profile=None, with_confidence=False):
+    """
+    Run one backend under the (profile's) budget governor.
+    Returns the transcript, or None if no speech was recognized; (transcript, confidence) with_confidence.
+    Raises RecognitionError on failure and BudgetExhaustedError when over budget.
+    """
+    budget = (profile or default_profile).governor
+    if backend.budget_key and not budget.try_acquire(backend.budget_key, audio_seconds, priority=priority):
+        raise BudgetExhaustedError(f"{backend.label} budget exhausted")
+    if with_confidence:
+        return backend.transcribe_with_confidence(filename)
+    return backend.transcribe(filename)
+
+def recognize_with_fallback(backend, filename, audio_seconds, priority=False, profile=None, with_confidence=False):
+    """
+    Run a backend, switching to the configured fallback engine if it fails.
+    Returns (transcript, backend_used); ((transcript, confidence), backend_used) with_confidence.
+    """
+    profile = profile or default_profile
+    try:
+        return recognize_with(backend, filename, audio_seconds, priority, profile, with_confidence), backend
+    except RecognitionError as e:
+        fallback = profile.get_backend(profile.fallback_engine)
+        if fallback is None or fallback is backend:
+            raise
+        log.warning("%s recognition unavailable (%s), falling back to %s", backend.label, e, fallback.label)
+        return recognize_with(fallback, filename, audio_seconds, priority, profile, with_confidence), fallback
+
+def _recognize_language(backend, filename, audio_seconds, profile, started, priority):
+    try:
+        result = recognize_with(backend, filename, audio_seconds, priority, profile, with_confidence=True)
+    except RecognitionError:
+        profile.count(f"language_errors:{backend.language}")
+        raise
+    profile.count(f"language_calls:{backend.language}")
+    profile.count(f"language_ms:{backend.language}", round((time.monotonic() - started) * 1000))
+    return result
+
+def recognize_first_pass(backend, filename, audio_seconds, profile=None, priority=False):
+    """
+    First-pass recognition. With several first-pass languages and the Google engine, the
+    utterance is recognized in every language concurrently and the best hypothesis is used:
+    the first one that matches a trigger (without waiting for the other languages), else the
+    most confident. Falls back like recognize_with_fallback if every language fails.
+    priority: a trigger already matched locally (streaming partial), see BudgetGovernor.
+    Returns (transcript, backend_used, confidence or None).
+    """
+    profile = profile or default_profile
+    if backend.name != "google" or len(profile.first_pass_languages) < 2:
+        (transcript, confidence), used = recognize_with_fallback(backend, filename, audio_seconds, priority, profile,
+                                                                 with_confidence=True)
+        return transcript, used, confidence
+
+    started = time.monotonic()
+    languages = profile.language_backends()
+    futures = {language_pool.submit(_recognize_language, language, filename, audio_seconds, profile, started,
+                                   priority): rank
+               for rank, language in enumerate(languages)}
+    best = None  # (confidence or None for a trigger match, -rank, transcript, confidence)
+    errors = [None] * len(languages)
+    for future in as_completed(futures):
+        rank = futures[future]
         try:
-            with sr.AudioFile(filename) as source:
-                audio = recognizer.record(source)
-            transcript = recognizer.recognize_google(audio, language=GOOGLE_LANGUAGE).lower()
-            return transcript
-        except sr.UnknownValueError:
-            print("Google Speech Recognition could not understand audio")
-            return None
-        except sr.RequestError as e:
-            print("Error with Google Speech Recognition service:", e)
-            return None
+            transcript, confidence = future.result()
+        except RecognitionError as e:
+            errors[rank] = e
+            continue
+        if not transcript:
+            continue
+        if find_triggers(transcript, profile):
+            best = (None, -rank, transcript, confidence)
+            # Languages still queued are not needed (nor billed); calls in flight finish for the statistics
+            for pending in futures:
+                pending.cancel()
+            break
+        candidate = (confidence or 0.0, -rank, transcript, confidence)
+        if best is None or candidate > best:
+            best = candidate
+
+    if best is not None:
+        winner = languages[-best[1]]
+        profile.count(f"language_wins:{winner.language}")
+        log.debug("First pass in %d languages: %s won (%s) after %.0f ms", len(languages), winner.language,
+                  "trigger match" if best[0] is None else f"confidence {best[0]:.2f}",
+                  (time.monotonic() - started) * 1000)
+        return best[2], winner, best[3]
+    failures = [e for e in errors if e is not None]
+    if len(failures) < len(languages):
+        return None, languages[0], None
+    # Every language failed: the preferred language's error decides, as for a single-language first pass
+    fallback = profile.get_backend(profile.fallback_engine)
+    if fallback is None or fallback.name == "google":
+        raise failures[0]
+    log.warning("%s recognition unavailable (%s), falling back to %s", backend.label, failures[0], fallback.label)
+    transcript, confidence = recognize_with(fallback, filename, audio_seconds, priority, profile, with_confidence=True)
+    return transcript, fallback, confidence
+
+def transcribe_audio(filename, audio_seconds=None, priority=False, profile=None):
+    """
+    Transcribe the given WAV file with the primary engine (Whisper by default),
+    falling back to the fallback engine if configured.
+    Returns None if nothing was recognized, the call failed or the budget is exhausted.
+    """
+    if audio_seconds is None:
+        audio_seconds = wav_duration(filename)
+
+    profile = profile or default_profile
+    backend = (profile.get_backend(profile.primary_engine) or profile.get_backend(profile.fallback_engine)
+               or profile.get_backend(profile.first_pass_engine))
+    if backend is None:
+        log.warning("No recognition engine available for detailed transcription")
+        return None
+    try:
+        transcript, _ = recognize_with_fallback(backend, filename, audio_seconds, priority, profile)
+        return transcript
+    except RecognitionError as e:
+        log.error("%s transcription error: %s", backend.label, e)
+        return None
+
+def find_triggers(text, profile=None):
+    """
+    Return the (profile's) trigger sets that have at least one phrase in the given transcript.
+    """
+    return matcher.match(text, (profile or default_profile).name)
+
+def is_instant_trigger(t_set):
+    """
+    Return True if the trigger set fires on the first-pass transcript.
+    """
+    return t_set.get("latency", DEFAULT_TRIGGER_LATENCY) == "instant"
 
-def process_recording_async(audio_data):
+def check_termination(text, profile=None):
+    """
+    Return True if the transcript contains a trigger phrase together with the terminate command.
+    """
+    if "terminate" not in text and "determinate" not in text:
+        return False
+    return bool(find_triggers(text, profile))
+
+def record_history(text, profile=None, trigger=None, latency_ms=None, backend=None):
+    """
+    Add a transcript (or error note) to the profile's history backend(s); trigger,
+    latency and backend are only stored by the SQLite backend.
+    """
+    profile = profile or default_profile
+    if not profile.enable_history:
+        return
+    if profile.history_backend != "sqlite":
+        append_to_transcript_history(text, profile.history_file, prefix=profile.history_prefix)
+    if profile.history_backend in ("sqlite", "both"):
+        store = get_history_store(profile.history_db_file, profile.history_retention_days)
+        store.add(text, profile.history_prefix, trigger, latency_ms, backend, profile.name)
+
+def handle_termination(text, source, profile=None):
+    """
+    Stop the listener (or the tenant's listener) if the transcript is a termination command.
+    Returns True if processing of the recording should stop.
+    """
+    profile = profile or default_profile
+    if not check_termination(text, profile):
+        return False
+    if not profile.termination_triggered:
+        term_msg = f"TERMINATION via {source}: {text}"
+        log.warning(term_msg)
+        record_history(term_msg, profile)
+        profile.terminate()
+    return True
+
+class TranscriptFileWriter:
+    """
+    Writes transcript files from a background thread, for TRANSCRIPT_DELIVERY modes
+    where Firebot gets the transcript with the call and the file is only a
+    compatibility sink. Only the latest text per file is written.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = {}  # path -> latest text
+        self.thread = None
+
+    def write(self, path, text):
+        with self.cond:
+            self.pending[path] = text
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            self.flush()
+
+    def flush(self):
+        with self.cond:
+            pending, self.pending = self.pending, {}
+        for path, text in pending.items():
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+            except Exception as e:
+                log.error("Error writing transcript file %s: %s", path, e)
+
+transcript_writer = TranscriptFileWriter()
+atexit.register(transcript_writer.flush)
+
+def trigger_id(t_set):
+    return t_set.get("id") or (t_set.get("phrases") or [""])[0]
+
+def write_transcript(transcript, profile):
+    """
+    Write the transcript file: before the URL calls in "file" delivery mode (Firebot
+    reads it when the effect fires), otherwise in the background if the sink is enabled.
+    """
+    if profile.transcript_delivery == "file":
+        with open(profile.transcript_file, "w", encoding="utf-8") as f:
+            f.write(transcript)
+    elif profile.transcript_file_sink:
+        transcript_writer.write(profile.transcript_file, transcript)
+
+def dispatch_triggers(triggers, transcript, profile=None, engine=None, fired=None, confidence=None):
+    """
+    Deliver the transcript to Firebot and fire the URL of each trigger set.
+    engine, fired (for the latency since the end of the utterance) and the engine's
+    confidence (None if it reports none) go into the metadata sent with the call in
+    "body"/"query" delivery modes.
+    """
+    if not triggers:
+        return
+    profile = profile or default_profile
+    try:
+        write_transcript(transcript, profile)
+
+        latency_ms = round((time.monotonic() - fired.started) * 1000) if fired is not None and fired.started else None
+        for t_set in triggers:
+            url = t_set.get("url")
+            cooldown = t_set.get("cooldown", 2.0)
+            profile.count("triggers_fired")
+            if url:
+                payload = {"transcript": transcript, "trigger": trigger_id(t_set), "engine": engine,
+                           "latency_ms": latency_ms, "confidence": confidence}
+                threading.Thread(target=trigger_url_call, args=(url, cooldown, profile, payload, profile.transcript_delivery),
+                                 daemon=True).start()
+                log.info("Triggered URL: %s (Cooldown: %ss)", url, cooldown)
+    except Exception as e:
+        log.error("Error processing actions: %s", e)
+
+def update_transcript_file(transcript, profile=None):
+    """
+    Overwrite the transcript file with refined text once it arrives.
+    """
+    try:
+        write_transcript(transcript, profile or default_profile)
+    except Exception as e:
+        log.error("Error updating transcript file: %s", e)
+
+def plan_segments(vad_flags):
+    """
+    Return the (start, end) frame ranges to transcribe separately, or None if the
+    recording is short or has no usable internal pause.
+    """
+    if not ENABLE_SEGMENTATION or not vad_flags:
+        return None
+    if len(vad_flags) * FRAME_DURATION_MS < SEGMENTATION_MIN_SECONDS * 1000:
+        return None
+    segments = split_at_pauses(
+        vad_flags,
+        max(1, int(SEGMENTATION_MIN_PAUSE_MS / FRAME_DURATION_MS)),
+        max(1, int(SEGMENTATION_MIN_SEGMENT_SECONDS * 1000 / FRAME_DURATION_MS))
+    )
+    return segments if len(segments) > 1 else None
+
+def _recognize_segment(backend, filename, audio_seconds, profile, fired):
+    # Checked when the worker starts, not at submit: a trigger fired by a streaming partial or
+    # matched in a segment recognized by then gives this one the priority budget
+    result = recognize_first_pass(backend, filename, audio_seconds, profile, bool(fired.claimed or fired.matched))
+    if result[0] and find_triggers(result[0], profile):
+        fired.matched = True
+    return result
+
+def transcribe_segments(filename, pcm, frame_bytes, segments, channels, sample_width, rate, fired, profile=None):
+    """
+    Transcribe the segments of a long recording concurrently with the first-pass engine.
+    Results are handled in order: instant triggers in a segment fire as soon as that
+    segment (and those before it) has returned. Returns (stitched_transcript, label).
+    """
+    profile = profile or default_profile
+    backend = profile.get_backend(profile.first_pass_engine)
+    if backend is None:
+        raise RecognitionError(f"First-pass engine '{profile.first_pass_engine}' unavailable")
+
+    base, ext = os.path.splitext(filename)
+    segment_files = []
+    futures = []
+    for i, (start, end) in enumerate(segments):
+        segment_file = f"{base}_seg{i}{ext}"
+        write_wav(segment_file, pcm[start * frame_bytes:end * frame_bytes], channels, sample_width, rate)
+        segment_files.append(segment_file)
+        seconds = (end - start) * FRAME_DURATION_MS / 1000
+        futures.append(segment_pool.submit(_recognize_segment, backend, segment_file, seconds, profile, fired))
+
+    texts = []
+    label = backend.label
+    try:
+        for i, future in enumerate(futures):
+            try:
+                text, used, confidence = future.result()
+            except RecognitionError as e:
+                log.warning("Segment %d/%d recognition failed: %s", i + 1, len(segments), e)
+                continue
+            if not text:
+                continue
+            label = used.label
+            texts.append(text)
+            log.info("Segment %d/%d transcript (%s): %s", i + 1, len(segments), used.label, text)
+            fresh = claim_triggers([t_set for t_set in find_triggers(text, profile) if is_instant_trigger(t_set)], fired)
+            if fresh:
+                log.info("Firing %d instant trigger(s) from segment %d", len(fresh), i + 1)
+                dispatch_triggers(fresh, text, profile, used.label, fired, confidence)
+    finally:
+        for segment_file in segment_files:
+            try:
+                os.remove(segment_file)
+            except OSError:
+                pass
+    return " ".join(texts), f"{label}, {len(segments)} segments"
+
+def process_recording_async(audio_data, stream_session=None, vad_flags=None, release=None, profile=None):
     """
     Process a recording asynchronously:
       - Save the recording as a WAV file.
-      - Perform initial transcription using Google (or Google Cloud if configured).
-      - If trigger words are detected, optionally use Whisper API for detailed transcription.
+      - Perform initial transcription with the first-pass engine (Google by default),
+        switching to the fallback engine if it fails or is over budget.
+      - Fire "instant" triggers straight away on the initial transcript.
+      - For "accurate" triggers, optionally use the primary engine (Whisper by default)
+        for detailed transcription and fire them once the refined transcript arrives.
+        An exhausted budget degrades to first-pass-only transcripts.
       - Write the transcript to a file and trigger the URL.
+      - With a streaming session, triggers already fired on partial transcripts
+        are not fired again, and a local streaming final result replaces the
+        local first pass.
+      - Long recordings are split at internal pauses (from the per-frame VAD flags)
+        and the segments are transcribed concurrently, then stitched in order.
+
+    audio_data is (pcm, channels, sample_width, rate) where pcm is a bytes-like view
+    of the recording; release, if given, is called once the audio is no longer needed.
+    profile selects the tenant (server mode); the default profile otherwise.
     """
-    frames, channels, sample_width, rate = audio_data
+    profile = profile or default_profile
+    started = time.monotonic()
+    pcm, channels, sample_width, rate = audio_data
+    frame_bytes = int(rate * FRAME_DURATION_MS / 1000) * sample_width * channels
+    num_frames = len(pcm) // frame_bytes
+    shadow_job = None
+    fired = None
+    transcript_for_history = None
+    transcript_engine = None
 
     # Save audio to a unique WAV file
-    print(f"DEBUG: Saving WAV - Channels: {channels}, Sample Width: {sample_width}, Rate: {rate}, Frames: {len(frames)}")
-    filename = f"recording_{int(time.time() * 1000)}.wav"
+    log.debug("Saving WAV - Channels: %s, Sample Width: %s, Rate: %s, Frames: %d", channels, sample_width, rate, num_frames)
+    prefix = "" if profile is default_profile else f"{profile.name}_"
+    filename = f"{prefix}recording_{int(time.time() * 1000)}_{next(_recording_ids)}.wav"
     try:
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(sample_width)
-            wf.setframerate(rate)
-            wf.writeframes(b"".join(frames))
-        print(f"Recording saved: {filename} ({len(frames)} frames, {len(frames) * 30 / 1000:.2f}s)")
-
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(filename) as source:
-            audio = recognizer.record(source)
-        
-        # Flatten all trigger words for Google Cloud hints
-        all_trigger_phrases = []
-        for trigger_set in TRIGGERS:
-            all_trigger_phrases.extend(trigger_set.get("phrases", []))
-
-        # Use Google or Google Cloud for initial transcription
-        if USE_GOOGLE_CLOUD:
-            google_transcript = recognizer.recognize_google_cloud(
-                audio,
-                credentials_json=GOOGLE_CLOUD_CREDENTIALS,
-                preferred_phrases=all_trigger_phrases,
-                language=GOOGLE_LANGUAGE
-            ).lower()
-            print("Initial transcript (Google Cloud):", google_transcript)
+        # Shadow mode gets its own copy of the audio (the arena is reused after release)
+        if shadow and profile is default_profile:
+            shadow_job = shadow.start(pcm, channels, sample_width, rate, started)
+        # After the shadow copy, so a shadow profile can compare with and without conditioning
+        pcm = condition_audio(pcm, channels, sample_width, rate, vad_flags, profile)
+        write_wav(filename, pcm, channels, sample_width, rate)
+        audio_seconds = num_frames * FRAME_DURATION_MS / 1000
+        log.debug("Recording saved: %s (%d frames, %.2fs)", filename, num_frames, audio_seconds)
+        profile.count("utterances")
+        profile.count("audio_seconds", audio_seconds)
+
+        first_pass = profile.get_backend(profile.first_pass_engine)
+        streamed_transcript = None
+        # The streaming final result is only used in place of the first pass from the same engine
+        if stream_session is not None and stream_session.engine_name == profile.first_pass_engine:
+            streamed_transcript = stream_session.wait_final()
+
+        # Triggers fired on partials or earlier segments are tracked per utterance
+        fired = stream_session if stream_session is not None else FiredTriggers()
+        fired.started = started
+        segments = plan_segments(vad_flags)
+
+        first_pass_confidence = None
+        if streamed_transcript:
+            # The streaming engine already produced the first-pass result
+            first_pass_transcript = streamed_transcript.lower()
+            first_pass_label = stream_session.label
+        elif segments:
+            log.info("Splitting %.2fs recording into %d segments at pauses", audio_seconds, len(segments))
+            try:
+                first_pass_transcript, first_pass_label = transcribe_segments(
+                    filename, pcm, frame_bytes, segments, channels, sample_width, rate, fired, profile
+                )
+            except RecognitionError as e:
+                log.warning("Segmented recognition failed: %s", e)
+                return
         else:
-            google_transcript = recognizer.recognize_google(audio, language=GOOGLE_LANGUAGE).lower()
-            print("Initial transcript (Google):", google_transcript)
-
-        transcript_for_history = google_transcript
-        
-        # Helper detection function
-        def check_termination(text):
-            for t_set in TRIGGERS:
-                for phrase in t_set.get("phrases", []):
-                    if phrase in text and ("terminate" in text or "determinate" in text):
-                        return True
-            return False
-
-        # Check termination on Google transcript
-        if check_termination(google_transcript):
-             if not state.termination_triggered:
-                state.termination_triggered = True
-                term_msg = f"TERMINATION via Google: {google_transcript}"
-                print(term_msg)
-                if ENABLE_HISTORY:
-                    append_to_transcript_history(term_msg, WHISPER_HISTORY_FILE, prefix=HISTORY_LOG_PREFIX)
-                state.running = False
+            if first_pass is None:
+                log.warning("First-pass engine '%s' unavailable, skipping recording", profile.first_pass_engine)
+                return
+            try:
+                # Priority only if a trigger already fired on a (local) streaming partial
+                first_pass_transcript, first_pass, first_pass_confidence = recognize_first_pass(
+                    first_pass, filename, audio_seconds, profile, priority=bool(fired.claimed))
+            except BudgetExhaustedError as e:
+                log.warning("%s, skipping recording", e)
                 return
+            except RecognitionError as e:
+                log.error("%s API error: %s", first_pass.label, e)
+                record_history(f"[{first_pass.label} API Error: {e}]", profile)
+                return
+            first_pass_label = first_pass.label
+        if not first_pass_transcript:
+            log.info("No speech recognized in recording")
+            return
+        log.info("Initial transcript (%s): %s", first_pass_label, first_pass_transcript)
+
+        transcript_for_history = first_pass_transcript
+        transcript_engine = first_pass_label
 
-        # Check detection on Google transcript
-        detected_triggers = []
-        any_trigger_found = False
-        
-        for t_set in TRIGGERS:
-            if any(phrase in google_transcript for phrase in t_set.get("phrases", [])):
-                detected_triggers.append(t_set)
-                any_trigger_found = True
-
-        final_transcript = google_transcript
-
-        if any_trigger_found:
-            print("Trigger word detected (Google)!")
-            if OPENAI_API_KEY and OPENAI_API_KEY.strip() and OPENAI_API_KEY != "API_KEY_HERE":
-                print("Using Whisper API for detailed transcription...")
-                whisper_transcript = transcribe_audio(filename)
-                if whisper_transcript:
-                     final_transcript = whisper_transcript
-                     transcript_for_history = whisper_transcript
-                     print("Detailed transcript (Whisper):", whisper_transcript)
+        # Check termination on first-pass transcript
+        if handle_termination(first_pass_transcript, first_pass_label, profile):
+            return
+
+        # Check detection on first-pass transcript
+        detected_triggers = find_triggers(first_pass_transcript, profile)
+
+        if detected_triggers:
+            log.info("Trigger word detected (%s)!", first_pass_label)
+
+            # Instant triggers only need the trigger word, fire them on the first pass
+            instant_triggers = [t_set for t_set in detected_triggers if is_instant_trigger(t_set)]
+            accurate_triggers = [t_set for t_set in detected_triggers if not is_instant_trigger(t_set)]
+            fresh_instant = claim_triggers(instant_triggers, fired)
+            if fresh_instant:
+                log.info("Firing %d instant trigger(s) on initial transcript", len(fresh_instant))
+                dispatch_triggers(fresh_instant, first_pass_transcript, profile, first_pass_label, fired,
+                                  first_pass_confidence)
+            if len(fresh_instant) < len(instant_triggers):
+                log.info("Skipping %d trigger(s) already fired on a partial transcript or segment", len(instant_triggers) - len(fresh_instant))
+
+            final_transcript = first_pass_transcript
+            final_confidence = first_pass_confidence
+
+            primary = profile.get_backend(profile.primary_engine)
+            if accurate_triggers and primary is not None and primary is not first_pass:
+                log.info("Using %s for detailed transcription...", primary.label)
+                # The utterance matched a trigger, so the refinement may use the priority reserve
+                refined_transcript = transcribe_audio(filename, audio_seconds, priority=True, profile=profile)
+                if refined_transcript:
+                     final_transcript = refined_transcript
+                     final_confidence = None
+                     transcript_for_history = refined_transcript
+                     transcript_engine = primary.label
+                     log.info("Detailed transcript: %s", refined_transcript)
                      
-                     # Re-check termination on Whisper
-                     if check_termination(whisper_transcript):
-                         if not state.termination_triggered:
-                            state.termination_triggered = True
-                            term_msg = f"TERMINATION via Whisper: {whisper_transcript}"
-                            print(term_msg)
-                            if ENABLE_HISTORY:
-                                append_to_transcript_history(term_msg, WHISPER_HISTORY_FILE, prefix=HISTORY_LOG_PREFIX)
-                            state.running = False
-                            return
+                     # Re-check termination on the refined transcript
+                     if handle_termination(refined_transcript, primary.label, profile):
+                         return
                      
-                     # Re-detect triggers on Whisper (more accurate)
-                     detected_triggers = []
-                     for t_set in TRIGGERS:
-                        if any(phrase in whisper_transcript for phrase in t_set.get("phrases", [])):
-                            detected_triggers.append(t_set)
+                     # Re-detect triggers on the refined (more accurate) transcript, skipping those already fired
+                     accurate_triggers = [t_set for t_set in find_triggers(refined_transcript, profile) if not is_instant_trigger(t_set)]
                 else:
-                     print("Whisper transcription failed, using Google transcript")
-            else:
-                 print("No Whisper API key, using Google transcript")
-
-            # Execute actions for detected triggers
-            if detected_triggers:
-                try:
-                    with open(TRANSCRIPT_FILE, "w", encoding="utf-8") as f:
-                        f.write(final_transcript)
-                    
-                    for t_set in detected_triggers:
-                        url = t_set.get("url")
-                        cooldown = t_set.get("cooldown", 2.0)
-                        if url:
-                            threading.Thread(target=trigger_url_call, args=(url, cooldown), daemon=True).start()
-                            print(f"Triggered URL: {url} (Cooldown: {cooldown}s)")
-                except Exception as e:
-                    print(f"Error processing actions: {e}")
+                     log.info("Detailed transcription unavailable, using first-pass transcript")
+            elif accurate_triggers:
+                 log.info("No detailed transcription engine, using first-pass transcript")
+
+            # Execute actions for accurate triggers
+            if accurate_triggers:
+                dispatch_triggers(claim_triggers(accurate_triggers, fired), final_transcript, profile, transcript_engine, fired,
+                                  final_confidence)
+            elif instant_triggers:
+                if final_transcript != first_pass_transcript:
+                    update_transcript_file(final_transcript, profile)
             else:
-                print("No trigger words found in final transcript.")
+                log.info("No trigger words found in final transcript.")
 
         else:
-            print("No trigger word found in initial transcript")
+            log.info("No trigger word found in initial transcript")
             
         # Log to history if enabled and we have a transcript
-        if ENABLE_HISTORY and transcript_for_history:
-            append_to_transcript_history(transcript_for_history, WHISPER_HISTORY_FILE, prefix=HISTORY_LOG_PREFIX)
-
-    except sr.UnknownValueError:
-        print("No speech recognized in recording")
-    except sr.RequestError as e:
-        print("Google API error:", e)
-        if ENABLE_HISTORY:
-             append_to_transcript_history(f"[Google API Error: {e}]", WHISPER_HISTORY_FILE, prefix=HISTORY_LOG_PREFIX)
+        if transcript_for_history:
+            # Latency to the first trigger fired, or to the final transcript if none fired;
+            # a trigger fired on a streaming partial before the end of speech counts as 0
+            first_fired = fired.claimed[0][1] if fired.claimed else time.monotonic()
+            record_history(transcript_for_history, profile,
+                           trigger=", ".join(trigger_id(t_set) for t_set, _ in fired.claimed) or None,
+                           latency_ms=round(max(0.0, first_fired - started) * 1000, 1), backend=transcript_engine)
+
     except Exception as e:
-        print(f"Error processing recording: {e}")
-        if ENABLE_HISTORY:
-             append_to_transcript_history(f"[CRITICAL Processing Error: {e} for {filename}]", WHISPER_HISTORY_FILE, prefix=HISTORY_LOG_PREFIX)
+        log.error("Error processing recording: %s", e)
+        record_history(f"[CRITICAL Processing Error: {e} for {filename}]", profile)
     finally:
+        if release is not None:
+            release()
+        if shadow_job is not None:
+            shadow_job.live_done(fired, transcript_for_history)
         try:
             os.remove(filename)
-            print(f"Removed temporary file: {filename}")
+            log.debug("Removed temporary file: %s", filename)
         except FileNotFoundError:
             pass
         except Exception as e:
-            print(f"Error removing file {filename}: {e}")
+            log.error("Error removing file %s: %s", filename, e)
@@ -1,39 +1,81 @@
+import logging
 import time
 import requests
 import threading
 from modules.config_manager import TRIGGER_URL, URL_CALL_COOLDOWN
 from modules.utils import state
+from modules.http_client import session
+from modules.firebot_transport import get_transport, FireError, NotAcknowledgedError
 
-print(f"DEBUG: trigger_handler.py loaded. TRIGGER_URL: {TRIGGER_URL}")
+log = logging.getLogger(__name__)
+log.debug("trigger_handler.py loaded. TRIGGER_URL: %s", TRIGGER_URL)
 
 # State for trigger throttling (Dictionary: url -> timestamp)
 last_call_times = {}
 
-def trigger_url_call(target_url=TRIGGER_URL, cooldown=URL_CALL_COOLDOWN):
+def trigger_url_call(target_url=TRIGGER_URL, cooldown=URL_CALL_COOLDOWN, profile=None, payload=None, delivery="file"):
     """
     Call the target URL in a separate thread.
     Throttles calls based on a cooldown period specific to that URL.
+    With a profile (see transcriber.Profile), cooldowns, the terminate flag and
+    counters are the profile's own, so tenants never throttle each other.
+
+    delivery "file" sends a plain GET (Firebot reads TRANSCRIPT_FILE); "body" POSTs
+    the payload (transcript and metadata) as JSON effect arguments ({"args": payload},
+    $presetListArg[...] in a Firebot preset effect list); "query" sends it as GET parameters.
+    With FIREBOT_TRANSPORT "websocket" the call goes over the persistent transport
+    (modules.firebot_transport) while it is connected, otherwise over HTTP. A fire that
+    was sent but not acknowledged is not repeated over HTTP (the effect may have run).
     """
     if not target_url or target_url == "YOUR_URL_HERE":
         return
 
-    if state.termination_triggered:
-        print("Terminate command active, skipping URL call")
+    call_times = profile.last_call_times if profile is not None else last_call_times
+    count = profile.count if profile is not None else state.count
+    terminated = profile.termination_triggered if profile is not None else state.termination_triggered
+    if terminated:
+        log.info("Terminate command active, skipping URL call")
         return
 
     current_time = time.time()
-    last_time = last_call_times.get(target_url, 0)
+    last_time = call_times.get(target_url, 0)
 
     if current_time - last_time <= cooldown:
-        print(f"URL call to {target_url} attempted within cooldown period, ignoring")
+        log.info("URL call to %s attempted within cooldown period, ignoring", target_url)
+        count("cooldown_skips")
         return
 
+    transport = get_transport()
+    if transport is not None:
+        try:
+            response = transport.fire(target_url, payload if delivery != "file" else None)
+            log.info("Trigger acknowledged (%s): %s", target_url, response)
+            count("url_calls")
+            call_times[target_url] = current_time
+            return
+        except NotAcknowledgedError as e:
+            log.warning("Trigger sent over the Firebot transport but not acknowledged (%s): %s", target_url, e)
+            count("url_unacknowledged")
+            call_times[target_url] = current_time
+            return
+        except FireError as e:
+            log.warning("Firebot transport fire failed (%s), falling back to HTTP: %s", target_url, e)
+
     try:
-        response = requests.get(target_url, timeout=3)
-        print(f"Trigger response ({target_url}):", response.text)
-        last_call_times[target_url] = current_time
+        if delivery == "body" and payload is not None:
+            response = session.post(target_url, json={"args": payload}, timeout=3)
+        elif delivery == "query" and payload is not None:
+            params = {key: value for key, value in payload.items() if value is not None}
+            response = session.get(target_url, params=params, timeout=3)
+        else:
+            response = session.get(target_url, timeout=3)
+        log.info("Trigger response (%s): %s", target_url, response.text)
+        count("url_calls")
+        call_times[target_url] = current_time
     except requests.Timeout:
-        print(f"Trigger URL request timed out: {target_url}")
-        last_call_times[target_url] = current_time
+        log.warning("Trigger URL request timed out: %s", target_url)
+        count("url_errors")
+        call_times[target_url] = current_time
     except Exception as e:
-        print(f"Error executing trigger {target_url}:", e)
+        log.error("Error executing trigger %s: %s", target_url, e)
+        count("url_errors")
@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+
+class TriggerMatcher:
+    """
+    Finds the trigger sets with a phrase in a transcript, for one or many owners (tenants).
+
+    All owners' phrases are compiled into one Aho-Corasick automaton, so a
+    transcript is scanned once no matter how many phrases are registered.
+    Matching keeps the substring semantics of `phrase in text`. Results are
+    returned in each owner's trigger order. The automaton is rebuilt lazily
+    after set_triggers() and swapped in atomically, so matching never blocks
+    on updates.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owners = {}  # owner -> list of trigger sets
+        self.compiled = None
+        self.dirty = True
+
+    def set_triggers(self, owner, triggers):
+        with self.lock:
+            self.owners[owner] = list(triggers)
+            self.dirty = True
+
+    def remove(self, owner):
+        with self.lock:
+            self.owners.pop(owner, None)
+            self.dirty = True
+
+    def _automaton(self):
+        if self.dirty:
+            with self.lock:
+                if self.dirty:
+                    self.compiled = _compile(self.owners)
+                    self.dirty = False
+        return self.compiled
+
+    def match(self, text, owner):
+        """
+        Return the owner's trigger sets that have at least one phrase in text.
+        """
+        goto, fail, outputs, always, triggers = self._automaton()
+        owner_triggers = triggers.get(owner)
+        if not owner_triggers:
+            return []
+        hits = set(always.get(owner, ()))
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for hit_owner, index in outputs[node]:
+                if hit_owner == owner:
+                    hits.add(index)
+        return [owner_triggers[index] for index in sorted(hits)]
+
+def _compile(owners):
+    """
+    Build (goto, fail, outputs, always, triggers) from {owner: [trigger sets]}.
+    outputs[node] lists (owner, trigger index) for every phrase ending at node,
+    including those inherited through failure links.
+    """
+    goto = [{}]
+    outputs = [set()]
+    always = {}
+    triggers = {}
+    for owner, owner_triggers in owners.items():
+        triggers[owner] = owner_triggers
+        for index, t_set in enumerate(owner_triggers):
+            for phrase in t_set.get("phrases", []):
+                if not phrase:
+                    # An empty phrase is contained in every transcript
+                    always.setdefault(owner, set()).add(index)
+                    continue
+                node = 0
+                for char in phrase:
+                    child = goto[node].get(char)
+                    if child is None:
+                        child = len(goto)
+                        goto[node][char] = child
+                        goto.append({})
+                        outputs.append(set())
+                    node = child
+                outputs[node].add((owner, index))
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for char, child in goto[node].items():
+            queue.append(child)
+            state = fail[node]
+            while state and char not in goto[state]:
+                state = fail[state]
+            fail[child] = goto[state].get(char, 0)
+            outputs[child] |= outputs[fail[child]]
+    return goto, fail, [tuple(out) for out in outputs], always, triggers
@@ -1,36 +1,23 @@
 import glob
+import logging
 import os
 import signal
 import sys
 import threading
 import time
 
-class Unbuffered:
-    """
-    Wrapper to flush sys.stdout immediately.
-    """
-    def __init__(self, stream):
-        self.stream = stream
-
-    def write(self, data):
-        self.stream.write(data)
-        self.stream.flush()
-
-    def writelines(self, datas):
-        self.stream.writelines(datas)
-        self.stream.flush()
-
-    def __getattr__(self, attr):
-        return getattr(self.stream, attr)
+log = logging.getLogger(__name__)
 
 def ensure_stdout():
     """
     Ensure that sys.stdout is available.
     If not, redirect output to a log file.
+    Output is line buffered; logging writes whole batches through modules.log.
     """
     if sys.stdout is None:
         sys.stdout = open("output.log", "w")
-    sys.stdout = Unbuffered(sys.stdout)
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True)
 
 def get_base_dir():
     """
@@ -46,38 +33,67 @@ def cleanup_chunks():
     """
     Delete any leftover temporary audio files matching specific patterns.
     """
-    patterns = ["chunk_*.wav", "extra_*.wav", "combined_*.wav", "transcript_*.wav", "recording_*.wav"]
+    patterns = ["chunk_*.wav", "extra_*.wav", "combined_*.wav", "transcript_*.wav", "recording_*.wav",
+                "*_recording_*.wav"]
     for pattern in patterns:
         for f in glob.glob(pattern):
             try:
                 os.remove(f)
-                print(f"Deleted leftover file: {f}")
+                log.info("Deleted leftover file: %s", f)
             except Exception as e:
-                print(f"Error deleting {f}: {e}")
+                log.error("Error deleting %s: %s", f, e)
 
 class AppState:
     def __init__(self):
         self.running = True
         self.termination_triggered = False
         self.p_audio = None
+        # Listening control (pause/resume and push-to-talk, see modules.control_api)
+        self.listening = threading.Event()
+        self.listening.set()
+        self.push_to_talk = False
+        self.ptt_held = False
+        # Pre-initialized instance waiting to take over from the active listener (whisper.py --standby)
+        self.standby = False
+        # Live stats
+        self.started = time.time()
+        self.capture_stats = {}
+        self.loop_tick = 0.0  # time.monotonic() of the audio loop's last iteration (launcher heartbeats)
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        """
+        Increment a live stats counter (thread-safe).
+        """
+        with self.counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def is_gated(self):
+        """
+        True while push-to-talk is enabled and the talk button is not held.
+        """
+        return self.push_to_talk and not self.ptt_held
 
 state = AppState()
 
 def cleanup_resources():
     """
     Clean up temporary files and terminate PyAudio if initialized.
+    A standby instance leaves the files alone: they belong to the active listener.
     """
-    cleanup_chunks()
+    if not state.standby:
+        cleanup_chunks()
     if state.p_audio:
         state.p_audio.terminate()
-        print("PyAudio terminated")
+        log.info("PyAudio terminated")
 
 def signal_handler(signum, frame):
     """
     Handle termination signals.
     """
     state.running = False
-    print("\nTerminating")
+    log.info("Terminating")
     sys.exit(0)
 
 def register_signal_handlers():
@@ -7,61 +7,222 @@ transcribes recordings using either Google or the Whisper API,
 and triggers a URL when certain trigger words are detected.
 """
 
+import argparse
 import atexit
+import logging
+import multiprocessing
 import sys
 import threading
 import time
 
 # Import shared components and modules
-from modules.config_manager import FIREBOT_REQUIRED
+from modules.config_manager import (
+    FIREBOT_REQUIRED, CAPTURE_MODE, LOG_LEVEL, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS,
+    LOG_RATE_LIMIT, LOG_RATE_WINDOW, CONTROL_API_ENABLED, CONTROL_API_HOST, CONTROL_API_PORT,
+    CONTROL_API_TOKEN, PUSH_TO_TALK, AUDIO_SOURCE, SHADOW_ENABLED, FIREBOT_TRANSPORT, FIREBOT_WEBSOCKET_URL
+)
+from modules.log import setup_logging
 from modules.utils import ensure_stdout, cleanup_resources, cleanup_chunks, register_signal_handlers, state
 from modules.process_monitor import check_firebot_status
-from modules.audio_recorder import vad_based_recording, initialize_pyaudio
+from modules.audio_recorder import vad_based_recording, process_based_recording, initialize_pyaudio, wait_for_processing
+from modules.input_sources import is_live
+from modules.transcriber import start_backends, close_backends
+from modules.streaming import start_streaming, stop_streaming
+from modules.control_api import start_control_api, profile_start
+from modules.profiler import stop_profiling
+from modules.tenant_server import TenantServer
+from modules.shadow import start_shadow
+from modules.firebot_transport import start_transport, stop_transport
+from modules.supervision import start_supervision, wait_for_activation, report_active
+from modules.audio_devices import input_devices
 
-# Initial setup
-ensure_stdout()
-atexit.register(cleanup_resources)
-register_signal_handlers()
+log = logging.getLogger(__name__)
+
+def setup():
+    """
+    Process-wide setup of the listener. Not done at import: with the spawn start method the
+    capture and local engine processes re-import this module, and must not delete the
+    listener's recordings when they exit.
+    """
+    ensure_stdout()
+    setup_logging(LOG_LEVEL, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS, LOG_RATE_LIMIT, LOG_RATE_WINDOW)
+    atexit.register(cleanup_resources)
+    register_signal_handlers()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="VAD-based voice trigger system")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run headless with the local control API enabled (pause/resume, push-to-talk, reload, stats)")
+    parser.add_argument("--paused", action="store_true",
+                        help="start with listening paused (resume through the control API)")
+    parser.add_argument("--server", metavar="DIR",
+                        help="multi-tenant server mode: serve every tenant profile (*.json) in DIR")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="use a WAV file (or a directory of WAV files) instead of the microphone; exits when done")
+    parser.add_argument("--fast", action="store_true",
+                        help="with --replay, read as fast as possible instead of in real time")
+    parser.add_argument("--stdin", action="store_true",
+                        help="read raw 16 kHz mono s16le PCM from stdin instead of the microphone")
+    parser.add_argument("--tap", metavar="DIR",
+                        help="also record everything the input source delivers to a WAV file in DIR")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the sampling profiler and memory tracker from startup (output in PROFILE_DIR)")
+    parser.add_argument("--list-devices", action="store_true",
+                        help="list the audio input devices (for AUDIO_SOURCE \"device\") and exit")
+    parser.add_argument("--supervised", action="store_true",
+                        help="answer the launcher's heartbeats and commands on stdin (see modules.supervision)")
+    parser.add_argument("--standby", action="store_true",
+                        help="initialize, then wait for the launcher's 'activate' command before listening (implies --supervised)")
+    args, _ = parser.parse_known_args()
+    return args
+
+def source_spec(args):
+    """
+    The AUDIO_SOURCE setting, overridden by --replay/--stdin/--tap.
+    """
+    spec = dict(AUDIO_SOURCE)
+    if args.replay:
+        spec = {"type": "file", "path": args.replay, "realtime": not args.fast}
+    elif args.stdin:
+        spec = {"type": "stdin"}
+    if args.tap:
+        spec["tap"] = args.tap
+    return spec
 
 def main():
     """
     Main entry point:
+      - Sets up logging, signal handlers and cleanup at exit.
+      - Initializes PyAudio and the recognition engines.
+      - As a standby instance (--standby), waits here until the launcher activates it.
       - Performs cleanup.
-      - Initializes PyAudio.
       - Checks Firebot process if required.
-      - Starts the VAD-based recording in a separate thread.
+      - Picks the input source: AUDIO_SOURCE, or a replayed recording or stdin (--replay/--stdin).
+      - Starts the VAD-based recording in a separate thread (capture itself runs
+        in a dedicated process when CAPTURE_MODE is "process").
+      - Starts the local control API in daemon mode (or if CONTROL_API_ENABLED).
+      - In server mode, runs one recorder per tenant profile instead.
       - Keeps the main thread alive until termination.
     """
-    cleanup_chunks()
-    print("Starting VAD-based voice trigger system...")
+    setup()
+    args = parse_args()
+    if args.list_devices:
+        for index, name, channels, rate in input_devices(initialize_pyaudio()):
+            print(f"{index:3}: {name} ({channels} ch, {rate} Hz)")
+        return
+    if args.supervised or args.standby:
+        start_supervision()
+    if args.profile:
+        profile_start()
+    atexit.register(stop_profiling)
+    log.info("Starting VAD-based voice trigger system...")
 
     # Initialize PyAudio
     initialize_pyaudio()
 
-    # Check Firebot process at startup if required
-    if FIREBOT_REQUIRED:
+    # Load recognition engines (e.g. warm the local model worker pool)
+    start_backends()
+    atexit.register(close_backends)
+    start_streaming()
+    atexit.register(stop_streaming)
+
+    # Everything above is the slow part of a start; a standby instance has it done before it is needed
+    if args.standby:
+        state.standby = True
+        log.info("Standby instance initialized, waiting to take over...")
+        if not wait_for_activation():
+            return
+        state.standby = False
+        log.info("Standby instance activated.")
+
+    cleanup_chunks()
+    if SHADOW_ENABLED and not args.server:
+        start_shadow()
+    if FIREBOT_TRANSPORT == "websocket":
+        start_transport(FIREBOT_WEBSOCKET_URL)
+        atexit.register(stop_transport)
+
+    if args.server:
+        run_server(args)
+        return
+
+    spec = source_spec(args)
+
+    # Check Firebot process at startup if required (not for replayed input)
+    if FIREBOT_REQUIRED and is_live(spec):
         if not check_firebot_status(state):
-            print("Firebot process not found. Terminating...")
+            log.warning("Firebot process not found. Terminating...")
             cleanup_resources()
             sys.exit(0)
 
+    state.push_to_talk = bool(PUSH_TO_TALK)
+    if args.paused:
+        state.listening.clear()
+    if args.daemon or CONTROL_API_ENABLED:
+        start_control_api(CONTROL_API_HOST, CONTROL_API_PORT, CONTROL_API_TOKEN)
+
     # Start the recording thread
-    record_thread = threading.Thread(target=vad_based_recording, daemon=True)
+    if CAPTURE_MODE == "process" and spec.get("type", "device") == "device" and not spec.get("tap"):
+        record_thread = threading.Thread(target=process_based_recording, daemon=True)
+    else:
+        if CAPTURE_MODE == "process":
+            log.warning("CAPTURE_MODE 'process' only applies to an untapped local input device; using in-process capture")
+        record_thread = threading.Thread(target=vad_based_recording, kwargs={"source_spec": spec}, daemon=True)
     record_thread.start()
+    if args.supervised or args.standby:
+        report_active(record_thread)
 
-    print("All systems running. Listening for trigger words...")
+    if state.listening.is_set():
+        log.info("All systems running. Listening for trigger words...")
+    else:
+        log.info("All systems running. Listening is paused until resumed via the control API.")
+
+    wait_for_shutdown(record_thread, live=is_live(spec))
+
+def run_server(args):
+    """
+    Serve every tenant in the given directory until shut down.
+    The control API (pause/resume/status) covers all tenants.
+    """
+    server = TenantServer(args.server)
+    if not server.load():
+        log.error("No tenant profiles found in %s", args.server)
+        cleanup_resources()
+        sys.exit(1)
+    if args.paused:
+        state.listening.clear()
+    start_control_api(CONTROL_API_HOST, CONTROL_API_PORT, CONTROL_API_TOKEN)
+    server.start()
+    atexit.register(server.stop)
+    if args.supervised or args.standby:
+        report_active(None)
+    wait_for_shutdown()
 
+def wait_for_shutdown(record_thread=None, live=False):
+    exit_code = 0
     try:
         while state.running:
+            if record_thread is not None and not record_thread.is_alive():
+                if live and state.running:
+                    # The microphone or network input failed; a non-zero exit lets the launcher restart it
+                    log.error("Audio input stopped unexpectedly.")
+                    exit_code = 1
+                else:
+                    # The input ended (replayed file or stdin): finish the last utterances, then exit
+                    log.info("Input finished, waiting for processing to complete...")
+                wait_for_processing()
+                break
             time.sleep(0.1)
     except KeyboardInterrupt:
-        print("\nKeyboard interrupt received, shutting down...")
+        log.info("Keyboard interrupt received, shutting down...")
     finally:
         state.running = False
-        print("Shutting down...")
+        log.info("Shutting down...")
         # Since this script often runs as a daemon or subprocess, 
         # ensure we exit cleanly.
-        sys.exit(0)
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
+    # Required for the local engine's worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()